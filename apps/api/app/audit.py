@@ -0,0 +1,166 @@
+"""
+監査ログ（audit_logs）の非同期・バッチ書き込み。
+
+ハンドラは commit が終わった後に record() を呼ぶだけで、INSERT は待たない。
+record() は上限付きの asyncio.Queue に積み、バックグラウンドの writer が
+
+- IFM_AUDIT_BATCH_SIZE 件たまる
+- 最初の 1 件から IFM_AUDIT_FLUSH_MS 経つ
+
+のどちらかで複数行 INSERT 1 回にまとめて書く。shutdown 時は残りを書き切ってから止まる。
+
+キューが一杯（IFM_AUDIT_QUEUE_MAX）・writer が動いていない時はリクエストを遅らせずに捨てて dropped を数える。
+積んでから書けるまでが IFM_AUDIT_LAG_WARN_MS を超えた件数は lagging で数える。
+プロセス内のキューなので、クラッシュ時には未書き込みの分が失われる（監査の粒度としては許容）。
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from sqlalchemy import insert
+
+from app.db.session import async_write_engine
+from app.models.models import AuditLog
+
+ENABLED = os.getenv("IFM_AUDIT", "1").lower() in ("1", "true", "yes")
+QUEUE_MAX = int(os.getenv("IFM_AUDIT_QUEUE_MAX", "10000"))
+BATCH_SIZE = int(os.getenv("IFM_AUDIT_BATCH_SIZE", "200"))
+FLUSH_SECONDS = float(os.getenv("IFM_AUDIT_FLUSH_MS", "500")) / 1000
+LAG_WARN_SECONDS = float(os.getenv("IFM_AUDIT_LAG_WARN_MS", "5000")) / 1000
+
+_queue: Optional[asyncio.Queue] = None
+_writer: Optional[asyncio.Task] = None
+_STOP = object()
+
+_stats = {
+    "enqueued": 0,
+    "written": 0,
+    "dropped": 0,
+    "failed": 0,
+    "batches": 0,
+    "lagging": 0,
+    "last_lag_ms": 0.0,
+    "max_lag_ms": 0.0,
+}
+
+
+def record(action: str, target_type: str, target_id: int, actor_user_id: Optional[int] = None, **meta: Any) -> None:
+    """
+    監査イベントを積む（待たない・例外を出さない）。commit の後に呼ぶこと。
+    """
+    if not ENABLED:
+        return
+    if _writer is None or _queue is None:
+        _stats["dropped"] += 1
+        return
+    event = (
+        time.monotonic(),
+        {
+            "actor_user_id": actor_user_id,
+            "action": action,
+            "target_type": target_type,
+            "target_id": int(target_id),
+            "meta": meta,
+            "created_at": datetime.now(timezone.utc),
+        },
+    )
+    try:
+        _queue.put_nowait(event)
+    except asyncio.QueueFull:
+        _stats["dropped"] += 1
+        return
+    _stats["enqueued"] += 1
+
+
+async def _flush(batch: list[tuple[float, dict]]) -> None:
+    if not batch:
+        return
+    try:
+        async with async_write_engine.begin() as conn:
+            await conn.execute(insert(AuditLog.__table__), [row for _, row in batch])
+    except Exception as e:
+        _stats["failed"] += len(batch)
+        print(f"=== AUDIT flush failed ({len(batch)} events dropped): {type(e).__name__}: {e} ===")
+        return
+
+    now = time.monotonic()
+    lag = now - batch[0][0]  # 一番古いイベントの待ち時間
+    _stats["written"] += len(batch)
+    _stats["batches"] += 1
+    _stats["last_lag_ms"] = round(lag * 1000, 1)
+    _stats["max_lag_ms"] = max(_stats["max_lag_ms"], _stats["last_lag_ms"])
+    _stats["lagging"] += sum(1 for queued_at, _ in batch if now - queued_at > LAG_WARN_SECONDS)
+
+
+async def _run(queue: asyncio.Queue) -> None:
+    loop = asyncio.get_running_loop()
+    stopping = False
+    while not stopping:
+        first = await queue.get()
+        if first is _STOP:
+            break
+        batch = [first]
+        deadline = loop.time() + FLUSH_SECONDS
+        while len(batch) < BATCH_SIZE:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if item is _STOP:
+                stopping = True
+                break
+            batch.append(item)
+        await _flush(batch)
+
+
+def start() -> None:
+    """
+    writer を起動する（event loop の中、アプリの startup から呼ぶ）。
+    """
+    global _queue, _writer
+    if not ENABLED or _writer is not None:
+        return
+    _queue = asyncio.Queue(maxsize=QUEUE_MAX)
+    _writer = asyncio.get_running_loop().create_task(_run(_queue))
+
+
+async def stop(timeout: float = 10.0) -> None:
+    """
+    新しいイベントの受け付けをやめ、キューに残っている分を書き切ってから writer を止める。
+    """
+    global _queue, _writer
+    queue, writer = _queue, _writer
+    _writer = None  # 以降の record() は dropped
+    if writer is None or queue is None:
+        return
+    # _STOP はキューの末尾に入るので、それまでのイベントは全部書かれる
+    await queue.put(_STOP)
+    try:
+        await asyncio.wait_for(writer, timeout)
+    except asyncio.TimeoutError:
+        writer.cancel()
+        _stats["dropped"] += queue.qsize()
+        print(f"=== AUDIT writer did not finish within {timeout}s, {queue.qsize()} events lost ===")
+    _queue = None
+
+
+def stats() -> dict:
+    return dict(
+        _stats,
+        enabled=ENABLED,
+        running=_writer is not None,
+        queue_depth=_queue.qsize() if _queue is not None else 0,
+        queue_max=QUEUE_MAX,
+        batch_size=BATCH_SIZE,
+        flush_ms=FLUSH_SECONDS * 1000,
+    )
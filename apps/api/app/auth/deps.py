@@ -2,30 +2,32 @@ from __future__ import annotations
 
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import SessionLocal
+from app.auth import principal_cache
+from app.auth.principal_cache import Principal
+from app.db.session import get_async_db
 from app.models.models import User
 from app.security import decode_access_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-def get_current_user(
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> User:
+    db: AsyncSession = Depends(get_async_db),
+) -> Principal:
     if not token:
         raise HTTPException(status_code=401, detail="not authenticated")
 
+    # decode 済み claims と user スナップショットがあれば DB に行かない
+    digest = principal_cache.token_digest(token)
+    cached = principal_cache.get(digest)
+    if cached is not None:
+        return cached.principal
+
+    generation = principal_cache.cache.generation
     payload = decode_access_token(token)
 
     sub = payload.get("sub")
@@ -37,8 +39,16 @@ def get_current_user(
     except Exception:
         raise HTTPException(status_code=401, detail="not authenticated")
 
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    row = (
+        await db.execute(
+            select(User.id, User.email, User.role, User.status).where(User.id == user_id)
+        )
+    ).first()
+    # handler が別 session（writer 等）を使う時に接続を 2 本握ったままにしない
+    await db.rollback()
+    if not row:
         raise HTTPException(status_code=401, detail="not authenticated")
 
-    return user
+    principal = Principal(*row)
+    principal_cache.put(digest, payload, principal, generation)
+    return principal
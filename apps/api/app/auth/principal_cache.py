@@ -0,0 +1,98 @@
+"""
+get_current_user 用の認証済みプリンシパルキャッシュ。
+
+token の sha256 をキーに、decode 済み claims と User の軽量スナップショットを保持する。
+有効期限は IFM_PRINCIPAL_CACHE_TTL 秒と token の exp の早い方。
+
+role / status が変わった User は Session の commit フックで自動的に invalidate される。
+ORM を通さない更新をした場合は invalidate_user() を明示的に呼ぶこと。
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.cache import LRUCache
+from app.models.models import User
+
+_PENDING_KEY = "principal_invalidate"
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    email: str
+    role: Any
+    status: Any
+
+
+@dataclass(frozen=True)
+class CachedAuth:
+    claims: Dict[str, Any]
+    principal: Principal
+
+
+cache = LRUCache(
+    maxsize=int(os.getenv("IFM_PRINCIPAL_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("IFM_PRINCIPAL_CACHE_TTL", "300")),
+)
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def get(digest: str) -> CachedAuth | None:
+    return cache.get(digest)
+
+
+def put(digest: str, claims: Dict[str, Any], principal: Principal, generation: int) -> None:
+    ttl = cache.ttl
+    exp = claims.get("exp")
+    if exp is not None:
+        remaining = float(exp) - time.time()
+        if remaining <= 0:
+            return
+        ttl = remaining if ttl is None else min(ttl, remaining)
+    cache.put(digest, CachedAuth(claims, principal), ttl=ttl, generation=generation)
+
+
+def invalidate_user(*user_ids: int) -> int:
+    ids = set(user_ids)
+    return cache.invalidate_where(lambda _k, v: v.principal.id in ids)
+
+
+# --- role / status 変更の commit フック ------------------------------------
+
+def _after_flush(session: Session, flush_context) -> None:
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        if state.attrs.role.history.has_changes() or state.attrs.status.history.has_changes():
+            session.info.setdefault(_PENDING_KEY, set()).add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            session.info.setdefault(_PENDING_KEY, set()).add(obj.id)
+
+
+def _after_commit(session: Session) -> None:
+    ids = session.info.pop(_PENDING_KEY, None)
+    if ids:
+        invalidate_user(*ids)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+if not event.contains(Session, "after_flush", _after_flush):
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
@@ -0,0 +1,114 @@
+"""
+プロセス内キャッシュの共通部品。
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    上限付き LRU（任意で TTL）。スレッドセーフ。
+
+    generation は invalidate のたびに進む。DB から読んだ値を書き戻す側は
+    読む前の generation を put() に渡すことで、読んでいる間に invalidate された
+    古い値を入れてしまうのを防げる。
+
+    invalidate(*keys) はそのキーだけ、いつ invalidate したかを覚えておく
+    （別のキーの invalidate で読み込み中の put が全部捨てられないように）。
+    覚えておくのは新しい方から maxsize 件まで。溢れた分と clear() / invalidate_where() は
+    _floor に入り、それより前の generation で読んだ値は全部入れない（安全側）。
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict[Hashable, tuple[Any, float | None]] = OrderedDict()
+        self._invalidated_at: OrderedDict[Hashable, int] = OrderedDict()
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                value, expires_at = item
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(
+        self,
+        key: Hashable,
+        value: Any,
+        *,
+        ttl: float | None = None,
+        generation: int | None = None,
+    ) -> bool:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if generation is not None and generation < max(self._floor, self._invalidated_at.get(key, 0)):
+                return False
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, *keys: Hashable) -> None:
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._data.pop(key, None)
+                self._invalidated_at.pop(key, None)
+                self._invalidated_at[key] = self.generation
+            while len(self._invalidated_at) > self.maxsize:
+                _, at = self._invalidated_at.popitem(last=False)
+                self._floor = max(self._floor, at)
+
+    def invalidate_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """
+        predicate(key, value) が真のエントリを全部消す。O(n) なので頻度の低い用途向け。
+        """
+        with self._lock:
+            self.generation += 1
+            self._floor = self.generation
+            self._invalidated_at.clear()
+            doomed = [k for k, (v, _) in self._data.items() if predicate(k, v)]
+            for key in doomed:
+                del self._data[key]
+            return len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._floor = self.generation
+            self._invalidated_at.clear()
+            self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -1,24 +1,17 @@
-import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
-
-connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
-
-engine = create_engine(
+"""
+DB の入口。engine / session は app.db.session に一本化してある
+（ここで別の engine を作らないこと）。
+"""
+from app.db.session import (  # noqa: F401
     DATABASE_URL,
-    connect_args=connect_args,
-    pool_pre_ping=True,
+    AsyncSessionLocal,
+    AsyncWriteSessionLocal,
+    SessionLocal,
+    async_engine,
+    async_write_engine,
+    engine,
+    get_async_db,
+    get_async_read_db,
+    get_async_write_db,
+    get_db,
 )
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
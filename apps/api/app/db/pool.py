@@ -0,0 +1,137 @@
+"""
+接続プールの設定と計測。
+
+プール設定は環境変数で調整する（ワーカー数 × プール上限が DB の max_connections を超えないように）:
+
+  IFM_DB_POOL_SIZE      常時保持する接続数            (default 5)
+  IFM_DB_MAX_OVERFLOW   一時的に追加で張れる接続数    (default 10)
+  IFM_DB_POOL_TIMEOUT   空きを待つ秒数。超えたら TimeoutError (default 30)
+  IFM_DB_POOL_RECYCLE   この秒数より古い接続は張り直す (default 1800, -1 で無効)
+  IFM_DB_PRE_PING       checkout 時に死活確認する      (default 1)
+
+checkout の待ち時間は QueuePool._do_get を包んで計測し、pool_stats() で返す。
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+POOL_SIZE = int(os.getenv("IFM_DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("IFM_DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("IFM_DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("IFM_DB_POOL_RECYCLE", "1800"))
+PRE_PING = os.getenv("IFM_DB_PRE_PING", "1").lower() not in ("0", "false", "no")
+
+
+class WaitStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += int(timed_out)
+            self.wait_total += seconds
+            if seconds > self.wait_max:
+                self.wait_max = seconds
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_total_ms": round(self.wait_total * 1000, 3),
+                "wait_avg_ms": round(self.wait_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+
+class _WaitTimingMixin:
+    wait_stats: WaitStats
+
+    def __init__(self, *args: Any, **kw: Any) -> None:
+        super().__init__(*args, **kw)
+        self.wait_stats = WaitStats()
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.wait_stats.record(time.perf_counter() - t0, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - t0)
+        return conn
+
+
+class InstrumentedQueuePool(_WaitTimingMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_WaitTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def is_sqlite_memory(url: str) -> bool:
+    u = make_url(url)
+    return u.get_backend_name() == "sqlite" and (
+        u.database in (None, "", ":memory:") or u.query.get("mode") == "memory"
+    )
+
+
+def engine_kwargs(
+    url: str,
+    *,
+    is_async: bool = False,
+    pool_size: int | None = None,
+    max_overflow: int | None = None,
+) -> dict:
+    """
+    create_engine / create_async_engine に渡すプール関連の引数。
+    pool_size / max_overflow を渡すと環境変数の値より優先する。
+    """
+    kw: dict[str, Any] = {"pool_pre_ping": PRE_PING}
+    if make_url(url).get_backend_name() == "sqlite" and not is_async:
+        kw["connect_args"] = {"check_same_thread": False}
+
+    # :memory: は接続ごとに別 DB になるので SQLAlchemy 既定のプールに任せる
+    if is_sqlite_memory(url):
+        return kw
+
+    kw.update(
+        poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        pool_size=POOL_SIZE if pool_size is None else pool_size,
+        max_overflow=MAX_OVERFLOW if max_overflow is None else max_overflow,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+    )
+    return kw
+
+
+def pool_stats(engine: Engine) -> dict:
+    pool = engine.pool
+    out: dict[str, Any] = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        out.update(
+            size=pool.size(),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            # overflow() は pool が埋まるまで負の値なので 0 に丸める
+            overflow=max(0, pool.overflow()),
+        )
+    wait_stats = getattr(pool, "wait_stats", None)
+    if wait_stats is not None:
+        out.update(wait_stats.as_dict())
+    return out
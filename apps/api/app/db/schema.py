@@ -0,0 +1,184 @@
+"""
+起動時のスキーマ確認と補完。
+
+毎回 create_all（全テーブルの reflect）をしないように、モデルから作った DDL のハッシュ
+（schema fingerprint）を schema_meta テーブルに保存しておき、起動時は 1 行読んで比べるだけにする。
+一致しなければ sync_schema() で揃えてから fingerprint を保存し直す。
+
+IFM_SCHEMA_CHECK で起動時の動きを選ぶ:
+  fingerprint  (default) 上の通り
+  alembic      alembic_version が head でなければ起動を止める（DDL は流さない。`alembic upgrade head` を先に）。
+               head でも、モデル・検索 index が要るテーブル / 列 / index が欠けていれば止める
+               （alembic/versions はまだ init_schema だけで、後から足した列や index の revision が無いので）
+  off          何もしない
+
+create_all は既存テーブルに列を足さないので、sync_schema() はモデルにあって DB に無い列を
+ALTER TABLE ... ADD COLUMN で追加する（nullable か server_default がある列だけ）。
+型変更や列の削除はしない。
+全文検索の index（FTS5 / tsvector。ORM のモデルに無い）も sync_schema() で作る（app/search.py）。
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+
+from sqlalchemy import Column, MetaData, String, Table, inspect, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.schema import CreateColumn, CreateIndex, CreateTable
+
+from app import search
+
+CHECK_MODE = os.getenv("IFM_SCHEMA_CHECK", "fingerprint").lower()
+
+API_ROOT = Path(__file__).resolve().parents[2]  # apps/api
+
+_meta = MetaData()
+schema_meta = Table(
+    "schema_meta",
+    _meta,
+    Column("key", String(64), primary_key=True),
+    Column("value", String(128), nullable=False),
+)
+
+
+def fingerprint(engine: Engine, metadata: MetaData) -> str:
+    """
+    モデルから生成される CREATE TABLE / CREATE INDEX の DDL（dialect ごと）と検索 index の DDL のハッシュ。
+    """
+    h = hashlib.sha256()
+    for table in sorted(metadata.tables.values(), key=lambda t: t.name):
+        h.update(str(CreateTable(table).compile(dialect=engine.dialect)).encode())
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            h.update(str(CreateIndex(index).compile(dialect=engine.dialect)).encode())
+    for stmt in search.ddl(engine.dialect.name):
+        h.update(stmt.encode())
+    return h.hexdigest()
+
+
+def stored_fingerprint(engine: Engine) -> str | None:
+    try:
+        with engine.connect() as conn:
+            return conn.execute(
+                select(schema_meta.c.value).where(schema_meta.c.key == "fingerprint")
+            ).scalar_one_or_none()
+    except SQLAlchemyError:
+        # schema_meta がまだ無い
+        return None
+
+
+def add_missing_columns(engine: Engine, metadata: MetaData) -> list[str]:
+    """
+    追加した列を "table.column" のリストで返す。
+    """
+    added = []
+    insp = inspect(engine)
+    existing_tables = set(insp.get_table_names())
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            have = {c["name"] for c in insp.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in have:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    raise RuntimeError(f"cannot add NOT NULL column without server_default: {table.name}.{column.name}")
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def sync_schema(engine: Engine, metadata: MetaData) -> None:
+    """
+    テーブル作成・列の補完・index 作成をして、fingerprint を保存する（idempotent）。
+    """
+    metadata.create_all(bind=engine)
+
+    for column in add_missing_columns(engine, metadata):
+        print(f"=== STARTUP column added: {column} ===")
+
+    # 既存テーブルには create_all が index を足さないので個別に作る
+    # （既存データが unique 制約に反していると作れないので、ログだけ出して続ける。
+    #   その場合 fingerprint は保存しないので、次の起動でもう一度試す）
+    complete = True
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                complete = False
+                print(f"=== STARTUP index {index.name} not created: {type(e).__name__}: {e} ===")
+
+    try:
+        search.install(engine)
+    except Exception as e:
+        complete = False
+        print(f"=== STARTUP search index not created: {type(e).__name__}: {e} ===")
+
+    if not complete:
+        return
+    _meta.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(schema_meta.delete().where(schema_meta.c.key == "fingerprint"))
+        conn.execute(schema_meta.insert().values(key="fingerprint", value=fingerprint(engine, metadata)))
+
+
+def missing_objects(engine: Engine, metadata: MetaData) -> list[str]:
+    """
+    モデル（と検索 index）にあって DB に無いテーブル / 列 / 名前付き index。
+    """
+    insp = inspect(engine)
+    tables = set(insp.get_table_names())
+    out = []
+    for table in metadata.sorted_tables:
+        if table.name not in tables:
+            out.append(f"table {table.name}")
+            continue
+        columns = {c["name"] for c in insp.get_columns(table.name)}
+        out += [f"column {table.name}.{c.name}" for c in table.columns if c.name not in columns]
+        indexes = {i["name"] for i in insp.get_indexes(table.name)}
+        out += [f"index {i.name}" for i in table.indexes if i.name and i.name not in indexes]
+    if "ideas" in tables:
+        out += search.missing(engine)
+    return out
+
+
+def check_alembic_head(engine: Engine, metadata: MetaData) -> None:
+    try:
+        from alembic.config import Config
+        from alembic.runtime.migration import MigrationContext
+        from alembic.script import ScriptDirectory
+    except ImportError:
+        raise RuntimeError("IFM_SCHEMA_CHECK=alembic needs the alembic package installed")
+
+    heads = set(ScriptDirectory.from_config(Config(str(API_ROOT / "alembic.ini"))).get_heads())
+    with engine.connect() as conn:
+        current = set(MigrationContext.configure(conn).get_current_heads())
+    if current != heads:
+        raise RuntimeError(f"database is at {sorted(current)}, expected alembic head {sorted(heads)}; run `alembic upgrade head`")
+
+    # head に居ても、revision の無い列や index が欠けていれば最初の購入・転売・検索で落ちるので、ここで止める
+    missing = missing_objects(engine, metadata)
+    if missing:
+        raise RuntimeError(
+            f"database is at alembic head but lacks {', '.join(missing)}; "
+            "add an alembic revision for them or boot once with IFM_SCHEMA_CHECK=fingerprint"
+        )
+
+
+def ensure_schema(engine: Engine, metadata: MetaData) -> str:
+    """
+    IFM_SCHEMA_CHECK に従って起動時のスキーマを確認する。結果を短い文字列で返す。
+    """
+    if CHECK_MODE == "off":
+        return "skipped"
+    if CHECK_MODE == "alembic":
+        check_alembic_head(engine, metadata)
+        return "alembic head"
+    if stored_fingerprint(engine) == fingerprint(engine, metadata):
+        return "fingerprint match"
+    sync_schema(engine, metadata)
+    return "synced"
@@ -1,21 +1,27 @@
 from __future__ import annotations
 
+import hashlib
 import os
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
 
+from app.cache import LRUCache
+from app.db import sqlite as sqlite_profile
+from app.db.pool import engine_kwargs, is_sqlite_memory, pool_stats
+
 # 例: sqlite:///./app.db
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
 
-# SQLite の場合のみ必要
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-
+# engine はアプリ全体でここの 1 つだけ（プール設定は app/db/pool.py / 環境変数）
 engine = create_engine(
     DATABASE_URL,
-    connect_args=connect_args,
     future=True,
+    **engine_kwargs(DATABASE_URL),
 )
 
 SessionLocal = sessionmaker(
@@ -26,6 +32,104 @@ SessionLocal = sessionmaker(
 )
 
 
+def to_async_url(url: str) -> str:
+    """
+    同期用の DATABASE_URL から async ドライバの URL を作る。
+    - sqlite                      -> sqlite+aiosqlite
+    - postgresql / +psycopg2      -> postgresql+psycopg（psycopg 3 は async 対応。requirements.txt に入っている）
+    - postgresql+psycopg (v3)     -> そのまま
+    """
+    u = make_url(url)
+    backend, _, driver = u.drivername.partition("+")
+    if backend == "sqlite":
+        u = u.set(drivername="sqlite+aiosqlite")
+    elif backend == "postgresql" and driver in ("", "psycopg2"):
+        u = u.set(drivername="postgresql+psycopg")
+    return u.render_as_string(hide_password=False)
+
+
+# ルーターは async def + AsyncSession で DB を叩く（スレッドプールの上限に縛られない）
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **engine_kwargs(ASYNC_DATABASE_URL, is_async=True),
+)
+
+# SQLite 本番プロファイル（IFM_SQLITE_PROFILE=production）:
+# WAL 等の PRAGMA を全 engine に入れ、書き込みは接続 1 本の writer engine に直列化する
+SQLITE_TUNED = (
+    sqlite_profile.ENABLED
+    and make_url(DATABASE_URL).get_backend_name() == "sqlite"
+    and not is_sqlite_memory(DATABASE_URL)
+)
+
+if SQLITE_TUNED:
+    sqlite_profile.apply_pragmas(engine)
+    sqlite_profile.apply_pragmas(async_engine.sync_engine)
+
+    async_write_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        **engine_kwargs(ASYNC_DATABASE_URL, is_async=True, pool_size=1, max_overflow=0),
+    )
+    sqlite_profile.apply_pragmas(async_write_engine.sync_engine)
+    sqlite_profile.begin_immediate(async_write_engine.sync_engine)
+else:
+    async_write_engine = async_engine
+
+# commit 後に属性アクセスで lazy load が走ると async では落ちるので expire しない
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+# 書き込みハンドラ用（SQLite プロファイル時は writer lane、それ以外は AsyncSessionLocal と同じ engine）
+AsyncWriteSessionLocal = async_sessionmaker(
+    bind=async_write_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+# 読み取りレプリカ（任意）。REPLICA_DATABASE_URL がある時だけ、読み取り専用ハンドラ（get_async_read_db）が使う
+#   REPLICA_DATABASE_URL        同期用と同じ形式の URL（async ドライバへの変換も DATABASE_URL と同じ）
+#   IFM_REPLICA_STICKY_SECONDS  書き込みを commit したクライアントの読み取りを primary に寄せる秒数
+#                               (default 5。レプリカの遅延より長くする)
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL") or None
+REPLICA_STICKY_SECONDS = float(os.getenv("IFM_REPLICA_STICKY_SECONDS", "5"))
+
+async_replica_engine = None
+AsyncReplicaSessionLocal = None
+if REPLICA_DATABASE_URL:
+    _async_replica_url = to_async_url(REPLICA_DATABASE_URL)
+    async_replica_engine = create_async_engine(_async_replica_url, **engine_kwargs(_async_replica_url, is_async=True))
+    if SQLITE_TUNED and make_url(REPLICA_DATABASE_URL).get_backend_name() == "sqlite":
+        sqlite_profile.apply_pragmas(async_replica_engine.sync_engine)
+    AsyncReplicaSessionLocal = async_sessionmaker(
+        bind=async_replica_engine,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+# 書き込みを commit したクライアント（Bearer token の digest）。プロセス内だけなので、
+# 別ワーカーでの書き込みは owned / market キャッシュと同じく見えるまで遅れることがある
+_sticky = LRUCache(maxsize=int(os.getenv("IFM_REPLICA_STICKY_SIZE", "10000")), ttl=REPLICA_STICKY_SECONDS)
+_CLIENT_KEY = "replica_client"
+_REPLICA_KEY = "replica"
+
+
+def _client_key(request: Request) -> str | None:
+    auth = request.headers.get("authorization")
+    return hashlib.sha256(auth.encode()).hexdigest() if auth else None
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_sticky(session: Session) -> None:
+    key = session.info.get(_CLIENT_KEY)
+    if key is not None:
+        _sticky.put(key, True)
+
+
 class Base(DeclarativeBase):
     pass
 
@@ -36,3 +140,57 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+def db_pool_stats() -> dict:
+    # リクエストは async_engine、起動処理・スクリプトは engine を使う
+    out = {
+        "async": pool_stats(async_engine.sync_engine),
+        "sync": pool_stats(engine),
+    }
+    if async_write_engine is not async_engine:
+        out["async_writer"] = pool_stats(async_write_engine.sync_engine)
+    if async_replica_engine is not None:
+        out["async_replica"] = pool_stats(async_replica_engine.sync_engine)
+    return out
+
+
+def is_replica(db: AsyncSession) -> bool:
+    """
+    get_async_read_db がレプリカに振り分けた session か（キャッシュに入れてよいかの判断用）。
+    """
+    return db.info.get(_REPLICA_KEY, False)
+
+
+def replica_stats() -> dict:
+    return {"enabled": AsyncReplicaSessionLocal is not None, "sticky_clients": len(_sticky)}
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_write_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncWriteSessionLocal() as db:
+        if AsyncReplicaSessionLocal is not None:
+            # commit したら、このクライアントの読み取りはしばらく primary へ（_mark_sticky）
+            db.info[_CLIENT_KEY] = _client_key(request)
+        yield db
+
+
+async def get_async_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    読み取り専用ハンドラ用。レプリカがあればレプリカへ、直前に自分で書き込んだクライアントは primary へ
+    （購入した直後の一覧に購入が反映されているように）。レプリカが無ければ get_async_db と同じ。
+    """
+    factory = AsyncReplicaSessionLocal
+    if factory is None:
+        factory = AsyncSessionLocal
+    else:
+        key = _client_key(request)
+        if key is not None and _sticky.get(key):
+            factory = AsyncSessionLocal
+    async with factory() as db:
+        db.info[_REPLICA_KEY] = factory is not AsyncSessionLocal
+        yield db
@@ -0,0 +1,53 @@
+"""
+SQLite を本番で使う時のプロファイル（IFM_SQLITE_PROFILE=production で有効）。
+
+- 接続ごとに PRAGMA を設定する
+    journal_mode=WAL      読み取りが書き込みを待たない
+    synchronous=NORMAL    WAL なら commit ごとの fsync を省いても壊れない
+    busy_timeout          ロック待ちで即 "database is locked" にしない
+    mmap_size / cache_size
+- 書き込みトランザクションは接続 1 本の writer 専用 engine に流す（single writer lane）。
+  writer は BEGIN IMMEDIATE で始めるので、読んだ後に書き込みへ昇格する時の
+  SQLITE_BUSY が起きない。
+
+数値は環境変数で上書きできる:
+  IFM_SQLITE_BUSY_TIMEOUT_MS (5000) / IFM_SQLITE_MMAP_SIZE (268435456) / IFM_SQLITE_CACHE_SIZE (-65536 = 64MiB)
+"""
+from __future__ import annotations
+
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PROFILE = os.getenv("IFM_SQLITE_PROFILE", "").lower()
+ENABLED = PROFILE in ("production", "prod")
+
+BUSY_TIMEOUT_MS = int(os.getenv("IFM_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+MMAP_SIZE = int(os.getenv("IFM_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+CACHE_SIZE = int(os.getenv("IFM_SQLITE_CACHE_SIZE", "-65536"))
+
+
+def apply_pragmas(engine: Engine) -> None:
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            cursor.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            cursor.execute(f"PRAGMA cache_size={CACHE_SIZE}")
+        finally:
+            cursor.close()
+
+
+def begin_immediate(engine: Engine) -> None:
+    # driver 側の暗黙 BEGIN を止めて、SQLAlchemy の begin で BEGIN IMMEDIATE を出す
+    @event.listens_for(engine, "connect")
+    def _disable_implicit_begin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
@@ -1,41 +1,102 @@
 from __future__ import annotations
 
 import os
+import time
+from contextlib import contextmanager
 
-from fastapi import FastAPI, HTTPException
-from sqlalchemy import text
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 
-from app.db import SessionLocal, engine
+from app import audit, market_cache, metrics, owned, password_pool, ranking
+from app.auth import principal_cache
+from app.db.schema import ensure_schema
+from app.db.session import SessionLocal, db_pool_stats, engine, replica_stats
 from app.models.models import Base
-from app.routers import auth, ideas, deals, resale
-from app.seed import seed_all
+from app.responses import ORJSONResponse
+from app.routers import auth, ideas, deals, resale, scores
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
+
+# route ごとのレイテンシ・クエリ数（GET /metrics）
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.register_collector("db_pool", db_pool_stats)
+metrics.register_collector("replica", replica_stats)
+metrics.register_collector("password_pool", password_pool.stats)
+metrics.register_collector("audit", audit.stats)
+metrics.register_collector("principal_cache", principal_cache.cache.stats)
+metrics.register_collector("owned_cache", owned.cache.stats)
+metrics.register_collector("market_cache", market_cache.cache.stats)
+metrics.register_collector("ranking", ranking.stats)
 
 # routers
 app.include_router(auth.router)
 app.include_router(ideas.router)
 app.include_router(deals.router)
 app.include_router(resale.router)
+app.include_router(scores.router)
+
+
+@contextmanager
+def _phase(name: str):
+    # 起動の各段階にかかった時間を出す
+    t0 = time.perf_counter()
+    yield
+    print(f"=== STARTUP {name}: {(time.perf_counter() - t0) * 1000:.1f}ms ===")
 
 
 @app.on_event("startup")
 def on_startup():
-    # 1) テーブルは常に作る（idempotent）
-    Base.metadata.create_all(bind=engine)
+    t0 = time.perf_counter()
 
-    # 2) seed（空なら入れる）
-    #    デモ用途ならデフォルトONが楽。嫌なら Render の環境変数で IFM_AUTO_SEED=0 にできる。
-    auto_seed = os.getenv("IFM_AUTO_SEED", "1").lower() not in ("0", "false", "no")
+    # 1) スキーマ確認（fingerprint が一致すれば DDL は流さない。app/db/schema.py 参照）
+    with _phase("schema"):
+        print(f"=== STARTUP schema {ensure_schema(engine, Base.metadata)} ===")
+
+    # 2) seed は `python -m app.seed` で一度だけ流す。
+    #    デモ環境で毎回入れたい時だけ IFM_AUTO_SEED=1。
+    auto_seed = os.getenv("IFM_AUTO_SEED", "0").lower() in ("1", "true", "yes")
     if auto_seed:
-        db = SessionLocal()
-        try:
-            seed_all(db)
-        except Exception as e:
-            # デモなら起動失敗は避けたいので握りつぶし（原因調査したいなら raise に変えてOK）
-            print(f"=== STARTUP seed failed (ignored): {type(e).__name__}: {e} ===")
-        finally:
-            db.close()
+        with _phase("seed"):
+            from app.seed import seed_all
+
+            db = SessionLocal()
+            try:
+                seed_all(db)
+            except Exception as e:
+                # デモなら起動失敗は避けたいので握りつぶし（原因調査したいなら raise に変えてOK）
+                print(f"=== STARTUP seed failed (ignored): {type(e).__name__}: {e} ===")
+            finally:
+                db.close()
+
+    # 3) recommended 用ランキング index（IFM_RANKING_INDEX=1 の時だけ）
+    if ranking.ENABLED:
+        with _phase("ranking"):
+            ranking.install()
+            db = SessionLocal()
+            try:
+                print(f"=== STARTUP ranking index built: {ranking.build(db)} ideas ===")
+            finally:
+                db.close()
+
+    # 4) パスワード検証用プロセスプール
+    with _phase("password_pool"):
+        password_pool.start()
+
+    # 5) 監査ログの writer（event loop 上のタスク。sync の startup handler も loop のスレッドで呼ばれる）
+    audit.start()
+
+    # 6) ランキング index の reconcile（別プロセスの書き込みを IFM_RANKING_RECONCILE_SECONDS ごとに拾う）
+    ranking.start()
+
+    print(f"=== STARTUP total: {(time.perf_counter() - t0) * 1000:.1f}ms ===")
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # 積まれている監査イベントを書き切ってから止める
+    await audit.stop()
+    await ranking.stop()
+    password_pool.shutdown()
 
 
 @app.get("/health")
@@ -48,23 +109,20 @@ def health():
     return out
 
 
-# debug endpoints（ALLOW_DEBUG=1 の時だけ）
+@app.get("/health/db")
+def health_db():
+    # 接続プールの使用状況（checked out / overflow / checkout 待ち時間）
+    return db_pool_stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics_endpoint():
+    # Prometheus text format
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# debug endpoints（ALLOW_DEBUG=1 の時だけ。普段は import もしない）
 if os.getenv("ALLOW_DEBUG", "0").lower() in ("1", "true", "yes"):
-    @app.get("/_debug/dbinfo")
-    def debug_dbinfo():
-        try:
-            with engine.connect() as conn:
-                conn.execute(text("SELECT 1"))
-            return {"engine_url": str(engine.url)}
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"dbinfo failed: {type(e).__name__}: {e}")
-
-    @app.post("/_debug/seed")
-    def debug_seed():
-        db = SessionLocal()
-        try:
-            return {"ok": True, "after": seed_all(db)}
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"seed failed: {type(e).__name__}: {e}")
-        finally:
-            db.close()
+    from app.routers import debug
+
+    app.include_router(debug.router)
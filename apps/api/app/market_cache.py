@@ -0,0 +1,76 @@
+"""
+/resale/market のレスポンスキャッシュ。
+
+クエリ（cursor / limit / filters）ごとに、エンコード済みの JSON bytes と ETag を保持する。
+マーケットが変わる書き込み（resale_list / resale_buy）は commit 後に bump() を呼ぶこと。
+bump() で version（= LRUCache.generation）が進み、全エントリが捨てられる。
+
+ETag は本文と次ページ cursor のハッシュなので、ワーカーが違っても同じ内容なら同じ値になる。
+別ワーカーでの書き込みは bump が届かないので、TTL（IFM_MARKET_CACHE_TTL 秒）で古さの上限を決めている。
+
+読み取りレプリカから読んだページは、bump の直後（レプリカがまだ追いついていないかもしれない間）は
+put(store=False) で返すだけにする。そうしないと古いページが次の bump か TTL まで全員に返る。
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+from typing import Hashable
+
+from app.cache import LRUCache
+
+cache = LRUCache(
+    maxsize=int(os.getenv("IFM_MARKET_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("IFM_MARKET_CACHE_TTL", "5")),
+)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    body: bytes
+    etag: str
+    next_cursor: str | None
+
+
+_bumped_at = float("-inf")
+
+
+def version() -> int:
+    return cache.generation
+
+
+def get(key: Hashable) -> Snapshot | None:
+    return cache.get(key)
+
+
+def put(key: Hashable, body: bytes, next_cursor: str | None, version: int, *, store: bool = True) -> Snapshot:
+    h = hashlib.sha256(body)
+    h.update(b"\0" + (next_cursor or "").encode())
+    snap = Snapshot(body=body, etag=f'"{h.hexdigest()[:32]}"', next_cursor=next_cursor)
+    # 読んでいる間に bump されていたら入れない（返すのは構わない）
+    if store:
+        cache.put(key, snap, generation=version)
+    return snap
+
+
+def seconds_since_bump() -> float:
+    return time.monotonic() - _bumped_at
+
+
+def bump() -> None:
+    global _bumped_at
+    _bumped_at = time.monotonic()
+    cache.clear()
+
+
+def not_modified(if_none_match: str | None, etag: str) -> bool:
+    # If-None-Match は弱い比較（W/ は無視）で、カンマ区切りの複数指定と * を許す
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
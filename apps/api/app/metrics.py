@@ -0,0 +1,226 @@
+"""
+リクエストのレイテンシと DB クエリの計測、GET /metrics（Prometheus text format）。
+
+- MetricsMiddleware: route テンプレート（/ideas/{idea_id}/scores など）× method × status ごとの
+  レイテンシ histogram と、リクエストごとのクエリ数・DB 時間の合計
+- SQLAlchemy の before/after_cursor_execute を全 Engine に掛けて、実行中のリクエスト（contextvar）に
+  クエリ数と時間を足す。async engine も中身は sync Engine なので同じフックで拾える
+- ALLOW_DEBUG=1 の時はレスポンスヘッダ X-DB-Queries / X-DB-Time-Ms にも出す
+
+prometheus_client には依存しない（プロセス内の dict を scrape 時に書き出すだけ）。
+gunicorn 等でワーカーが複数ある場合、値はワーカーごと。
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEBUG_HEADERS = os.getenv("ALLOW_DEBUG", "0").lower() in ("1", "true", "yes")
+
+# 秒
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# ルーティングされなかったリクエスト（404 など）は 1 つのラベルにまとめる（ラベルの種類を増やさない）
+UNMATCHED = "<unmatched>"
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)  # 最後は +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _RouteStats:
+    __slots__ = ("latency", "db_queries", "db_seconds")
+
+    def __init__(self) -> None:
+        self.latency = _Histogram()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+
+
+_lock = threading.Lock()
+_routes: dict[tuple[str, str, str], _RouteStats] = {}
+_collectors: list[tuple[str, Callable[[], dict]]] = []
+
+# 実行中のリクエストの [クエリ数, DB 秒]。リクエストの外（起動処理・スクリプト）では None
+_current: ContextVar[Optional[list]] = ContextVar("ifm_db_usage", default=None)
+
+
+# ---------------------------------------------------------------------------
+# DB
+# ---------------------------------------------------------------------------
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("ifm_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["ifm_query_start"].pop()
+    usage = _current.get()
+    if usage is not None:
+        usage[0] += 1
+        usage[1] += time.perf_counter() - started
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    # 失敗した文は after_cursor_execute が呼ばれないので、積んだ開始時刻だけ捨てる
+    conn = context.connection
+    if conn is not None and conn.info.get("ifm_query_start"):
+        conn.info["ifm_query_start"].pop()
+
+
+def in_request() -> bool:
+    """
+    MetricsMiddleware が計測中のリクエストの中か（起動処理や audit writer などのバックグラウンドは False）。
+    """
+    return _current.get() is not None
+
+
+def db_usage() -> tuple[int, float]:
+    """
+    実行中のリクエストでここまでに流したクエリ数と DB 時間（秒）。
+    """
+    usage = _current.get()
+    return (usage[0], usage[1]) if usage is not None else (0, 0.0)
+
+
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED
+
+
+class MetricsMiddleware:
+    """
+    pure ASGI middleware（BaseHTTPMiddleware のように body をラップしない）。
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        usage = [0, 0.0]
+        token = _current.set(usage)
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if DEBUG_HEADERS:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-db-queries", str(usage[0]).encode()))
+                    headers.append((b"x-db-time-ms", f"{usage[1] * 1000:.2f}".encode()))
+                    message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - t0
+            _current.reset(token)
+            key = (scope["method"], _route_label(scope), str(status))
+            with _lock:
+                stats = _routes.get(key)
+                if stats is None:
+                    stats = _routes[key] = _RouteStats()
+                stats.latency.observe(elapsed)
+                stats.db_queries += usage[0]
+                stats.db_seconds += usage[1]
+
+
+# ---------------------------------------------------------------------------
+# /metrics
+# ---------------------------------------------------------------------------
+
+def register_collector(prefix: str, fn: Callable[[], dict]) -> None:
+    """
+    scrape の度に fn() を呼び、数値の値を ifm_<prefix>_<key> の gauge として出す。
+    入れ子の dict はキーを _ でつなぐ。文字列など数値でない値は出さない。
+    （password_pool.stats() のような既存の stats 関数をそのまま渡せる）
+    """
+    _collectors.append((prefix, fn))
+
+
+def _flatten(prefix: str, values: dict):
+    for key, value in values.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            yield from _flatten(name, value)
+        elif isinstance(value, (int, float)):  # bool も int
+            yield name, float(value)
+
+
+def _labels(method: str, route: str, status: str) -> str:
+    route = route.replace("\\", "\\\\").replace('"', '\\"')
+    return f'method="{method}",route="{route}",status="{status}"'
+
+
+def render() -> str:
+    with _lock:
+        snapshot = [
+            (key, list(s.latency.counts), s.latency.sum, s.latency.count, s.db_queries, s.db_seconds)
+            for key, s in sorted(_routes.items())
+        ]
+
+    out = [
+        "# HELP ifm_http_request_duration_seconds Request latency by route and status.",
+        "# TYPE ifm_http_request_duration_seconds histogram",
+    ]
+    for key, counts, total, count, _, _ in snapshot:
+        labels = _labels(*key)
+        cumulative = 0
+        for bound, n in zip(BUCKETS, counts):
+            cumulative += n
+            out.append(f'ifm_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        out.append(f'ifm_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+        out.append(f"ifm_http_request_duration_seconds_sum{{{labels}}} {total}")
+        out.append(f"ifm_http_request_duration_seconds_count{{{labels}}} {count}")
+
+    out.append("# HELP ifm_http_request_db_queries_total SQL statements executed while serving requests.")
+    out.append("# TYPE ifm_http_request_db_queries_total counter")
+    for key, _, _, _, queries, _ in snapshot:
+        out.append(f"ifm_http_request_db_queries_total{{{_labels(*key)}}} {queries}")
+
+    out.append("# HELP ifm_http_request_db_seconds_total Time spent in SQL statements while serving requests.")
+    out.append("# TYPE ifm_http_request_db_seconds_total counter")
+    for key, _, _, _, _, seconds in snapshot:
+        out.append(f"ifm_http_request_db_seconds_total{{{_labels(*key)}}} {seconds}")
+
+    for prefix, fn in _collectors:
+        try:
+            values = list(_flatten(f"ifm_{prefix}", fn()))
+        except Exception as e:
+            out.append(f"# collector {prefix} failed: {type(e).__name__}")
+            continue
+        for name, value in values:
+            out.append(f"# TYPE {name} gauge")
+            out.append(f"{name} {value}")
+
+    return "\n".join(out) + "\n"
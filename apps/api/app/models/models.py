@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import enum
-from datetime import datetime
+from datetime import datetime, timezone
 
 from sqlalchemy import (
     Boolean,
@@ -9,8 +9,11 @@ from sqlalchemy import (
     Enum,
     Float,
     ForeignKey,
+    Index,
     Integer,
+    JSON,
     String,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -62,6 +65,10 @@ class User(Base):
 
 class Idea(Base):
     __tablename__ = "ideas"
+    __table_args__ = (
+        # /ideas/recommended の keyset pagination 用
+        Index("ix_ideas_total_score_id", "total_score", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     seller_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False, index=True)
@@ -84,6 +91,10 @@ class Idea(Base):
     total_score: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
     created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
 
+    # scores の合計と件数（採点のたびに差分で更新する。total_score = score_sum / score_count）
+    score_sum: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default=text("0"))
+    score_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default=text("0"))
+
     # relations
     seller: Mapped["User"] = relationship("User", back_populates="ideas")
     deals: Mapped[list["Deal"]] = relationship("Deal", back_populates="idea", cascade="all, delete-orphan")
@@ -91,6 +102,18 @@ class Idea(Base):
 
 class Deal(Base):
     __tablename__ = "deals"
+    __table_args__ = (
+        # 1 buyer につき 1 idea 1 deal
+        Index("uq_deals_buyer_idea", "buyer_id", "idea_id", unique=True),
+        # exclusive は 1 idea につき 1 件だけ（partial unique index）
+        Index(
+            "uq_deals_exclusive_idea",
+            "idea_id",
+            unique=True,
+            sqlite_where=text("is_exclusive = 1"),
+            postgresql_where=text("is_exclusive"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
 
@@ -104,6 +127,50 @@ class Deal(Base):
     is_exclusive: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
 
+    # 所有者が移転するたびに +1（resale_buy の compare-and-swap 用）
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default=text("0"))
+
     # relations
     idea: Mapped["Idea"] = relationship("Idea", back_populates="deals")
     buyer: Mapped["User"] = relationship("User", back_populates="deals")
+
+
+class Score(Base):
+    """
+    rubric 採点（各軸 0-20、total は 5 軸の合計）。採点者ごとに 1 idea 1 件で、採点し直しは上書き。
+    """
+    __tablename__ = "scores"
+    __table_args__ = (
+        Index("uq_scores_idea_scorer", "idea_id", "scored_by", unique=True),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    idea_id: Mapped[int] = mapped_column(Integer, ForeignKey("ideas.id"), nullable=False)
+
+    logic: Mapped[int] = mapped_column(Integer, nullable=False)
+    originality: Mapped[int] = mapped_column(Integer, nullable=False)
+    market: Mapped[int] = mapped_column(Integer, nullable=False)
+    concreteness: Mapped[int] = mapped_column(Integer, nullable=False)
+    extensibility: Mapped[int] = mapped_column(Integer, nullable=False)
+    total: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    scored_by: Mapped[int | None] = mapped_column(Integer, ForeignKey("users.id"), nullable=True)
+    scored_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+
+class AuditLog(Base):
+    """
+    購入・upgrade・resale の監査ログ。リクエストの中では書かず、app/audit.py の writer がまとめて INSERT する。
+    """
+    __tablename__ = "audit_logs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    actor_user_id: Mapped[int | None] = mapped_column(
+        Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True
+    )
+    action: Mapped[str] = mapped_column(String(100), nullable=False)
+    target_type: Mapped[str] = mapped_column(String(50), nullable=False)
+    target_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    meta: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+    # キューに積んだ時刻（DB に書いた時刻ではない）
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
@@ -1,12 +1,17 @@
 from datetime import datetime
 
-from sqlalchemy import Integer, DateTime, ForeignKey, Boolean
+from sqlalchemy import Integer, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.models import Base
 
 class ResaleListing(Base):
     __tablename__ = "resale_listings"
+    # /resale/market の keyset pagination（created_at desc, id desc）。active_only=true は is_active で絞る方、false は全件の方
+    __table_args__ = (
+        Index("ix_resale_listings_active_created_id", "is_active", "created_at", "id"),
+        Index("ix_resale_listings_created_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     idea_id: Mapped[int] = mapped_column(ForeignKey("ideas.id"), index=True)
@@ -0,0 +1,49 @@
+"""
+buyer ごとの「所有済み idea_id の集合」キャッシュ。
+
+deals を buyer_id で引いた結果を LRU で保持し、/ideas/recommended の
+already_owned 判定と未購入フィルタに使う。
+所有関係が変わる書き込み（購入・転売による移転）は commit 後に invalidate() を呼ぶこと。
+
+別ワーカーでの購入は invalidate が届かないので、TTL（IFM_OWNED_CACHE_TTL 秒）で
+古さの上限を決めている。
+
+読み取りレプリカから読んだ集合は、その buyer を invalidate した直後（IFM_REPLICA_STICKY_SECONDS の間）は
+キャッシュに入れない（market_cache と同じ。遅れているレプリカの集合が TTL の間残らないように）。
+"""
+from __future__ import annotations
+
+import os
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import LRUCache
+from app.db.session import REPLICA_STICKY_SECONDS, is_replica
+from app.models.models import Deal
+
+cache = LRUCache(
+    maxsize=int(os.getenv("IFM_OWNED_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("IFM_OWNED_CACHE_TTL", "30")),
+)
+
+# 最近 invalidate した buyer_id（レプリカから読んだ集合を入れない間だけ覚えておく）
+_recently_invalidated = LRUCache(maxsize=cache.maxsize, ttl=REPLICA_STICKY_SECONDS)
+
+
+async def owned_idea_ids(db: AsyncSession, buyer_id: int) -> frozenset[int]:
+    ids = cache.get(buyer_id)
+    if ids is not None:
+        return ids
+
+    generation = cache.generation
+    ids = frozenset((await db.execute(select(Deal.idea_id).where(Deal.buyer_id == buyer_id))).scalars())
+    if not (is_replica(db) and _recently_invalidated.get(buyer_id)):
+        cache.put(buyer_id, ids, generation=generation)
+    return ids
+
+
+def invalidate(*buyer_ids: int) -> None:
+    cache.invalidate(*buyer_ids)
+    for buyer_id in buyer_ids:
+        _recently_invalidated.put(buyer_id, True)
@@ -0,0 +1,48 @@
+"""
+keyset pagination 用の cursor エンコード/デコード。
+
+cursor は最後に返した行のソートキー（例: (total_score, id)）を
+URL-safe base64 にした不透明な文字列としてクライアントに渡す。
+"""
+from __future__ import annotations
+
+import base64
+import json
+import math
+from typing import Any, Sequence
+
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(key: Sequence[Any]) -> str:
+    raw = json.dumps(list(key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    if not isinstance(key, list) or len(key) != size:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return key
+
+
+def decode_score_cursor(cursor: str) -> tuple[float, int]:
+    """
+    (score, id) の cursor。型が合わない・有限でない値は 400（float() / int() の例外で 500 にしない）。
+    """
+    score, idea_id = decode_cursor(cursor, 2)
+    if (
+        isinstance(score, bool)
+        or not isinstance(score, (int, float))
+        or not math.isfinite(score)
+        or isinstance(idea_id, bool)
+        or not isinstance(idea_id, int)
+    ):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return float(score), idea_id
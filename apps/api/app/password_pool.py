@@ -0,0 +1,112 @@
+"""
+パスワード hash / verify 専用のプロセスプール。
+
+pbkdf2 は CPU を食うので、/auth/login のスレッドや event loop で直接回すと
+ログインが集中した時に他のエンドポイントまで詰まる。ここでは
+
+- IFM_PASSWORD_WORKERS 個のプロセス（0 ならプロセスを使わず AnyIO のスレッドプール）
+- 同時に抱える依頼は IFM_PASSWORD_QUEUE_MAX 件まで。超えたら 503 + Retry-After
+
+で処理する。
+"""
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app import security
+
+_lock = threading.Lock()
+_executor: Optional[Executor] = None
+_workers = int(os.getenv("IFM_PASSWORD_WORKERS", str(os.cpu_count() or 1)))
+_max_queue = int(os.getenv("IFM_PASSWORD_QUEUE_MAX", "256"))
+_in_flight = 0
+rejected = 0
+
+
+def configure(*, workers: Optional[int] = None, max_queue: Optional[int] = None) -> None:
+    """
+    プールを作り直す（ベンチマークやテスト用）。
+    """
+    global _workers, _max_queue
+    shutdown()
+    if workers is not None:
+        _workers = workers
+    if max_queue is not None:
+        _max_queue = max_queue
+
+
+def _get_executor() -> Optional[Executor]:
+    global _executor
+    if _workers <= 0:
+        return None
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                # uvicorn のスレッドごと fork しないよう spawn で起動する
+                _executor = ProcessPoolExecutor(
+                    max_workers=_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _executor
+
+
+def start(wait: bool = False) -> None:
+    """
+    ワーカープロセスを立ち上げておく（初回ログインで spawn を待たせない）。
+    起動を遅らせないよう、既定では warm-up を投げるだけで完了は待たない。
+    """
+    executor = _get_executor()
+    if executor is not None:
+        futures = [executor.submit(security.verify_password, "", "") for _ in range(_workers)]
+        if wait:
+            for f in futures:
+                f.result()
+
+
+def shutdown() -> None:
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+async def _run(fn, *args):
+    global _in_flight, rejected
+    if _in_flight >= _max_queue:
+        rejected += 1
+        raise HTTPException(status_code=503, detail="too many logins", headers={"Retry-After": "1"})
+
+    _in_flight += 1
+    try:
+        executor = _get_executor()
+        if executor is None:
+            return await run_in_threadpool(fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+    finally:
+        _in_flight -= 1
+
+
+async def verify_and_update(plain_password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    return await _run(security.verify_and_update, plain_password, password_hash)
+
+
+async def hash_password(plain_password: str) -> str:
+    return await _run(security.hash_password, plain_password)
+
+
+def stats() -> dict:
+    return {
+        "workers": _workers,
+        "in_flight": _in_flight,
+        "max_queue": _max_queue,
+        "rejected": rejected,
+    }
@@ -0,0 +1,354 @@
+"""
+/ideas/recommended 用のプロセス内ランキング index。
+
+(total_score, id) の降順で idea の表示用カラムを保持する sorted list。
+起動時に ideas テーブルから build し、以降は Session の commit をフックして
+idea の追加・更新・削除を差分で反映する。
+
+IFM_RANKING_INDEX=1 の時だけ有効。
+commit フックが拾えるのはこのプロセスの書き込みだけなので（別ワーカー・scripts/recompute_scores.py・
+sqlite3 CLI などは拾えない）、バックグラウンドで IFM_RANKING_RECONCILE_SECONDS（default 30）ごとに
+テーブルの集計（status ごとの件数・max(id)・total_score 等の合計）を index と比べ、違えば作り直す。
+別プロセスの書き込みが見えるまでの遅れはこの間隔が上限（0 にすると reconcile しない）。
+/_debug/ranking でも差分の確認・再構築ができる。
+
+index はこのプロセスが primary に commit した内容で更新されるので、読み取りレプリカ
+（REPLICA_DATABASE_URL）があっても /ideas/recommended の並びはレプリカの遅れに関係なく index から返る。
+レプリカ / primary の振り分け（get_async_read_db）が効くのは owned（already_owned と除外）の方だけ。
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Callable, NamedTuple
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from app.models.models import Idea
+
+ENABLED = os.getenv("IFM_RANKING_INDEX", "0").lower() in ("1", "true", "yes")
+RECONCILE_SECONDS = float(os.getenv("IFM_RANKING_RECONCILE_SECONDS", "30"))
+
+# レスポンスに出る列。どれかが変わったら index を更新する
+_TRACKED_ATTRS = ("title", "status", "total_score", "exclusive_option_price")
+
+_PENDING_KEY = "ranking_pending"
+
+
+class RankedIdea(NamedTuple):
+    id: int
+    title: str
+    status: Any
+    total_score: float
+    exclusive_option_price: float | None
+
+
+def _key(row: RankedIdea) -> tuple[float, int]:
+    # 昇順ソートで (total_score, id) の降順になるように符号を反転
+    return (-float(row.total_score or 0), -int(row.id))
+
+
+class RankingIndex:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._keys: list[tuple[float, int]] = []
+        self._rows: dict[int, RankedIdea] = {}
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def rebuild(self, rows: list[RankedIdea]) -> None:
+        by_id = {r.id: r for r in rows}
+        keys = sorted(_key(r) for r in by_id.values())
+        with self._lock:
+            self._rows = by_id
+            self._keys = keys
+            self.ready = True
+
+    def upsert(self, row: RankedIdea) -> None:
+        with self._lock:
+            self._discard(row.id)
+            self._rows[row.id] = row
+            insort(self._keys, _key(row))
+
+    def remove(self, idea_id: int) -> None:
+        with self._lock:
+            self._discard(idea_id)
+
+    def _discard(self, idea_id: int) -> None:
+        old = self._rows.pop(idea_id, None)
+        if old is None:
+            return
+        k = _key(old)
+        i = bisect_left(self._keys, k)
+        if i < len(self._keys) and self._keys[i] == k:
+            del self._keys[i]
+
+    def page(
+        self,
+        after: tuple[float, int] | None,
+        limit: int,
+        skip: Callable[[int], bool] | None = None,
+    ) -> tuple[list[RankedIdea], bool]:
+        """
+        after の次から limit 件。2 つ目の戻り値は続きがあるかどうか。
+        """
+        out: list[RankedIdea] = []
+        with self._lock:
+            i = bisect_right(self._keys, (-float(after[0]), -int(after[1]))) if after else 0
+            n = len(self._keys)
+            while i < n:
+                idea_id = -self._keys[i][1]
+                i += 1
+                if skip is not None and skip(idea_id):
+                    continue
+                if len(out) == limit:
+                    return out, True
+                out.append(self._rows[idea_id])
+        return out, False
+
+    def snapshot(self) -> list[RankedIdea]:
+        with self._lock:
+            return [self._rows[-k[1]] for k in self._keys]
+
+
+index = RankingIndex()
+
+
+def load_rows(db: Session) -> list[RankedIdea]:
+    rows = db.execute(
+        select(
+            Idea.id,
+            Idea.title,
+            Idea.status,
+            Idea.total_score,
+            Idea.exclusive_option_price,
+        ).order_by(Idea.total_score.desc(), Idea.id.desc())
+    ).all()
+    return [RankedIdea(*r) for r in rows]
+
+
+def build(db: Session) -> int:
+    index.rebuild(load_rows(db))
+    return len(index)
+
+
+def check(db: Session) -> dict:
+    """
+    index と ideas テーブルを突き合わせる。
+    """
+    table = load_rows(db)
+    current = index.snapshot()
+    table_by_id = {r.id: r for r in table}
+    index_by_id = {r.id: r for r in current}
+
+    missing = sorted(set(table_by_id) - set(index_by_id))
+    extra = sorted(set(index_by_id) - set(table_by_id))
+    mismatched = sorted(
+        i for i in set(table_by_id) & set(index_by_id) if table_by_id[i] != index_by_id[i]
+    )
+    order_ok = [r.id for r in table] == [r.id for r in current]
+
+    return {
+        "ok": not (missing or extra or mismatched) and order_ok,
+        "index_size": len(current),
+        "table_size": len(table),
+        "missing": missing[:50],
+        "extra": extra[:50],
+        "mismatched": mismatched[:50],
+        "order_ok": order_ok,
+    }
+
+
+# --- reconcile -----------------------------------------------------------
+
+# status -> (件数, max(id), sum(total_score), sum(exclusive_option_price), sum(len(title)))
+Fingerprint = dict[str, tuple[int, int, float, float, int]]
+
+_reconciler: asyncio.Task | None = None
+_stats = {"reconciles": 0, "rebuilds": 0, "failed": 0, "last_reconcile_ms": 0.0}
+
+
+def _status_key(status: Any) -> str:
+    return str(getattr(status, "value", status))
+
+
+def table_fingerprint(db: Session) -> Fingerprint:
+    rows = db.execute(
+        select(
+            Idea.status,
+            func.count(),
+            func.max(Idea.id),
+            func.sum(Idea.total_score),
+            func.sum(func.coalesce(Idea.exclusive_option_price, 0)),
+            func.sum(func.length(Idea.title)),
+        ).group_by(Idea.status)
+    ).all()
+    return {
+        _status_key(status): (n, max_id, float(score or 0), float(price or 0), int(title_len or 0))
+        for status, n, max_id, score, price, title_len in rows
+    }
+
+
+def index_fingerprint(rows: list[RankedIdea]) -> Fingerprint:
+    groups: dict[str, list[RankedIdea]] = {}
+    for r in rows:
+        groups.setdefault(_status_key(r.status), []).append(r)
+    return {
+        status: (
+            len(g),
+            max(r.id for r in g),
+            math.fsum(float(r.total_score or 0) for r in g),
+            math.fsum(float(r.exclusive_option_price or 0) for r in g),
+            sum(len(r.title) for r in g),
+        )
+        for status, g in groups.items()
+    }
+
+
+def _same(a: Fingerprint, b: Fingerprint) -> bool:
+    if a.keys() != b.keys():
+        return False
+    for status, (n, max_id, score, price, title_len) in a.items():
+        n2, max_id2, score2, price2, title_len2 = b[status]
+        if (n, max_id, title_len) != (n2, max_id2, title_len2):
+            return False
+        if not (math.isclose(score, score2, abs_tol=1e-6) and math.isclose(price, price2, abs_tol=1e-6)):
+            return False
+    return True
+
+
+def reconcile(db: Session) -> bool:
+    """
+    テーブルの集計と index が食い違っていれば作り直す。作り直したら True。
+    """
+    t0 = time.perf_counter()
+    stale = not _same(table_fingerprint(db), index_fingerprint(index.snapshot()))
+    if stale:
+        build(db)
+        _stats["rebuilds"] += 1
+    _stats["reconciles"] += 1
+    _stats["last_reconcile_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return stale
+
+
+def _reconcile_once() -> None:
+    from app.db.session import SessionLocal
+
+    with SessionLocal() as db:
+        reconcile(db)
+
+
+async def _run() -> None:
+    while True:
+        await asyncio.sleep(RECONCILE_SECONDS)
+        try:
+            await asyncio.to_thread(_reconcile_once)
+        except Exception as e:
+            _stats["failed"] += 1
+            print(f"=== RANKING reconcile failed: {type(e).__name__}: {e} ===")
+
+
+def start() -> None:
+    """
+    reconcile のループを起動する（event loop の中、アプリの startup から呼ぶ）。
+    """
+    global _reconciler
+    if not ENABLED or RECONCILE_SECONDS <= 0 or _reconciler is not None:
+        return
+    _reconciler = asyncio.get_running_loop().create_task(_run())
+
+
+async def stop() -> None:
+    global _reconciler
+    task, _reconciler = _reconciler, None
+    if task is None:
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+def stats() -> dict:
+    return dict(
+        _stats,
+        enabled=ENABLED,
+        ready=index.ready,
+        size=len(index),
+        reconcile_seconds=RECONCILE_SECONDS,
+        running=_reconciler is not None,
+    )
+
+
+# --- commit フック -------------------------------------------------------
+
+def _row_of(idea: Idea) -> RankedIdea:
+    return RankedIdea(
+        id=idea.id,
+        title=idea.title,
+        status=idea.status,
+        total_score=idea.total_score,
+        exclusive_option_price=idea.exclusive_option_price,
+    )
+
+
+def _tracked_changed(idea: Idea) -> bool:
+    state = inspect(idea)
+    return any(state.attrs[a].history.has_changes() for a in _TRACKED_ATTRS)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    for obj in session.new:
+        if isinstance(obj, Idea):
+            pending[obj.id] = _row_of(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Idea) and _tracked_changed(obj):
+            pending[obj.id] = _row_of(obj)
+    for obj in session.deleted:
+        if isinstance(obj, Idea):
+            pending[obj.id] = None
+
+
+def _after_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending or not index.ready:
+        return
+    for idea_id, row in pending.items():
+        if row is None:
+            index.remove(idea_id)
+        else:
+            index.upsert(row)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+_HOOKS = (("after_flush", _after_flush), ("after_commit", _after_commit), ("after_rollback", _after_rollback))
+
+
+def installed() -> bool:
+    return event.contains(Session, "after_flush", _after_flush)
+
+
+def install() -> None:
+    if installed():
+        return
+    for name, fn in _HOOKS:
+        event.listen(Session, name, fn)
+
+
+def uninstall() -> None:
+    if not installed():
+        return
+    for name, fn in _HOOKS:
+        event.remove(Session, name, fn)
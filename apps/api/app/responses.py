@@ -0,0 +1,31 @@
+"""
+JSON レスポンスのエンコード。
+
+app の default_response_class は ORJSONResponse（orjson があれば orjson、無ければ標準の json）。
+行数の多い一覧は、SQL の結果タプルから dict を作ってそのまま ORJSONResponse で返す
+（jsonable_encoder と response_model の検証を通さない。型は schemas の *Out で OpenAPI に出す）。
+
+FastAPI 付属の ORJSONResponse は deprecated なので使わない。
+"""
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson は requirements.txt に入っている
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode()
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -2,11 +2,13 @@ from __future__ import annotations
 
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_db
+from app import password_pool
+from app.db.session import AsyncWriteSessionLocal, get_async_db
 from app.models.models import User
-from app.security import create_access_token, verify_password
+from app.security import create_access_token
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -16,16 +18,45 @@ class LoginReq(BaseModel):
     password: str
 
 
+async def _find_user(db: AsyncSession, email: str):
+    return (
+        await db.execute(
+            select(User.id, User.role, User.password_hash).where(User.email == email)
+        )
+    ).first()
+
+
+async def _store_rehash(user_id: int, old_hash: str, new_hash: str) -> None:
+    # 書き込みは writer lane で（SQLite 本番プロファイルでは BEGIN IMMEDIATE。
+    # 読み取り用の接続で read → write に上げると、hash 中に他の writer が commit していた時に SQLITE_BUSY）
+    # 同時ログインで別の hash に変わっていたら上書きしない
+    async with AsyncWriteSessionLocal() as db:
+        await db.execute(
+            update(User)
+            .where(User.id == user_id, User.password_hash == old_hash)
+            .values(password_hash=new_hash)
+        )
+        await db.commit()
+
+
 @router.post("/login")
-def login(req: LoginReq, db: Session = Depends(get_db)):
+async def login(req: LoginReq, db: AsyncSession = Depends(get_async_db)):
     try:
-        user = db.query(User).filter(User.email == req.email).first()
+        user = await _find_user(db, req.email)
+        # hash の検証（数十〜数百 ms）の間、プールの接続を握ったままにしない（get_current_user と同じ）
+        await db.rollback()
         if not user:
             raise HTTPException(status_code=401, detail="invalid credentials")
 
-        if not verify_password(req.password, user.password_hash or ""):
+        # pbkdf2 は専用プロセスプールで回す（event loop / スレッドを塞がない）
+        ok, new_hash = await password_pool.verify_and_update(req.password, user.password_hash or "")
+        if not ok:
             raise HTTPException(status_code=401, detail="invalid credentials")
 
+        # rounds が IFM_PBKDF2_ROUNDS 未満の hash はここで作り直す（別の短いトランザクション）
+        if new_hash:
+            await _store_rehash(user.id, user.password_hash, new_hash)
+
         role_val = getattr(user.role, "value", user.role)
         token = create_access_token(
             data={
@@ -1,56 +1,157 @@
 from __future__ import annotations
 
+from datetime import datetime, timezone
+
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import Integer, cast, exists, func, insert, literal, or_, select, true, update
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
 
 from app.auth.deps import get_current_user
-from app.db.session import get_db
-from app.models.models import Deal, Idea, User
-
-def _exclusive_already_taken(db, idea_id: int) -> bool:
-    # is_exclusive=True のDealが既に存在するか
-    from app.models.models import Deal
-    return (
-        db.query(Deal)
-        .filter(Deal.idea_id == idea_id, Deal.is_exclusive == True)  # noqa: E712
-        .first()
-        is not None
-    )
+from app.auth.principal_cache import Principal
+from app.db.session import get_async_write_db
+from app.models.models import Deal, Idea
+from app import audit, owned
 
 router = APIRouter(prefix="/deals", tags=["deals"])
 
+BATCH_MAX_ITEMS = 200
+
 
 class DealIn(BaseModel):
     idea_id: int
     is_exclusive: bool = False
 
 
-def _calc_amount(idea: Idea, is_exclusive: bool) -> int:
+class _int_trunc(FunctionElement):
+    """
+    小数部を切り捨てて整数にする（バッチ側の int() と同じ）。
+    CAST(... AS INTEGER) は SQLite では切り捨てだが Postgres では四捨五入になるので、PG では trunc() を挟む。
+    """
+    type = Integer()
+    inherit_cache = True
+
+
+@compiles(_int_trunc)
+def _compile_int_trunc(element, compiler, **kw):
+    return compiler.process(cast(*element.clauses, Integer), **kw)
+
+
+@compiles(_int_trunc, "postgresql")
+def _compile_int_trunc_pg(element, compiler, **kw):
+    return compiler.process(cast(func.trunc(*element.clauses), Integer), **kw)
+
+
+def _amount_expr(is_exclusive: bool):
     """
-    deals.amount is NOT NULL => always return int.
+    deals.amount is NOT NULL => always an int.
+    exclusive は exclusive_option_price（NULL なら購入不可）、それ以外は price（NULL なら 0）。
     """
     if is_exclusive:
-        price = getattr(idea, "exclusive_option_price", None)
-        if price is None:
-            raise HTTPException(status_code=400, detail="exclusive option not available")
-        return int(price)
+        return _int_trunc(Idea.exclusive_option_price)
+    return func.coalesce(_int_trunc(Idea.price), 0)
+
+
+def _purchase_stmt(buyer_id: int, idea_id: int, is_exclusive: bool):
+    """
+    INSERT INTO deals (...) SELECT ... FROM ideas WHERE id = :idea_id RETURNING id
+
+    idea が無い / exclusive が買えない時は 0 行。
+    既に買っている・exclusive が取られている時は unique index で IntegrityError。
+    """
+    src = select(
+        Idea.id,
+        literal(buyer_id),
+        _amount_expr(is_exclusive),
+        literal(is_exclusive),
+        literal(datetime.now(timezone.utc)),
+    ).where(Idea.id == idea_id)
+    if is_exclusive:
+        src = src.where(Idea.exclusive_option_price.is_not(None))
+
+    return (
+        insert(Deal)
+        .from_select(["idea_id", "buyer_id", "amount", "is_exclusive", "created_at"], src)
+        .returning(Deal.id)
+    )
+
+
+def _upgrade_stmt(buyer_id: int, idea_id: int):
+    """
+    non-exclusive -> exclusive の条件付き UPDATE。対象が無ければ 0 行。
+    他の buyer が exclusive を持っていれば partial unique index で IntegrityError。
+    """
+    price = (
+        select(_amount_expr(True))
+        .where(Idea.id == idea_id)
+        .scalar_subquery()
+    )
+    available = exists().where(Idea.id == idea_id, Idea.exclusive_option_price.is_not(None))
+    return (
+        update(Deal)
+        .where(
+            Deal.buyer_id == buyer_id,
+            Deal.idea_id == idea_id,
+            Deal.is_exclusive != true(),
+            available,
+        )
+        .values(is_exclusive=True, amount=price)
+        .returning(Deal.id)
+    )
+
+
+async def _try(db: AsyncSession, stmt) -> tuple[int | None, bool]:
+    """
+    stmt を実行して commit する。戻り値は (returning の id, unique 制約違反だったか)。
+    """
+    try:
+        row_id = (await db.execute(stmt)).scalar_one_or_none()
+        if row_id is None:
+            await db.rollback()
+            return None, False
+        await db.commit()
+        return row_id, False
+    except IntegrityError:
+        await db.rollback()
+        return None, True
+
 
-    for attr in ("price", "base_price", "standard_price", "non_exclusive_price"):
-        v = getattr(idea, attr, None)
-        if v is not None:
-            return int(v)
+async def _explain_failure(db: AsyncSession, buyer_id: int, body: DealIn, conflict: bool) -> HTTPException:
+    """
+    失敗した時だけ状態を読み直して、従来と同じエラーを返す。
+    """
+    idea = (
+        await db.execute(select(Idea.exclusive_option_price).where(Idea.id == body.idea_id))
+    ).first()
+    if idea is None:
+        return HTTPException(status_code=404, detail="idea not found")
+    if body.is_exclusive and idea.exclusive_option_price is None:
+        return HTTPException(status_code=400, detail="exclusive option not available")
 
-    return 0
+    deal = (
+        await db.execute(
+            select(Deal.is_exclusive).where(Deal.buyer_id == buyer_id, Deal.idea_id == body.idea_id)
+        )
+    ).first()
+    if deal is None:
+        # 自分は持っていないのに制約違反 = exclusive が他の buyer に取られている
+        return HTTPException(status_code=409, detail="exclusive already taken")
+    if deal.is_exclusive and not body.is_exclusive:
+        # テスト期待の文言に合わせる
+        return HTTPException(status_code=409, detail="cannot downgrade exclusive")
+    if conflict and body.is_exclusive and not deal.is_exclusive:
+        return HTTPException(status_code=409, detail="exclusive already taken")
+    return HTTPException(status_code=409, detail="already purchased")
 
 
 @router.post("")
-def create_or_update_deal(
+async def create_or_update_deal(
     body: DealIn,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
 ):
     """
     Purchase / upgrade deal.
@@ -61,63 +162,156 @@ def create_or_update_deal(
     - If already purchased non-exclusive, is_exclusive=true upgrades (if available)
     - Downgrade (exclusive -> non-exclusive) is forbidden => 409
     - Re-buy same tier => 409
+
+    一意性は DB の unique index（buyer_id, idea_id）と exclusive の partial unique index で担保し、
+    購入は INSERT ... SELECT、upgrade は条件付き UPDATE のそれぞれ 1 文で行う。
     """
-    idea = db.execute(select(Idea).where(Idea.id == body.idea_id)).scalar_one_or_none()
-    if not idea:
-        raise HTTPException(status_code=404, detail="idea not found")
+    is_exclusive = bool(body.is_exclusive)
+
+    # New purchase
+    deal_id, conflict = await _try(db, _purchase_stmt(current_user.id, body.idea_id, is_exclusive))
+    if deal_id is not None:
+        owned.invalidate(current_user.id)
+        audit.record("deal.purchase", "idea", body.idea_id, current_user.id, deal_id=deal_id, is_exclusive=is_exclusive)
+        return {"ok": True, "upgraded": False}
 
-    amount = _calc_amount(idea, bool(body.is_exclusive))
+    # Upgrade path（既に non-exclusive で持っている場合）
+    if conflict and is_exclusive:
+        deal_id, conflict = await _try(db, _upgrade_stmt(current_user.id, body.idea_id))
+        if deal_id is not None:
+            audit.record("deal.upgrade", "idea", body.idea_id, current_user.id, deal_id=deal_id, is_exclusive=True)
+            return {"ok": True, "upgraded": True}
 
-    deal = (
-        db.execute(
-            select(Deal).where(
-                Deal.buyer_id == current_user.id,
-                Deal.idea_id == body.idea_id,
-            )
+    raise await _explain_failure(db, current_user.id, body, conflict)
+
+
+class _Rejected(Exception):
+    def __init__(self, status_code: int, detail: str) -> None:
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _plan_item(
+    item: DealIn,
+    ideas: dict[int, tuple],
+    mine: dict[int, dict],
+    taken_by_others: set[int],
+) -> bool:
+    """
+    create_or_update_deal と同じルールを、読み込み済みの状態に対して適用する。
+    mine は同じ cart の後続 item から見えるようにその場で書き換える。戻り値は upgraded。
+    """
+    idea = ideas.get(item.idea_id)
+    if idea is None:
+        raise _Rejected(404, "idea not found")
+    price, exclusive_price = idea
+    is_exclusive = bool(item.is_exclusive)
+    if is_exclusive and exclusive_price is None:
+        raise _Rejected(400, "exclusive option not available")
+    amount = int(exclusive_price) if is_exclusive else int(price or 0)
+
+    deal = mine.get(item.idea_id)
+    if deal is None:
+        if is_exclusive and item.idea_id in taken_by_others:
+            raise _Rejected(409, "exclusive already taken")
+        mine[item.idea_id] = {"id": None, "is_exclusive": is_exclusive, "amount": amount}
+        return False
+
+    if deal["is_exclusive"] and not is_exclusive:
+        raise _Rejected(409, "cannot downgrade exclusive")
+    if not deal["is_exclusive"] and is_exclusive:
+        if item.idea_id in taken_by_others:
+            raise _Rejected(409, "exclusive already taken")
+        deal.update(is_exclusive=True, amount=amount, upgraded=True)
+        return True
+    raise _Rejected(409, "already purchased")
+
+
+async def _checkout(db: AsyncSession, buyer_id: int, items: list[DealIn]) -> list[dict]:
+    idea_ids = {i.idea_id for i in items}
+
+    # 1) ideas
+    ideas = {
+        r.id: (r.price, r.exclusive_option_price)
+        for r in await db.execute(
+            select(Idea.id, Idea.price, Idea.exclusive_option_price).where(Idea.id.in_(idea_ids))
         )
-        .scalar_one_or_none()
-    )
+    }
 
-    # New purchase
-    if not deal:
-        # Exclusive is one-per-idea (someone else may already own it)
-        if bool(body.is_exclusive) and _exclusive_already_taken(db, body.idea_id):
-            raise HTTPException(status_code=409, detail="exclusive already taken")
-        deal = Deal(
-            buyer_id=current_user.id,
-            idea_id=body.idea_id,
-            amount=amount,  # NOT NULL
-            is_exclusive=bool(body.is_exclusive),
+    # 2) 自分の deal と、他の buyer の exclusive deal
+    mine: dict[int, dict] = {}
+    taken_by_others: set[int] = set()
+    rows = await db.execute(
+        select(Deal.id, Deal.buyer_id, Deal.idea_id, Deal.is_exclusive).where(
+            Deal.idea_id.in_(idea_ids),
+            or_(Deal.buyer_id == buyer_id, Deal.is_exclusive == true()),
         )
-        if hasattr(deal, "status") and getattr(deal, "status") is None:
-            try:
-                deal.status = "COMPLETED"
-            except Exception:
-                pass
+    )
+    for r in rows:
+        if r.buyer_id == buyer_id:
+            mine[r.idea_id] = {"id": r.id, "is_exclusive": bool(r.is_exclusive)}
+        else:
+            taken_by_others.add(r.idea_id)
 
-        db.add(deal)
+    results = []
+    for item in items:
         try:
-            db.commit()
-        except IntegrityError:
-            db.rollback()
-            raise HTTPException(status_code=409, detail="exclusive already taken")
-        return {"ok": True, "upgraded": False}
+            upgraded = _plan_item(item, ideas, mine, taken_by_others)
+            results.append({"idea_id": item.idea_id, "ok": True, "upgraded": upgraded})
+        except _Rejected as e:
+            results.append({"idea_id": item.idea_id, "ok": False, "status": e.status_code, "detail": e.detail})
 
-    # Existing purchase
-    if deal.is_exclusive and not body.is_exclusive:
-        # テスト期待の文言に合わせる
-        raise HTTPException(status_code=409, detail="cannot downgrade exclusive")
+    now = datetime.now(timezone.utc)
+    new_deals = [
+        {"idea_id": idea_id, "buyer_id": buyer_id, "amount": d["amount"], "is_exclusive": d["is_exclusive"], "created_at": now}
+        for idea_id, d in mine.items()
+        if d["id"] is None
+    ]
+    upgrades = [
+        {"id": d["id"], "is_exclusive": True, "amount": d["amount"]}
+        for d in mine.values()
+        if d["id"] is not None and d.get("upgraded")
+    ]
+    if new_deals:
+        await db.execute(insert(Deal), new_deals)
+    if upgrades:
+        await db.execute(update(Deal), upgrades)
+    await db.commit()
+    return results
+
+
+@router.post("/batch")
+async def create_or_update_deals(
+    items: list[DealIn],
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Cart checkout: POST /deals と同じルールを item ごとに適用し、1 トランザクションで commit する。
+
+    読み込みは ideas と deals の 2 クエリだけ。結果は item ごとに
+    {"idea_id", "ok", "upgraded"} か {"idea_id", "ok": false, "status", "detail"} を返す。
+    同じ idea が cart に複数あれば順番に適用したのと同じ結果になる。
+    """
+    if not items:
+        raise HTTPException(status_code=400, detail="empty cart")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"too many items (max {BATCH_MAX_ITEMS})")
 
-    # Upgrade path
-    if (not deal.is_exclusive) and body.is_exclusive:
-        deal.is_exclusive = True
-        deal.amount = amount
+    # 読み込みと commit の間に他の購入が割り込んだら（unique index 違反）、状態を読み直して 1 回だけやり直す
+    for attempt in range(2):
         try:
-            db.commit()
+            results = await _checkout(db, current_user.id, items)
+            break
         except IntegrityError:
-            db.rollback()
-            raise HTTPException(status_code=409, detail="exclusive already taken")
-        return {"ok": True, "upgraded": True}
+            await db.rollback()
+            if attempt:
+                raise HTTPException(status_code=409, detail="cart conflicted with a concurrent purchase, retry")
 
-    # Same tier re-purchase
-    raise HTTPException(status_code=409, detail="already purchased")
+    if any(r["ok"] for r in results):
+        owned.invalidate(current_user.id)
+    for item, r in zip(items, results):
+        if r["ok"]:
+            action = "deal.upgrade" if r["upgraded"] else "deal.purchase"
+            audit.record(action, "idea", item.idea_id, current_user.id, is_exclusive=bool(item.is_exclusive), batch=True)
+    return {"ok": all(r["ok"] for r in results), "results": results}
@@ -0,0 +1,65 @@
+"""
+/_debug/* （ALLOW_DEBUG=1 の時だけ main.py から include される）。
+"""
+from __future__ import annotations
+
+from fastapi import APIRouter, HTTPException
+from sqlalchemy import text
+
+from app import audit, market_cache, owned, password_pool, ranking
+from app.auth import principal_cache
+from app.db.session import SessionLocal, engine
+from app.seed import seed_all
+
+router = APIRouter(prefix="/_debug", tags=["debug"])
+
+
+@router.get("/dbinfo")
+def debug_dbinfo():
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return {"engine_url": str(engine.url)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"dbinfo failed: {type(e).__name__}: {e}")
+
+
+@router.post("/seed")
+def debug_seed():
+    db = SessionLocal()
+    try:
+        return {"ok": True, "after": seed_all(db)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"seed failed: {type(e).__name__}: {e}")
+    finally:
+        db.close()
+
+
+@router.get("/ranking")
+def debug_ranking(repair: bool = False):
+    if not ranking.ENABLED:
+        raise HTTPException(status_code=404, detail="ranking index disabled")
+    db = SessionLocal()
+    try:
+        out = ranking.check(db)
+        if repair and not out["ok"]:
+            ranking.build(db)
+            out["repaired"] = True
+        return out
+    finally:
+        db.close()
+
+
+@router.get("/caches")
+def debug_caches():
+    return {
+        "owned_ideas": owned.cache.stats(),
+        "market": dict(market_cache.cache.stats(), version=market_cache.version()),
+        "principals": principal_cache.cache.stats(),
+        "password_pool": password_pool.stats(),
+    }
+
+
+@router.get("/audit")
+def debug_audit():
+    return audit.stats()
@@ -1,35 +1,171 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import select
-from app.db import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, select
+from sqlalchemy.exc import DBAPIError
+from app.db.session import get_async_read_db
 from app.models import Idea
 from app.auth.deps import get_current_user
+from app.pagination import NEXT_CURSOR_HEADER, decode_score_cursor, encode_cursor
+from app.responses import ORJSONResponse
+from app.schemas.schemas import RecommendedIdeaOut, SearchIdeaOut
+from app import ranking, search
+from app.owned import owned_idea_ids
 
 router = APIRouter()
 
-@router.get("/ideas/recommended")
-def recommended(
-    include_owned: bool = Query(True),
-    db: Session = Depends(get_db),
+
+async def _page_from_sql(db: AsyncSession, owned: frozenset[int], after, limit: int, include_owned: bool):
+    # レスポンスで使う列だけを取る（body は読まない）。
+    # 所有済みは owned の集合で弾くので、その分だけ多めに読んでおけば通常は 1 往復で埋まる
+    batch = limit + 1 if include_owned else min(limit + 1 + len(owned), (limit + 1) * 4)
+    base = select(
+        Idea.id,
+        Idea.title,
+        Idea.status,
+        Idea.total_score,
+        Idea.exclusive_option_price,
+    ).order_by(Idea.total_score.desc(), Idea.id.desc()).limit(batch)
+
+    out = []
+    while True:
+        stmt = base
+        if after is not None:
+            score, last_id = after
+            stmt = stmt.where(
+                or_(
+                    Idea.total_score < score,
+                    and_(Idea.total_score == score, Idea.id < last_id),
+                )
+            )
+        rows = (await db.execute(stmt)).all()
+
+        for r in rows:
+            if not include_owned and r.id in owned:
+                continue
+            if len(out) == limit:
+                return out, True
+            out.append(r)
+
+        if len(rows) < batch:
+            return out, False
+        after = (rows[-1].total_score, rows[-1].id)
+
+
+def _page_from_index(owned: frozenset[int], after, limit: int, include_owned: bool):
+    skip = None if include_owned else owned.__contains__
+    return ranking.index.page(after, limit, skip)
+
+
+@router.get("/ideas/recommended", response_model=list[RecommendedIdeaOut])
+async def recommended(
+    include_owned: bool = Query(False),
+    cursor: str | None = Query(None),
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_read_db),
     user = Depends(get_current_user),
 ):
+    """
+    total_score desc, id desc の keyset pagination。
+    次ページがあれば X-Next-Cursor ヘッダに cursor を返す。
+
+    行は (id, title, status, total_score, exclusive_option_price) のタプルのまま受け取り、
+    dict にしてそのまま orjson でエンコードする（app.responses 参照）。
+    """
+    after = decode_score_cursor(cursor) if cursor else None
+
     try:
-        ideas = db.query(Idea).all()
+        owned = await owned_idea_ids(db, user.id)
+        # index は primary の内容（レプリカの遅れは受けない）。db の振り分けが効くのは owned だけ
+        if ranking.ENABLED and ranking.index.ready:
+            rows, has_more = _page_from_index(owned, after, limit, include_owned)
+        else:
+            rows, has_more = await _page_from_sql(db, owned, after, limit, include_owned)
 
-        result = []
-        for idea in ideas:
-            result.append({
-                "id": idea.id,
-                "title": idea.title,
-                "status": idea.status,
-                "total_score": idea.total_score,
-                "exclusive_option_price": idea.exclusive_option_price,
-            })
+        headers = {}
+        if has_more:
+            last = rows[-1]
+            headers[NEXT_CURSOR_HEADER] = encode_cursor([last.total_score, last.id])
 
-        return result
+        result = [
+            {
+                "id": idea_id,
+                "title": title,
+                "status": status,
+                "total_score": total_score,
+                "exclusive_option_price": exclusive_option_price,
+                "already_owned": idea_id in owned,
+            }
+            for idea_id, title, status, total_score, exclusive_option_price in rows
+        ]
+        return ORJSONResponse(result, headers=headers)
 
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"RECOMMENDED_FATAL: {type(e).__name__}: {e}"
         )
+
+
+@router.get("/ideas/search", response_model=list[SearchIdeaOut])
+async def search_ideas(
+    q: str = Query(..., min_length=1, max_length=200),
+    include_owned: bool = Query(True),
+    cursor: str | None = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_read_db),
+    user = Depends(get_current_user),
+):
+    """
+    title / summary / body の全文検索（app/search.py）。
+    関連度と total_score を混ぜた rank desc, id desc の keyset pagination で、
+    次ページがあれば X-Next-Cursor ヘッダに cursor を返す。
+    """
+    words = search.terms(q)
+    if not words:
+        raise HTTPException(status_code=400, detail="empty query")
+
+    after = decode_score_cursor(cursor) if cursor else None
+
+    owned = await owned_idea_ids(db, user.id)
+    # 所有済みを除く場合は、その分だけ多めに読む（_page_from_sql と同じ考え方）
+    batch = limit if include_owned else min(limit + len(owned), limit * 4)
+    out = []
+    has_more = False
+    try:
+        while True:
+            stmt = search.page_stmt(db.bind.dialect.name, words, after, batch)
+            rows = (await db.execute(stmt)).all()
+            for r in rows:
+                if not include_owned and r.id in owned:
+                    continue
+                if len(out) == limit:
+                    has_more = True
+                    break
+                out.append(r)
+            if has_more or len(rows) <= batch:
+                break
+            after = (rows[-1].rank, rows[-1].id)
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except DBAPIError as e:
+        # 検索 index が無い（IFM_SCHEMA_CHECK=off / alembic で sync_schema が走っていない）など
+        raise HTTPException(status_code=503, detail=f"search unavailable: {type(e.orig).__name__}")
+
+    headers = {}
+    if has_more:
+        last = out[-1]
+        headers[NEXT_CURSOR_HEADER] = encode_cursor([last.rank, last.id])
+
+    result = [
+        {
+            "id": idea_id,
+            "title": title,
+            "status": status,
+            "total_score": total_score,
+            "exclusive_option_price": exclusive_option_price,
+            "already_owned": idea_id in owned,
+            "rank": rank,
+        }
+        for idea_id, title, status, total_score, exclusive_option_price, rank in out
+    ]
+    return ORJSONResponse(result, headers=headers)
@@ -1,19 +1,19 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.deps import get_current_user
-from app.db.session import get_db
-from app.models.models import User
+from app.auth.principal_cache import Principal
+from app.db.session import get_async_read_db
 
 router = APIRouter(prefix="/me", tags=["me"])
 
 
 @router.get("")
-def me(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+async def me(
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user),
 ):
     # db は将来拡張用（不要なら消してOK）
     return {
@@ -1,15 +1,21 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from pydantic import BaseModel
-from sqlalchemy import select, desc
+from sqlalchemy import and_, delete, or_, select, true, update
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.deps import get_current_user
-from app.db.session import get_db
-from app.models.models import Deal, Idea, User
+from app.auth.principal_cache import Principal
+from app.db.session import REPLICA_STICKY_SECONDS, get_async_read_db, get_async_write_db, is_replica
+from app.models.models import Deal, Idea
 from app.models.resale_listing import ResaleListing
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.schemas.schemas import MarketListingOut
+from app import audit, market_cache, owned, responses
 
 router = APIRouter(prefix="/resale", tags=["resale"])
 
@@ -23,28 +29,28 @@ class ResaleBuyIn(BaseModel):
     idea_id: int
 
 
-def _get_exclusive_deal_for_seller(db: Session, idea_id: int, seller_id: int) -> Deal | None:
-    return (
-        db.execute(
-            select(Deal).where(
-                Deal.idea_id == idea_id,
-                Deal.buyer_id == seller_id,
-                Deal.is_exclusive == True,  # noqa: E712
-            )
-        )
-        .scalars()
-        .first()
+async def _get_exclusive_deal_for_seller(
+    db: AsyncSession, idea_id: int, seller_id: int, *, for_update: bool = False
+) -> Deal | None:
+    stmt = select(Deal).where(
+        Deal.idea_id == idea_id,
+        Deal.buyer_id == seller_id,
+        Deal.is_exclusive == True,  # noqa: E712
     )
+    if for_update:
+        # Postgres は行ロック。SQLite では何も出ない（version の CAS で守る）
+        stmt = stmt.with_for_update()
+    return (await db.execute(stmt)).scalars().first()
 
 
 @router.post("/list")
-def resale_list(
+async def resale_list(
     body: ResaleListIn,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
 ):
     # seller が exclusive owner でないと出品できない
-    deal = _get_exclusive_deal_for_seller(db, body.idea_id, current_user.id)
+    deal = await _get_exclusive_deal_for_seller(db, body.idea_id, current_user.id)
     if not deal:
         raise HTTPException(status_code=403, detail="not exclusive owner")
 
@@ -53,13 +59,15 @@ def resale_list(
 
     # 既存の listing があれば上書き（idea_id は UNIQUE）
     listing = (
-        db.execute(select(ResaleListing).where(ResaleListing.idea_id == body.idea_id))
+        (await db.execute(select(ResaleListing).where(ResaleListing.idea_id == body.idea_id)))
         .scalars()
         .first()
     )
     if listing:
         listing.seller_id = current_user.id
         listing.price = int(body.price)
+        listing.is_active = True
+        listing.updated_at = datetime.now(timezone.utc)
     else:
         listing = ResaleListing(
             idea_id=body.idea_id,
@@ -69,47 +77,145 @@ def resale_list(
         db.add(listing)
 
     try:
-        db.commit()
+        await db.commit()
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=409, detail="already listed")
 
+    market_cache.bump()
+    audit.record("resale.list", "idea", body.idea_id, current_user.id, price=int(body.price))
     return {"ok": True}
 
 
-@router.get("/market")
-def resale_market(db: Session = Depends(get_db)):
-    # マーケットに出てるもの一覧（新しい順）
-    rows = db.execute(
-        select(ResaleListing, Idea)
+async def _market_page(
+    db: AsyncSession,
+    cursor: str | None,
+    limit: int,
+    min_price: int | None,
+    max_price: int | None,
+    min_score: float | None,
+    active_only: bool,
+) -> tuple[list[dict], str | None]:
+    """
+    (is_active, created_at, id)（active_only=false なら (created_at, id)）の index を順に辿り、ideas は主キーで引くだけなので
+    1 ページのコストは出品総数ではなくページサイズで決まる。
+    """
+    stmt = (
+        select(
+            ResaleListing.id,
+            ResaleListing.idea_id,
+            ResaleListing.price,
+            ResaleListing.seller_id,
+            ResaleListing.created_at,
+            Idea.title,
+            Idea.total_score,
+        )
         .join(Idea, Idea.id == ResaleListing.idea_id)
-        .order_by(desc(ResaleListing.created_at), desc(ResaleListing.id))
-    ).all()
-
-    out = []
-    for listing, idea in rows:
-        out.append(
-            {
-                "idea_id": listing.idea_id,
-                "title": getattr(idea, "title", ""),
-                "total_score": int(getattr(idea, "total_score", 0) or 0),
-                "price": int(listing.price),
-                "seller_id": int(listing.seller_id),
-                "listed_at": listing.created_at.isoformat() if listing.created_at else None,
-            }
+        .order_by(ResaleListing.created_at.desc(), ResaleListing.id.desc())
+        .limit(limit + 1)
+    )
+    if active_only:
+        stmt = stmt.where(ResaleListing.is_active == true())
+    if min_price is not None:
+        stmt = stmt.where(ResaleListing.price >= min_price)
+    if max_price is not None:
+        stmt = stmt.where(ResaleListing.price <= max_price)
+    if min_score is not None:
+        stmt = stmt.where(Idea.total_score >= min_score)
+    if cursor:
+        key = decode_cursor(cursor, 2)
+        try:
+            created_at, last_id = datetime.fromisoformat(key[0]), int(key[1])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="invalid cursor")
+        stmt = stmt.where(
+            or_(
+                ResaleListing.created_at < created_at,
+                and_(ResaleListing.created_at == created_at, ResaleListing.id < last_id),
+            )
         )
-    return out
+
+    rows = (await db.execute(stmt)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last.created_at.isoformat(), last.id])
+
+    out = [
+        {
+            "idea_id": idea_id,
+            "title": title or "",
+            "total_score": int(total_score or 0),
+            "price": int(price),
+            "seller_id": int(seller_id),
+            "listed_at": created_at.isoformat() if created_at else None,
+        }
+        for _, idea_id, price, seller_id, created_at, title, total_score in rows
+    ]
+    return out, next_cursor
+
+
+@router.get("/market", response_model=list[MarketListingOut])
+async def resale_market(
+    if_none_match: str | None = Header(None),
+    cursor: str | None = Query(None),
+    limit: int = Query(100, ge=1, le=500),
+    min_price: int | None = Query(None, ge=0),
+    max_price: int | None = Query(None, ge=0),
+    min_score: float | None = Query(None),
+    active_only: bool = Query(True),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    マーケットに出てるもの一覧（新しい順 = created_at desc, id desc）の keyset pagination。
+    次ページがあれば X-Next-Cursor ヘッダに cursor を返す。
+
+    エンコード済みの本文を market_cache に持ち、次の書き込みまではそのまま返す。
+    ETag が一致すれば 304。
+    """
+    key = (cursor, limit, min_price, max_price, min_score, active_only)
+    snap = market_cache.get(key)
+    if snap is None:
+        version = market_cache.version()
+        rows, next_cursor = await _market_page(db, cursor, limit, min_price, max_price, min_score, active_only)
+        body = responses.dumps(rows)
+        # bump の直後にレプリカから読んだページは遅れているかもしれないので、返すだけでキャッシュしない
+        # （書き込んだクライアントは primary に行くので、次の読み取りで新しいページが入る）
+        store = not is_replica(db) or market_cache.seconds_since_bump() >= REPLICA_STICKY_SECONDS
+        snap = market_cache.put(key, body, next_cursor, version, store=store)
+
+    headers = {"ETag": snap.etag, "Cache-Control": "no-cache"}
+    if snap.next_cursor:
+        headers[NEXT_CURSOR_HEADER] = snap.next_cursor
+    if market_cache.not_modified(if_none_match, snap.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snap.body, media_type="application/json", headers=headers)
 
 
 @router.post("/buy")
-def resale_buy(
+async def resale_buy(
     body: ResaleBuyIn,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
 ):
+    """
+    exclusive deal の所有者を買い手に付け替える。
+
+    同時に複数の買い手が来ても勝つのは 1 人だけ:
+    - Postgres: listing と seller の deal を SELECT ... FOR UPDATE でロックする
+      （ロックするのは対象の行だけなので、別の listing の購入は待たない）
+    - SQLite（FOR UPDATE が無い）: 読んだ version を条件にした UPDATE（compare-and-swap）で
+      付け替え、0 行なら負け
+    負けた買い手には 409 を返す。
+    """
     # listing 取得
     listing = (
-        db.execute(select(ResaleListing).where(ResaleListing.idea_id == body.idea_id))
+        (
+            await db.execute(
+                select(ResaleListing).where(ResaleListing.idea_id == body.idea_id).with_for_update()
+            )
+        )
         .scalars()
         .first()
     )
@@ -117,34 +223,51 @@ def resale_buy(
         raise HTTPException(status_code=404, detail="not listed")
 
     # seller の exclusive deal を取得
-    deal = _get_exclusive_deal_for_seller(db, body.idea_id, int(listing.seller_id))
+    seller_id = int(listing.seller_id)
+    deal = await _get_exclusive_deal_for_seller(db, body.idea_id, seller_id, for_update=True)
     if not deal:
-        # listing が残骸になってるケース
-        db.delete(listing)
-        db.commit()
+        # listing が残骸になってるケース（同時に売れて既に消えていることもある）
+        await db.execute(delete(ResaleListing).where(ResaleListing.id == listing.id))
+        await db.commit()
+        market_cache.bump()
         raise HTTPException(status_code=404, detail="exclusive not found")
 
     # buyer がすでに同じ idea を持ってたら購入不可（仕様に合わせる）
     existing = (
-        db.execute(
-            select(Deal).where(Deal.idea_id == body.idea_id, Deal.buyer_id == current_user.id)
+        await db.execute(
+            select(Deal.id).where(Deal.idea_id == body.idea_id, Deal.buyer_id == current_user.id)
         )
-        .scalars()
-        .first()
-    )
+    ).first()
     if existing:
         raise HTTPException(status_code=409, detail="already purchased")
 
-    # transfer：exclusive deal の buyer_id を買い手へ付け替え
-    deal.buyer_id = current_user.id
+    # transfer：読んだ時点から誰も付け替えていなければ buyer_id を買い手へ
+    transferred = (
+        await db.execute(
+            update(Deal)
+            .where(Deal.id == deal.id, Deal.buyer_id == seller_id, Deal.version == deal.version)
+            .values(buyer_id=current_user.id, version=Deal.version + 1)
+            .returning(Deal.id)
+            .execution_options(synchronize_session=False)
+        )
+    ).first()
+    if transferred is None:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="exclusive already taken")
 
     # listing は削除
-    db.delete(listing)
+    await db.execute(delete(ResaleListing).where(ResaleListing.id == listing.id))
 
     try:
-        db.commit()
+        await db.commit()
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=409, detail="exclusive already taken")
 
+    owned.invalidate(seller_id, current_user.id)
+    market_cache.bump()
+    audit.record(
+        "resale.transfer", "idea", body.idea_id, current_user.id,
+        deal_id=deal.id, seller_id=seller_id, price=int(listing.price),
+    )
     return {"ok": True}
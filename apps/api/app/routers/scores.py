@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import scoring
+from app.auth.deps import get_current_user
+from app.auth.principal_cache import Principal
+from app.db.session import get_async_write_db
+from app.schemas.schemas import ScoreBulkIn, ScoreIn
+
+router = APIRouter(tags=["scores"])
+
+BULK_MAX_ITEMS = 500
+
+
+def _require_admin(user: Principal) -> None:
+    role = getattr(user.role, "value", user.role)
+    if str(role).upper() != "ADMIN":
+        raise HTTPException(status_code=403, detail="forbidden")
+
+
+async def _submit(db: AsyncSession, scorer_id: int, items: list[tuple[int, dict]]) -> list[dict]:
+    # 同じ採点者の初回採点が同時に来たら unique index で負ける。読み直して 1 回だけやり直す
+    for attempt in range(2):
+        try:
+            return await scoring.submit(db, scorer_id, items)
+        except IntegrityError:
+            await db.rollback()
+            if attempt:
+                raise HTTPException(status_code=409, detail="score conflicted with a concurrent submission, retry")
+
+
+@router.post("/ideas/{idea_id}/scores")
+async def submit_score(
+    idea_id: int,
+    body: ScoreIn,
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    rubric 採点を保存し、ideas.total_score（採点の平均）を同じトランザクションで更新する。
+    同じ採点者がもう一度採点すると上書き。
+    """
+    _require_admin(current_user)
+    (result,) = await _submit(db, current_user.id, [(idea_id, body.model_dump())])
+    if not result["ok"]:
+        raise HTTPException(status_code=result["status"], detail=result["detail"])
+    return result
+
+
+@router.post("/scores/bulk")
+async def submit_scores_bulk(
+    items: list[ScoreBulkIn],
+    db: AsyncSession = Depends(get_async_write_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    複数 idea の採点を 1 トランザクションで保存する。結果は item ごと（存在しない idea は ok=false, status=404）。
+    """
+    _require_admin(current_user)
+    if not items:
+        raise HTTPException(status_code=400, detail="no scores")
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"too many items (max {BULK_MAX_ITEMS})")
+
+    results = await _submit(db, current_user.id, [(i.idea_id, i.model_dump()) for i in items])
+    return {"ok": all(r["ok"] for r in results), "results": results}
@@ -1,12 +1,17 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 from typing import Optional, Literal
 
+# EmailStr の検証（email-validator の import）は初めて使う時まで遅らせる
 class RegisterIn(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     email: EmailStr
     password: str = Field(min_length=8)
     role: Literal["SELLER", "BUYER"] = "SELLER"
 
 class LoginIn(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     email: EmailStr
     password: str
 
@@ -39,3 +44,25 @@ class ScoreIn(BaseModel):
     market: int = Field(ge=0, le=20)
     concreteness: int = Field(ge=0, le=20)
     extensibility: int = Field(ge=0, le=20)
+
+class RecommendedIdeaOut(BaseModel):
+    id: int
+    title: str
+    status: str
+    total_score: float
+    exclusive_option_price: Optional[float]
+    already_owned: bool
+
+class SearchIdeaOut(RecommendedIdeaOut):
+    rank: float
+
+class MarketListingOut(BaseModel):
+    idea_id: int
+    title: str
+    total_score: int
+    price: int
+    seller_id: int
+    listed_at: Optional[str]
+
+class ScoreBulkIn(ScoreIn):
+    idea_id: int
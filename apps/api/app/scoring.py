@@ -0,0 +1,144 @@
+"""
+rubric 採点の保存と ideas.total_score の差分更新。
+
+total_score は採点の平均（score_sum / score_count）。採点を保存するのと同じトランザクションで
+  UPDATE ideas SET score_sum = score_sum + :d_sum, score_count = score_count + :d_count, total_score = ...
+を流すだけで、scores の履歴を集計し直すことはしない。
+同じ採点者の採点し直しは、前回の total との差分だけを score_sum に足す。
+
+全件の作り直し（backfill / 不整合の修復）は scripts/recompute_scores.py。
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Iterable
+
+from sqlalchemy import Float, bindparam, case, cast, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import market_cache, ranking
+from app.models.models import Idea, Score
+
+RUBRIC = ("logic", "originality", "market", "concreteness", "extensibility")
+
+# executemany で idea ごとの差分を流す（ORM の bulk update にならないよう Table に対して書く）
+_ideas = Idea.__table__
+_apply_delta = (
+    update(_ideas)
+    .where(_ideas.c.id == bindparam("b_idea_id"))
+    .values(
+        score_sum=_ideas.c.score_sum + bindparam("d_sum"),
+        score_count=_ideas.c.score_count + bindparam("d_count"),
+        total_score=cast(_ideas.c.score_sum + bindparam("d_sum"), Float)
+        / (_ideas.c.score_count + bindparam("d_count")),
+    )
+)
+
+
+def recompute_stmt(lo: int, hi: int):
+    """
+    id が [lo, hi) の ideas について scores から合計・件数・平均を作り直す（1 文の set-based UPDATE）。
+    採点が 1 件も無い idea の total_score はそのまま残す（seed などで入れた値）。
+    """
+    total_sum = (
+        select(func.coalesce(func.sum(Score.total), 0)).where(Score.idea_id == Idea.id).scalar_subquery()
+    )
+    count = select(func.count()).where(Score.idea_id == Idea.id).scalar_subquery()
+    return (
+        update(Idea)
+        .where(Idea.id >= lo, Idea.id < hi)
+        .values(
+            score_sum=total_sum,
+            score_count=count,
+            total_score=case((count > 0, cast(total_sum, Float) / count), else_=Idea.total_score),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def submit(db: AsyncSession, scorer_id: int, items: Iterable[tuple[int, dict]]) -> list[dict]:
+    """
+    items は (idea_id, {rubric の 5 軸}) の列。順番に適用し、1 回だけ commit する。
+    同じ idea が複数あれば後のものが勝つ（採点し直しと同じ扱い）。
+    戻り値は item ごとの結果。存在しない idea は {"ok": False, "status": 404}。
+    """
+    items = list(items)
+    idea_ids = {idea_id for idea_id, _ in items}
+    if not idea_ids:
+        return []
+
+    known = set((await db.execute(select(Idea.id).where(Idea.id.in_(idea_ids)))).scalars())
+    # この採点者の既存の採点: idea_id -> [score id, total]
+    mine = {
+        r.idea_id: [r.id, r.total]
+        for r in await db.execute(
+            select(Score.id, Score.idea_id, Score.total).where(
+                Score.scored_by == scorer_id, Score.idea_id.in_(known)
+            )
+        )
+    }
+
+    now = datetime.now(timezone.utc)
+    new_scores: dict[int, dict] = {}
+    changed_scores: dict[int, dict] = {}
+    deltas: dict[int, list[int]] = {}  # idea_id -> [d_sum, d_count]
+    results = []
+    for idea_id, axes in items:
+        if idea_id not in known:
+            results.append({"idea_id": idea_id, "ok": False, "status": 404, "detail": "idea not found"})
+            continue
+
+        values = {k: int(axes[k]) for k in RUBRIC}
+        total = sum(values.values())
+        d = deltas.setdefault(idea_id, [0, 0])
+        if idea_id in mine:
+            score_id, old_total = mine[idea_id]
+            d[0] += total - old_total
+            row = dict(values, total=total, scored_at=now)
+            if score_id is None:
+                new_scores[idea_id].update(row)
+            else:
+                changed_scores[score_id] = dict(row, id=score_id)
+        else:
+            d[0] += total
+            d[1] += 1
+            new_scores[idea_id] = dict(values, idea_id=idea_id, total=total, scored_by=scorer_id, scored_at=now)
+        mine[idea_id] = [mine.get(idea_id, [None])[0], total]
+        results.append({"idea_id": idea_id, "ok": True, "total": total})
+
+    if new_scores:
+        await db.execute(Score.__table__.insert(), list(new_scores.values()))
+    if changed_scores:
+        await db.execute(update(Score), list(changed_scores.values()))
+    if deltas:
+        await db.execute(
+            _apply_delta,
+            [{"b_idea_id": i, "d_sum": s, "d_count": c} for i, (s, c) in deltas.items()],
+        )
+
+    rows = (
+        await db.execute(
+            select(
+                Idea.id,
+                Idea.title,
+                Idea.status,
+                Idea.total_score,
+                Idea.exclusive_option_price,
+                Idea.score_count,
+            ).where(Idea.id.in_(deltas))
+        )
+    ).all()
+    await db.commit()
+
+    # Core の UPDATE は ORM の commit フックに乗らないので、ランキング index とマーケットは直接更新する
+    if ranking.ENABLED and ranking.index.ready:
+        for r in rows:
+            ranking.index.upsert(ranking.RankedIdea(*r[:5]))
+    if rows:
+        market_cache.bump()
+
+    totals = {r.id: (r.total_score, r.score_count) for r in rows}
+    for res in results:
+        if res["ok"]:
+            res["total_score"], res["score_count"] = totals[res["idea_id"]]
+    return results
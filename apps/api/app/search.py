@@ -0,0 +1,159 @@
+"""
+ideas の全文検索（GET /ideas/search）。
+
+title / summary / body を DB の全文検索 index に載せる:
+  SQLite    FTS5 の external content テーブル ideas_fts（ideas の INSERT / UPDATE / DELETE をトリガで反映）
+  Postgres  生成列 ideas.search_vector（tsvector）+ GIN index
+
+どちらも DB 側で同期するので、ORM 以外（sqlite3 CLI や別プロセス）からの書き込みも拾う。
+DDL は schema.sync_schema() から install() で流す（fingerprint にも含まれる）。
+
+並び順は「関連度 × (1 + IFM_SEARCH_SCORE_WEIGHT × total_score / 100)」の降順、同点は id の降順。
+関連度は SQLite が -bm25()（title / summary / body の重み付き）、Postgres が ts_rank_cd()。
+"""
+from __future__ import annotations
+
+import os
+import re
+
+from sqlalchemy import Float, cast, column, func, inspect, literal_column, or_, and_, select, table
+from sqlalchemy.engine import Engine
+
+from app.models.models import Idea
+
+SCORE_WEIGHT = float(os.getenv("IFM_SEARCH_SCORE_WEIGHT", "1.0"))
+# bm25 の列ごとの重み（title, summary, body）
+COLUMN_WEIGHTS = (5.0, 2.0, 1.0)
+
+_SQLITE_DDL = (
+    # unicode61 は空白・記号で区切る。日本語の部分一致が要るなら tokenize='trigram' にする（3 文字以上の語のみ）
+    "CREATE VIRTUAL TABLE IF NOT EXISTS ideas_fts USING fts5("
+    "title, summary, body, content='ideas', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS ideas_fts_ai AFTER INSERT ON ideas BEGIN "
+    "INSERT INTO ideas_fts(rowid, title, summary, body) VALUES (new.id, new.title, new.summary, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS ideas_fts_ad AFTER DELETE ON ideas BEGIN "
+    "INSERT INTO ideas_fts(ideas_fts, rowid, title, summary, body) "
+    "VALUES ('delete', old.id, old.title, old.summary, old.body); END",
+    # total_score など検索に関係ない列の UPDATE では index を触らない
+    "CREATE TRIGGER IF NOT EXISTS ideas_fts_au AFTER UPDATE OF title, summary, body ON ideas BEGIN "
+    "INSERT INTO ideas_fts(ideas_fts, rowid, title, summary, body) "
+    "VALUES ('delete', old.id, old.title, old.summary, old.body); "
+    "INSERT INTO ideas_fts(rowid, title, summary, body) VALUES (new.id, new.title, new.summary, new.body); END",
+)
+
+_POSTGRES_DDL = (
+    "ALTER TABLE ideas ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(summary, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(body, '')), 'C')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_ideas_search_vector ON ideas USING GIN (search_vector)",
+)
+
+
+def ddl(dialect: str) -> tuple[str, ...]:
+    if dialect == "sqlite":
+        return _SQLITE_DDL
+    if dialect == "postgresql":
+        return _POSTGRES_DDL
+    return ()
+
+
+def install(engine: Engine) -> None:
+    """
+    検索 index を作る（idempotent）。SQLite は既存の ideas から作り直す。
+    """
+    statements = ddl(engine.dialect.name)
+    if not statements:
+        return
+    with engine.begin() as conn:
+        for stmt in statements:
+            conn.exec_driver_sql(stmt)
+        if engine.dialect.name == "sqlite":
+            conn.exec_driver_sql("INSERT INTO ideas_fts(ideas_fts) VALUES ('rebuild')")
+
+
+def missing(engine: Engine) -> list[str]:
+    """
+    install() で作るもののうち DB に無いもの（IFM_SCHEMA_CHECK=alembic の起動時チェック用）。
+    """
+    if engine.dialect.name == "sqlite":
+        want = {"ideas_fts": "table", "ideas_fts_ai": "trigger", "ideas_fts_ad": "trigger", "ideas_fts_au": "trigger"}
+        with engine.connect() as conn:
+            have = {name for (name,) in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+        return [f"{kind} {name}" for name, kind in want.items() if name not in have]
+    if engine.dialect.name == "postgresql":
+        insp = inspect(engine)
+        out = []
+        if "search_vector" not in {c["name"] for c in insp.get_columns("ideas")}:
+            out.append("column ideas.search_vector")
+        if "ix_ideas_search_vector" not in {i["name"] for i in insp.get_indexes("ideas")}:
+            out.append("index ix_ideas_search_vector")
+        return out
+    return []
+
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def terms(q: str) -> list[str]:
+    """
+    クエリを語に分ける。演算子や記号はそのまま MATCH に渡さない（構文エラーやインジェクションになるので）。
+    """
+    return _TOKEN.findall(q)[:16]
+
+
+def _blend(relevance):
+    return relevance * (1.0 + SCORE_WEIGHT * func.coalesce(cast(Idea.total_score, Float), 0.0) / 100.0)
+
+
+def _sqlite_ranked(words: list[str]):
+    fts = table("ideas_fts", column("rowid"))
+    # 各語を "..." のフレーズにして AND（FTS5 の暗黙の AND）
+    match = " ".join('"' + w.replace('"', '""') + '"' for w in words)
+    relevance = -func.bm25(literal_column("ideas_fts"), *COLUMN_WEIGHTS)
+    return (
+        select(
+            Idea.id,
+            Idea.title,
+            Idea.status,
+            Idea.total_score,
+            Idea.exclusive_option_price,
+            _blend(relevance).label("rank"),
+        )
+        .select_from(fts)
+        .join(Idea, Idea.id == fts.c.rowid)
+        .where(literal_column("ideas_fts").op("MATCH")(match))
+    )
+
+
+def _postgres_ranked(words: list[str]):
+    query = func.to_tsquery("simple", " & ".join(words))
+    vector = literal_column("ideas.search_vector")
+    return select(
+        Idea.id,
+        Idea.title,
+        Idea.status,
+        Idea.total_score,
+        Idea.exclusive_option_price,
+        _blend(func.ts_rank_cd(vector, query)).label("rank"),
+    ).where(vector.op("@@")(query))
+
+
+def page_stmt(dialect: str, words: list[str], after: tuple[float, int] | None, limit: int):
+    """
+    (rank, id) の keyset pagination。limit + 1 行読んで次ページの有無を判定する。
+    """
+    if dialect == "sqlite":
+        ranked = _sqlite_ranked(words).subquery()
+    elif dialect == "postgresql":
+        ranked = _postgres_ranked(words).subquery()
+    else:
+        raise NotImplementedError(f"full-text search is not supported on {dialect}")
+
+    stmt = select(ranked).order_by(ranked.c.rank.desc(), ranked.c.id.desc()).limit(limit + 1)
+    if after is not None:
+        rank, last_id = after
+        stmt = stmt.where(
+            or_(ranked.c.rank < rank, and_(ranked.c.rank == rank, ranked.c.id < last_id))
+        )
+    return stmt
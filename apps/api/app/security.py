@@ -2,32 +2,66 @@ from __future__ import annotations
 
 import os
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, Optional
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
 
 import jwt
 from fastapi import HTTPException
-from passlib.context import CryptContext
-from passlib.exc import UnknownHashError
 
 # === Password hashing ===
 # bcrypt 依存で壊れがちなので pbkdf2_sha256 を使う（安定）
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# IFM_PBKDF2_ROUNDS 未満で保存されている hash はログイン時に作り直す（verify_and_update）
+PBKDF2_ROUNDS = int(os.getenv("IFM_PBKDF2_ROUNDS", "29000"))
+
+
+@lru_cache(maxsize=None)
+def _pwd_context():
+    # passlib は hash / verify する時まで import しない
+    # （password_pool を使う時、API プロセス本体では読み込まれない）
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["pbkdf2_sha256"],
+        deprecated="auto",
+        pbkdf2_sha256__default_rounds=PBKDF2_ROUNDS,
+        pbkdf2_sha256__min_rounds=PBKDF2_ROUNDS,
+    )
 
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return _pwd_context().hash(password)
+
+
+# seed スクリプト等が import している旧名
+get_password_hash = hash_password
 
 
 def verify_password(plain_password: str, password_hash: str) -> bool:
     if not password_hash:
         return False
+    from passlib.exc import UnknownHashError
+
     try:
-        return pwd_context.verify(plain_password, password_hash)
+        return _pwd_context().verify(plain_password, password_hash)
     except UnknownHashError:
         # 旧DBに平文や未知形式が入ってても 500 にしない
         return False
 
 
+def verify_and_update(plain_password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    """
+    verify_password と同じだが、rounds が足りない hash なら作り直した hash も返す。
+    """
+    if not password_hash:
+        return False, None
+    from passlib.exc import UnknownHashError
+
+    try:
+        return _pwd_context().verify_and_update(plain_password, password_hash)
+    except UnknownHashError:
+        return False, None
+
+
 # === JWT ===
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-change-me")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
@@ -1,15 +1,23 @@
+"""
+デモ用の user / idea を入れる（空の時だけ。何度流しても増えない）。
+
+起動時には流さないので、DB を作った時に一度だけ:
+
+  python -m app.seed
+"""
 from __future__ import annotations
 
+import json
+
 from sqlalchemy.orm import Session
 
-from app.db import engine
+from app.db.session import SessionLocal, engine
 from app.models.models import Base, User, Idea
 from app.security import hash_password
 
 
 def seed_all(db: Session) -> dict:
-    # 0) テーブル作成（重要）
-    Base.metadata.create_all(bind=engine)
+    # スキーマは起動時（app.db.schema.ensure_schema）か main() で用意済みの前提
 
     # 1) users が空なら demo user を作る
     if db.query(User).count() == 0:
@@ -76,3 +84,20 @@ def seed_all(db: Session) -> dict:
         "ideas_total": db.query(Idea).count(),
         "ideas_active": db.query(Idea).filter(Idea.status == "ACTIVE").count(),
     }
+
+
+def main() -> None:
+    from app.db.schema import ensure_schema
+
+    import app.models  # noqa: F401  (全モデルを Base.metadata に登録する)
+
+    print(f"schema: {ensure_schema(engine, Base.metadata)}")
+    db = SessionLocal()
+    try:
+        print(json.dumps(seed_all(db)))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+新しいワーカーの立ち上がりコストを測る。
+
+  1) `python -X importtime -c "import app.main"` の合計とモジュールごとの累積 import 時間
+  2) uvicorn を起動してから /health が初めて 200 を返すまでの時間
+
+  python scripts/bench_cold_start.py
+  python scripts/bench_cold_start.py --runs 5 --top 15 --json
+  python scripts/bench_cold_start.py --max-import-ms 1500 --max-health-ms 4000   # CI 用
+
+--max-* を超えたら、または import app.main で読まれてはいけないモジュール
+（遅延ロードしているもの）が読まれたら exit 1。
+各回は別プロセスで、一時ディレクトリの SQLite を使う。
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+API_ROOT = Path(__file__).resolve().parents[1]  # apps/api
+
+# import app.main の時点では読まれないはずのモジュール
+LAZY_MODULES = (
+    "app.routers.debug",  # ALLOW_DEBUG=1 の時だけ
+    "app.seed",           # python -m app.seed / IFM_AUTO_SEED=1 の時だけ
+    "app.jwt",            # 旧 JWT 実装（未使用）
+    "app.auth.jwt",       # 互換モジュール（未使用）
+    "app.models.user",    # 旧 User モデル（未使用）
+    "jose",
+    "passlib",            # hash / verify の時（password_pool のワーカー側）
+    "email_validator",
+)
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--runs", type=int, default=3)
+    p.add_argument("--top", type=int, default=10, help="累積 import 時間の上位 N モジュールを出す")
+    p.add_argument("--max-import-ms", type=float, default=None)
+    p.add_argument("--max-health-ms", type=float, default=None)
+    p.add_argument("--json", action="store_true", help="結果を JSON で出す")
+    return p.parse_args()
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.update(
+        DATABASE_URL=f"sqlite:///{tempfile.mkdtemp(prefix='ifm-cold-start-')}/cold.db",
+        IFM_AUTO_SEED="0",
+        ALLOW_DEBUG="0",
+        PYTHONPATH=str(API_ROOT),
+    )
+    return env
+
+
+def _import_once() -> tuple[float, dict[str, float], list[str]]:
+    code = f"import sys, app.main; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=API_ROOT,
+        env=_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative: dict[str, float] = {}
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            cumulative[m.group(4)] = int(m.group(2)) / 1000
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return cumulative.get("app.main", 0.0), cumulative, loaded
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _health_once() -> float:
+    port = _free_port()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=API_ROOT,
+        env=_env(),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = t0 + 30
+        while time.perf_counter() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {proc.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as r:
+                    if r.status == 200:
+                        return (time.perf_counter() - t0) * 1000
+            except OSError:
+                pass
+            time.sleep(0.01)
+        raise RuntimeError("/health did not answer within 30s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main() -> None:
+    args = _parse_args()
+
+    import_ms: list[float] = []
+    per_module: dict[str, list[float]] = {}
+    loaded: set[str] = set()
+    for _ in range(args.runs):
+        total, cumulative, lazy_loaded = _import_once()
+        import_ms.append(total)
+        loaded.update(lazy_loaded)
+        for name, ms in cumulative.items():
+            per_module.setdefault(name, []).append(ms)
+    health_ms = [_health_once() for _ in range(args.runs)]
+
+    top = sorted(
+        ((name, statistics.median(v)) for name, v in per_module.items() if name != "app.main"),
+        key=lambda x: x[1],
+        reverse=True,
+    )[: args.top]
+    result = {
+        "runs": args.runs,
+        "import_app_main_ms": round(statistics.median(import_ms), 1),
+        "first_health_ms": round(statistics.median(health_ms), 1),
+        "top_modules_ms": {name: round(ms, 1) for name, ms in top},
+        "lazy_modules_loaded": sorted(loaded),
+    }
+
+    failures = []
+    if args.max_import_ms is not None and result["import_app_main_ms"] > args.max_import_ms:
+        failures.append(f"import app.main {result['import_app_main_ms']}ms > {args.max_import_ms}ms")
+    if args.max_health_ms is not None and result["first_health_ms"] > args.max_health_ms:
+        failures.append(f"first /health {result['first_health_ms']}ms > {args.max_health_ms}ms")
+    if loaded:
+        failures.append(f"lazily loaded modules imported by app.main: {', '.join(sorted(loaded))}")
+
+    if args.json:
+        print(json.dumps(dict(result, failures=failures), indent=2))
+    else:
+        print(f"import app.main: {result['import_app_main_ms']:>8.1f} ms (median of {args.runs})")
+        print(f"first /health:   {result['first_health_ms']:>8.1f} ms (median of {args.runs})")
+        print("slowest imports (cumulative):")
+        for name, ms in result["top_modules_ms"].items():
+            print(f"  {ms:>8.1f} ms  {name}")
+        for f in failures:
+            print(f"FAIL: {f}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+/auth/login のスループットを、パスワードプールのワーカー数ごとに測る。
+
+  python scripts/bench_login.py --requests 400 --concurrency 64
+  python scripts/bench_login.py --workers 0,1,2,4 --rounds 29000
+
+workers=0 は プロセスプールを使わずスレッドプールで verify する（従来相当）。
+アプリは in-process（httpx.ASGITransport）で叩くのでサーバ起動は不要。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# --- ensure "import app" works no matter where it is executed ---
+API_ROOT = Path(__file__).resolve().parents[1]  # apps/api
+if str(API_ROOT) not in sys.path:
+    sys.path.insert(0, str(API_ROOT))
+
+
+def _parse_args() -> argparse.Namespace:
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({0, 1, *[n for n in (2, 4, 8, 16) if n <= cpus], cpus})
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--users", type=int, default=50)
+    p.add_argument("--requests", type=int, default=200)
+    p.add_argument("--concurrency", type=int, default=32)
+    p.add_argument("--rounds", type=int, default=29000)
+    p.add_argument("--workers", default=",".join(str(n) for n in default_workers))
+    p.add_argument("--json", action="store_true", help="結果を JSON で出す")
+    return p.parse_args()
+
+
+async def _run(app, users: list[str], total: int, concurrency: int) -> dict:
+    import httpx
+
+    sem = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors = 0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one(i: int) -> None:
+            nonlocal errors
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.post("/auth/login", json={"email": users[i % len(users)], "password": "benchpass"})
+                latencies.append(time.perf_counter() - t0)
+                if r.status_code != 200:
+                    errors += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - t0
+
+    # プールの接続はこの event loop に紐づくので、次の asyncio.run の前に捨てる
+    from app.db.session import async_engine
+
+    await async_engine.dispose()
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "logins_per_sec": round(total / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 1),
+    }
+
+
+def main() -> None:
+    args = _parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="ifm-bench-login-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmpdir}/bench.db"
+    os.environ["IFM_AUTO_SEED"] = "0"
+    os.environ["IFM_PBKDF2_ROUNDS"] = str(args.rounds)
+
+    from sqlalchemy import insert
+
+    from app import password_pool
+    from app.db.session import engine
+    from app.main import app
+    from app.models.models import Base, User
+    from app.security import hash_password
+
+    Base.metadata.create_all(bind=engine)
+    # 全員同じパスワードなので hash は 1 回だけ計算する
+    pw_hash = hash_password("benchpass")
+    emails = [f"bench{i}@ifm.com" for i in range(args.users)]
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User),
+            [{"email": e, "password_hash": pw_hash, "role": "BUYER", "status": "ACTIVE"} for e in emails],
+        )
+
+    results = []
+    for n in [int(x) for x in args.workers.split(",") if x.strip()]:
+        password_pool.configure(workers=n, max_queue=max(args.concurrency, 1) * 4)
+        password_pool.start(wait=True)
+        res = asyncio.run(_run(app, emails, args.requests, args.concurrency))
+        res["workers"] = n
+        results.append(res)
+        if not args.json:
+            print(
+                f"workers={n:>2}  {res['logins_per_sec']:>8.1f} logins/s  "
+                f"p50={res['p50_ms']:>7.1f}ms  p99={res['p99_ms']:>7.1f}ms  errors={res['errors']}"
+            )
+    password_pool.shutdown()
+
+    if args.json:
+        print(json.dumps({"cpus": os.cpu_count(), "rounds": args.rounds, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+/ideas/recommended 形式の行を JSON にするコストを、10k 行あたりで比べる。
+
+  python scripts/bench_serialization.py
+  python scripts/bench_serialization.py --rows 50000 --repeat 10
+
+  legacy          行ごとに dict を組み立て直す -> jsonable_encoder -> JSONResponse（以前の実装）
+  response_model  FastAPI の response_model 高速パス（pydantic で検証して dump_json）
+  tuples+json     SQL のタプルから dict -> 標準 json（orjson が無い時の ORJSONResponse）
+  tuples+orjson   SQL のタプルから dict -> ORJSONResponse（今の実装）
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+# --- ensure "import app" works no matter where it is executed ---
+API_ROOT = Path(__file__).resolve().parents[1]  # apps/api
+if str(API_ROOT) not in sys.path:
+    sys.path.insert(0, str(API_ROOT))
+
+
+def _parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--rows", type=int, default=10000)
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--json", action="store_true", help="結果を JSON で出す")
+    return p.parse_args()
+
+
+def _load_rows(n: int):
+    from sqlalchemy import create_engine, insert, select
+
+    from app.models.models import Base, Idea
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    rng = random.Random(1)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Idea),
+            [
+                {
+                    "seller_id": 1,
+                    "title": f"idea {i}",
+                    "summary": "s",
+                    "body": "b",
+                    "status": "ACTIVE",
+                    "total_score": rng.uniform(0, 100),
+                    "exclusive_option_price": None if i % 3 else 100.0,
+                }
+                for i in range(n)
+            ],
+        )
+        return conn.execute(
+            select(Idea.id, Idea.title, Idea.status, Idea.total_score, Idea.exclusive_option_price)
+        ).all()
+
+
+def main() -> None:
+    args = _parse_args()
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+
+    from app import responses
+    from app.responses import ORJSONResponse
+    from app.schemas.schemas import RecommendedIdeaOut
+
+    rows = _load_rows(args.rows)
+    owned = frozenset(r.id for r in rows[::7])
+    adapter = TypeAdapter(list[RecommendedIdeaOut])
+
+    def as_dicts():
+        return [
+            {
+                "id": idea_id,
+                "title": title,
+                "status": status,
+                "total_score": total_score,
+                "exclusive_option_price": exclusive_option_price,
+                "already_owned": idea_id in owned,
+            }
+            for idea_id, title, status, total_score, exclusive_option_price in rows
+        ]
+
+    def legacy() -> bytes:
+        result = []
+        for r in rows:
+            row = dict(r._asdict(), already_owned=r.id in owned)
+            result.append(
+                {
+                    "id": row["id"],
+                    "title": row["title"],
+                    "status": row["status"],
+                    "total_score": row["total_score"],
+                    "exclusive_option_price": row["exclusive_option_price"],
+                    "already_owned": bool(row["already_owned"]),
+                }
+            )
+        return JSONResponse(jsonable_encoder(result)).body
+
+    def response_model() -> bytes:
+        return adapter.dump_json(adapter.validate_python(as_dicts()))
+
+    def tuples_json() -> bytes:
+        return json.dumps(as_dicts(), ensure_ascii=False, separators=(",", ":"), default=str).encode()
+
+    def tuples_orjson() -> bytes:
+        return ORJSONResponse(as_dicts()).body
+
+    cases = {"legacy": legacy, "response_model": response_model, "tuples+json": tuples_json}
+    if responses.orjson is not None:
+        cases["tuples+orjson"] = tuples_orjson
+
+    # 出力が同じであること
+    expected = json.loads(legacy())
+    for name, fn in cases.items():
+        assert json.loads(fn()) == expected, name
+
+    results = {}
+    for name, fn in cases.items():
+        fn()
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            fn()
+        per_call = (time.perf_counter() - t0) / args.repeat
+        results[name] = round(per_call * 1000 * 10000 / args.rows, 2)
+
+    if args.json:
+        print(json.dumps({"rows": args.rows, "ms_per_10k_rows": results}, indent=2))
+        return
+    base = results["legacy"]
+    for name, ms in results.items():
+        print(f"{name:>15}: {ms:>8.2f} ms / 10k rows  (x{base / ms:.1f})")
+
+
+if __name__ == "__main__":
+    main()
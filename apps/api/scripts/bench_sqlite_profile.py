@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+SQLite の既定設定と本番プロファイル（IFM_SQLITE_PROFILE=production）で、
+読み書き混在の負荷をかけて比べる。
+
+  python scripts/bench_sqlite_profile.py
+  python scripts/bench_sqlite_profile.py --requests 4000 --concurrency 64 --write-ratio 0.3
+
+読み: GET /ideas/recommended、書き: POST /deals（buyer x idea の重複しない組）。
+プロファイルは import 時に決まるので、各モードを子プロセスで実行する。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# --- ensure "import app" works no matter where it is executed ---
+API_ROOT = Path(__file__).resolve().parents[1]  # apps/api
+if str(API_ROOT) not in sys.path:
+    sys.path.insert(0, str(API_ROOT))
+
+PROFILES = ("default", "production")
+
+
+def _parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--requests", type=int, default=2000)
+    p.add_argument("--concurrency", type=int, default=50)
+    p.add_argument("--write-ratio", type=float, default=0.2)
+    p.add_argument("--buyers", type=int, default=50)
+    p.add_argument("--ideas", type=int, default=500)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--json", action="store_true", help="結果を JSON で出す")
+    p.add_argument("--profile", choices=PROFILES, help=argparse.SUPPRESS)  # 子プロセス用
+    return p.parse_args()
+
+
+def _summary(latencies: list[float], errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    n = len(latencies)
+    if not n:
+        return {"count": 0, "errors": errors}
+    return {
+        "count": n,
+        "errors": errors,
+        "per_sec": round(n / elapsed, 1),
+        "p50_ms": round(latencies[n // 2] * 1000, 2),
+        "p99_ms": round(latencies[min(n - 1, int(n * 0.99))] * 1000, 2),
+    }
+
+
+async def _workload(args: argparse.Namespace, buyer_ids: list[int], idea_ids: list[int]) -> dict:
+    import httpx
+
+    from app.main import app
+    from app.security import create_access_token
+
+    rng = random.Random(args.seed)
+    headers = {b: {"Authorization": f"Bearer {create_access_token(data={'sub': str(b)})}"} for b in buyer_ids}
+    pairs = iter(rng.sample([(b, i) for b in buyer_ids for i in idea_ids], k=len(buyer_ids) * len(idea_ids)))
+    plan = ["write" if rng.random() < args.write_ratio else "read" for _ in range(args.requests)]
+
+    lat = {"read": [], "write": []}
+    errors = {"read": 0, "write": 0}
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one(kind: str) -> None:
+            async with sem:
+                t0 = time.perf_counter()
+                if kind == "write":
+                    buyer, idea = next(pairs)
+                    r = await client.post("/deals", json={"idea_id": idea, "is_exclusive": False}, headers=headers[buyer])
+                else:
+                    r = await client.get("/ideas/recommended?limit=20", headers=headers[rng.choice(buyer_ids)])
+                lat[kind].append(time.perf_counter() - t0)
+                if r.status_code != 200:
+                    errors[kind] += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(k) for k in plan))
+        elapsed = time.perf_counter() - t0
+
+    return {
+        "seconds": round(elapsed, 3),
+        "req_per_sec": round(len(plan) / elapsed, 1),
+        "read": _summary(lat["read"], errors["read"], elapsed),
+        "write": _summary(lat["write"], errors["write"], elapsed),
+    }
+
+
+def _run_child(args: argparse.Namespace) -> dict:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='ifm-bench-sqlite-')}/bench.db"
+    os.environ["IFM_AUTO_SEED"] = "0"
+    os.environ["IFM_SQLITE_PROFILE"] = "production" if args.profile == "production" else ""
+
+    from sqlalchemy import insert, select
+
+    from app.db.session import engine
+    from app.models.models import Base, Idea, User
+
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(args.seed)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User),
+            [{"email": f"u{i}@bench", "password_hash": "-", "role": "BUYER", "status": "ACTIVE"} for i in range(args.buyers + 1)],
+        )
+        conn.execute(
+            insert(Idea),
+            [
+                {"seller_id": 1, "title": f"idea {i}", "summary": "s", "body": "b", "status": "ACTIVE", "total_score": rng.uniform(0, 100)}
+                for i in range(args.ideas)
+            ],
+        )
+        buyer_ids = list(conn.execute(select(User.id).where(User.id > 1)).scalars())
+        idea_ids = list(conn.execute(select(Idea.id)).scalars())
+
+    return asyncio.run(_workload(args, buyer_ids, idea_ids))
+
+
+def main() -> None:
+    args = _parse_args()
+    if args.profile:
+        print(json.dumps(_run_child(args)))
+        return
+
+    results = {}
+    for profile in PROFILES:
+        cmd = [sys.executable, __file__, "--profile", profile] + [
+            f"--{k.replace('_', '-')}={v}" for k, v in vars(args).items() if k not in ("profile", "json")
+        ]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        results[profile] = json.loads(out.strip().splitlines()[-1])
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for profile, r in results.items():
+        print(f"{profile:>10}: {r['req_per_sec']:>8.1f} req/s")
+        for kind in ("read", "write"):
+            k = r[kind]
+            if k["count"]:
+                print(
+                    f"{'':>12}{kind:>5}: {k['per_sec']:>8.1f}/s  p50={k['p50_ms']:>8.2f}ms  "
+                    f"p99={k['p99_ms']:>8.2f}ms  errors={k['errors']}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+ベンチマーク用の大きな合成データを DB に入れる（seed から決まる・何度流しても同じ中身）。
+
+  python scripts/gen_data.py                                   # users 10万 / ideas 20万 / deals 200万 / listings 5万
+  python scripts/gen_data.py --users 5000 --ideas 20000 --deals 100000 --listings 2000 --seed 7
+  DATABASE_URL=postgresql://... python scripts/gen_data.py --json
+
+分布:
+  - 購入の人気は idea ごとに Zipf（--skew。上位の少数 idea に購入が集中する）、buyer の活発さも弱い Zipf
+  - idea の「質」を Beta(2, 2) で決め、rubric 採点（--scores-per-idea）と total_score をそこからばらつかせる
+  - exclusive は exclusive_option_price がある idea だけ、1 idea 1 件まで（--exclusive-rate）
+  - listings は exclusive deal の所有者が出品したもの
+
+書き込み:
+  - SQLite    executemany（チャンクごとに commit、この接続だけ synchronous=OFF）
+  - Postgres  COPY FROM STDIN（psycopg 3 / psycopg2）。終わったら id の sequence を進める
+  - 入れている間は secondary index と全文検索のトリガ / index を外し、最後にまとめて作り直す
+id は既存の max(id) の続きを明示的に振るので、既存データがあっても追記できる。
+パスワード hash は 1 回だけ計算して全ユーザーで共有する（全員 --password でログインできる）。
+同じ --seed のデータが既にあれば（メールアドレスが重複するので）何もせずに終わる。
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import accumulate
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+
+# --- ensure "import app" works no matter where it is executed ---
+API_ROOT = Path(__file__).resolve().parents[1]  # apps/api
+if str(API_ROOT) not in sys.path:
+    sys.path.insert(0, str(API_ROOT))
+
+# created_at の基準（実行した日時に依存させない）
+EPOCH = datetime(2025, 1, 1)
+SPAN_SECONDS = 365 * 24 * 3600
+RUBRIC = ("logic", "originality", "market", "concreteness", "extensibility")
+WORDS = (
+    "ai market farm coffee cloud green solar water payment travel health music game school robot "
+    "delivery energy finance pet food city home sport fashion media chat local community data"
+).split()
+
+
+def _parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--users", type=int, default=100_000)
+    p.add_argument("--seller-ratio", type=float, default=0.1, help="users のうち SELLER の割合")
+    p.add_argument("--ideas", type=int, default=200_000)
+    p.add_argument("--deals", type=int, default=2_000_000)
+    p.add_argument("--listings", type=int, default=50_000)
+    p.add_argument("--scores-per-idea", type=int, default=2, help="idea ごとの rubric 採点の件数（0 なら total_score だけ）")
+    p.add_argument("--skew", type=float, default=1.1, help="購入人気の Zipf 指数（大きいほど偏る）")
+    p.add_argument("--exclusive-rate", type=float, default=0.05, help="deal が exclusive になる確率")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--password", default="genpass")
+    p.add_argument("--chunk", type=int, default=50_000, help="1 回の executemany / COPY の行数")
+    p.add_argument("--json", action="store_true", help="結果を JSON で出す")
+    return p.parse_args()
+
+
+def _zipf_cum_weights(n: int, s: float) -> list[float]:
+    return list(accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def _at(rnd: random.Random) -> datetime:
+    return EPOCH + timedelta(seconds=rnd.randrange(SPAN_SECONDS))
+
+
+def _chunks(rows: Iterable[tuple], size: int) -> Iterator[list[tuple]]:
+    chunk: list[tuple] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ---------------------------------------------------------------------------
+# writers
+# ---------------------------------------------------------------------------
+
+class SqliteWriter:
+    """
+    ドライバの executemany に、SQLAlchemy の bind processor で変換済みのタプルを渡す
+    （DateTime / Enum / Boolean の保存形式は ORM から入れた行と同じ。行ごとの dict 組み立てと
+    パラメータ処理を省く）。この接続の間だけ fsync を省く（生成し直せるデータなので）。
+    """
+
+    def __init__(self, engine) -> None:
+        self.engine = engine
+
+    def write(self, table, columns: Sequence[str], chunk: list[tuple]) -> None:
+        dialect = self.engine.dialect
+        procs = [table.c[name].type._cached_bind_processor(dialect) for name in columns]
+        if any(procs):
+            chunk = [tuple(p(v) if p else v for p, v in zip(procs, row)) for row in chunk]
+        sql = f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+            conn.exec_driver_sql(sql, chunk)
+
+    def finish(self, tables) -> None:
+        pass
+
+
+class CopyWriter:
+    """
+    Postgres の COPY FROM STDIN。psycopg 3 は cursor.copy()、psycopg2 は copy_expert（CSV）。
+    """
+
+    def __init__(self, engine) -> None:
+        self.engine = engine
+
+    @staticmethod
+    def _text(value):
+        if value is None:
+            return None
+        if isinstance(value, bool):
+            return "t" if value else "f"
+        if isinstance(value, datetime):
+            return value.isoformat(sep=" ")
+        return value
+
+    def write(self, table, columns: Sequence[str], chunk: list[tuple]) -> None:
+        sql = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN"
+        raw = self.engine.raw_connection()
+        try:
+            cur = raw.cursor()
+            if hasattr(cur, "copy"):  # psycopg 3
+                with cur.copy(sql) as copy:
+                    for row in chunk:
+                        copy.write_row([self._text(v) for v in row])
+            else:  # psycopg2
+                buf = io.StringIO()
+                w = csv.writer(buf)
+                for row in chunk:
+                    # CSV では空の未クオート値が NULL
+                    w.writerow(["" if v is None else self._text(v) for v in row])
+                buf.seek(0)
+                cur.copy_expert(f"{sql} WITH (FORMAT csv)", buf)
+            raw.commit()
+        finally:
+            raw.close()
+
+    def finish(self, tables) -> None:
+        from sqlalchemy import text
+
+        # id を明示して入れたので、次の INSERT が衝突しないよう sequence を max(id) に合わせる
+        with self.engine.begin() as conn:
+            for table in tables:
+                conn.execute(
+                    text(
+                        f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                        f"(SELECT COALESCE(max(id), 1) FROM {table.name}))"
+                    )
+                )
+
+
+# ---------------------------------------------------------------------------
+# generator
+# ---------------------------------------------------------------------------
+
+def generate(args: argparse.Namespace, writer, start_ids: dict[str, int], pw_hash: str) -> dict[str, dict]:
+    from app.models.models import Deal, Idea, Score, User
+    from app.models.resale_listing import ResaleListing
+
+    rnd = random.Random(args.seed)
+    stats: dict[str, dict] = {}
+
+    def load(table, columns: Sequence[str], rows: Iterable[tuple]) -> None:
+        t0 = time.perf_counter()
+        n = 0
+        for chunk in _chunks(rows, args.chunk):
+            writer.write(table, columns, chunk)
+            n += len(chunk)
+        seconds = time.perf_counter() - t0
+        stats[table.name] = {"rows": n, "seconds": round(seconds, 2), "rows_per_sec": round(n / seconds) if seconds else 0}
+
+    # --- users: 先頭に採点者（ADMIN）、次に SELLER、残りが BUYER ---
+    n_scorers = max(args.scores_per_idea, 5) if args.scores_per_idea else 0
+    n_sellers = max(1, int(args.users * args.seller_ratio))
+    n_buyers = max(1, args.users - n_sellers)
+    first_user = start_ids["users"]
+    scorer_ids = list(range(first_user, first_user + n_scorers))
+    seller_ids = list(range(first_user + n_scorers, first_user + n_scorers + n_sellers))
+    buyer_ids = list(range(seller_ids[-1] + 1, seller_ids[-1] + 1 + n_buyers))
+
+    def users() -> Iterator[tuple]:
+        for n, uid in enumerate(scorer_ids + seller_ids + buyer_ids):
+            role = "ADMIN" if n < n_scorers else "SELLER" if n < n_scorers + n_sellers else "BUYER"
+            yield (uid, f"gen{args.seed}-{n}@ifm.test", pw_hash, role, "ACTIVE", _at(rnd))
+
+    load(User.__table__, ("id", "email", "password_hash", "role", "status", "created_at"), users())
+
+    # --- ideas と scores（idea の質から採点を作り、total_score は採点の平均） ---
+    first_idea = start_ids["ideas"]
+    idea_ids = list(range(first_idea, first_idea + args.ideas))
+    price_of: dict[int, float] = {}
+    exclusive_price_of: dict[int, float] = {}
+    idea_scores: list[tuple] = []
+    next_score = start_ids["scores"]
+
+    def ideas() -> Iterator[tuple]:
+        nonlocal next_score
+        for iid in idea_ids:
+            quality = rnd.betavariate(2, 2)
+            price = float(rnd.choice((0, 100, 300, 500, 1000, 3000)))
+            exclusive = float(rnd.choice((1000, 3000, 10000))) if rnd.random() < 0.4 else None
+            price_of[iid] = price
+            if exclusive is not None:
+                exclusive_price_of[iid] = exclusive
+            created = _at(rnd)
+
+            score_sum = 0
+            scorers = rnd.sample(scorer_ids, args.scores_per_idea) if args.scores_per_idea else []
+            for scorer in scorers:
+                axes = [min(20, max(0, round(rnd.gauss(quality * 20, 3)))) for _ in RUBRIC]
+                total = sum(axes)
+                score_sum += total
+                idea_scores.append((next_score, iid, *axes, total, scorer, created + timedelta(hours=rnd.randrange(1, 240))))
+                next_score += 1
+            if scorers:
+                total_score = score_sum / len(scorers)
+            else:
+                total_score = round(min(100.0, max(0.0, rnd.gauss(quality * 100, 8))), 1)
+
+            words = rnd.sample(WORDS, 6)
+            yield (
+                iid,
+                rnd.choice(seller_ids),
+                f"{words[0]} {words[1]} {words[2]} #{iid}",
+                " ".join(words),
+                " ".join(rnd.choices(WORDS, k=40)),
+                price,
+                rnd.random() < 0.8,
+                exclusive,
+                "ACTIVE" if rnd.random() < 0.9 else rnd.choice(("SUBMITTED", "ARCHIVED")),
+                total_score,
+                created,
+                score_sum,
+                len(scorers),
+            )
+
+    load(
+        Idea.__table__,
+        (
+            "id", "seller_id", "title", "summary", "body", "price", "resale_allowed", "exclusive_option_price",
+            "status", "total_score", "created_at", "score_sum", "score_count",
+        ),
+        ideas(),
+    )
+    if idea_scores:
+        load(
+            Score.__table__,
+            ("id", "idea_id", *RUBRIC, "total", "scored_by", "scored_at"),
+            idea_scores,
+        )
+        idea_scores.clear()
+
+    # --- deals: idea は Zipf（人気の順番は id と無関係にシャッフル）、buyer も弱い Zipf ---
+    by_popularity = idea_ids[:]
+    rnd.shuffle(by_popularity)
+    idea_cum = _zipf_cum_weights(len(by_popularity), args.skew)
+    buyers_by_activity = buyer_ids[:]
+    rnd.shuffle(buyers_by_activity)
+    buyer_cum = _zipf_cum_weights(len(buyers_by_activity), 0.6)
+
+    # (buyer, idea) は unique。全組み合わせより多くは作れない
+    target = min(args.deals, len(buyer_ids) * len(idea_ids))
+    seen: set[int] = set()
+    exclusive_owner: dict[int, int] = {}
+    first_deal = start_ids["deals"]
+
+    def deals() -> Iterator[tuple]:
+        made = 0
+        attempts = 0
+        while made < target and attempts < target * 20:
+            batch = min(10_000, target - made)
+            attempts += batch
+            for iid, bid in zip(
+                rnd.choices(by_popularity, cum_weights=idea_cum, k=batch),
+                rnd.choices(buyers_by_activity, cum_weights=buyer_cum, k=batch),
+            ):
+                key = bid * (len(idea_ids) + first_idea) + iid
+                if key in seen:
+                    continue
+                seen.add(key)
+                is_exclusive = (
+                    iid in exclusive_price_of
+                    and iid not in exclusive_owner
+                    and rnd.random() < args.exclusive_rate
+                )
+                if is_exclusive:
+                    exclusive_owner[iid] = bid
+                amount = exclusive_price_of[iid] if is_exclusive else price_of[iid]
+                yield (first_deal + made, iid, bid, amount, is_exclusive, _at(rnd), 0)
+                made += 1
+
+    load(Deal.__table__, ("id", "idea_id", "buyer_id", "amount", "is_exclusive", "created_at", "version"), deals())
+    seen.clear()
+
+    # --- listings: exclusive の所有者が出品 ---
+    owned = sorted(exclusive_owner.items())
+    picked = rnd.sample(owned, min(args.listings, len(owned)))
+    first_listing = start_ids["resale_listings"]
+
+    def listings() -> Iterator[tuple]:
+        for n, (iid, owner) in enumerate(picked):
+            created = _at(rnd)
+            price = int(exclusive_price_of[iid] * rnd.uniform(0.8, 2.0))
+            yield (first_listing + n, iid, owner, price, rnd.random() < 0.9, created, created)
+
+    load(
+        ResaleListing.__table__,
+        ("id", "idea_id", "seller_id", "price", "is_active", "created_at", "updated_at"),
+        listings(),
+    )
+    return stats
+
+
+@contextmanager
+def _bulk_load_mode(engine, tables):
+    """
+    行ごとの index 更新（とトリガ）を避けるため、入れる前に外して最後にまとめて作る。
+    途中で失敗しても finally で必ず戻す（fingerprint は変わらないので起動時には作り直されない）。
+    """
+    from app import search
+
+    indexes = [index for table in tables for index in table.indexes]
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            for trigger in ("ideas_fts_ai", "ideas_fts_ad", "ideas_fts_au"):
+                conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+        elif engine.dialect.name == "postgresql":
+            conn.exec_driver_sql("DROP INDEX IF EXISTS ix_ideas_search_vector")
+        for index in indexes:
+            index.drop(conn, checkfirst=True)
+    try:
+        yield
+    finally:
+        t0 = time.perf_counter()
+        with engine.begin() as conn:
+            for index in indexes:
+                index.create(conn, checkfirst=True)
+        search.install(engine)
+        print(f"indexes rebuilt in {time.perf_counter() - t0:.2f}s", file=sys.stderr)
+
+
+def main() -> None:
+    args = _parse_args()
+    os.environ.setdefault("IFM_AUTO_SEED", "0")
+
+    from sqlalchemy import func, select
+
+    from app.db.schema import ensure_schema
+    from app.db.session import engine
+    from app.models.models import Base, Deal, Idea, Score, User
+    from app.models.resale_listing import ResaleListing
+    from app.security import hash_password
+
+    ensure_schema(engine, Base.metadata)
+    tables = [User.__table__, Idea.__table__, Score.__table__, Deal.__table__, ResaleListing.__table__]
+    with engine.connect() as conn:
+        if conn.execute(select(User.id).where(User.email == f"gen{args.seed}-0@ifm.test")).first():
+            print(f"dataset for --seed {args.seed} is already loaded")
+            return
+        start_ids = {t.name: (conn.execute(select(func.max(t.c.id))).scalar() or 0) + 1 for t in tables}
+
+    # 全員同じパスワードなので hash は 1 回だけ計算する
+    pw_hash = hash_password(args.password)
+    if engine.dialect.name == "postgresql":
+        writer = CopyWriter(engine)
+    elif engine.dialect.name == "sqlite":
+        writer = SqliteWriter(engine)
+    else:
+        raise SystemExit(f"unsupported database: {engine.dialect.name}")
+
+    t0 = time.perf_counter()
+    with _bulk_load_mode(engine, tables):
+        stats = generate(args, writer, start_ids, pw_hash)
+        writer.finish(tables)
+    seconds = time.perf_counter() - t0
+    rows = sum(s["rows"] for s in stats.values())
+
+    result = {
+        "database": engine.dialect.name,
+        "seed": args.seed,
+        "tables": stats,
+        "rows": rows,
+        "seconds": round(seconds, 2),
+        "rows_per_sec": round(rows / seconds) if seconds else 0,
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    for name, s in stats.items():
+        print(f"{name:<16} {s['rows']:>10} rows  {s['seconds']:>7.2f}s  {s['rows_per_sec']:>9} rows/s")
+    print(f"{'total':<16} {rows:>10} rows  {seconds:>7.2f}s  {result['rows_per_sec']:>9} rows/s")
+
+
+if __name__ == "__main__":
+    main()
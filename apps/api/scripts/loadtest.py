@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+login / recommended / deals / resale を混ぜた負荷をかけ、エンドポイントごとの
+スループットと p50 / p95 / p99 レイテンシを出す。
+
+  python scripts/loadtest.py                                   # in-process（httpx.ASGITransport）、一時 SQLite
+  python scripts/loadtest.py --users 500 --ideas 20000 --iterations 5000 --concurrency 64
+  python scripts/loadtest.py --mix login=0,browse=1,deals=0,resale=0   # recommended だけ
+  python scripts/loadtest.py --out load.json                   # 結果を JSON で保存
+  python scripts/loadtest.py --baseline load-prev.json         # 前回の JSON との差分を出す
+
+  # 起動済みのサーバに当てる（seed はサーバと同じ DB に直接入れるので DATABASE_URL も合わせる）
+  DATABASE_URL=sqlite:///./app.db python scripts/loadtest.py --url http://127.0.0.1:8000
+
+シナリオ（--mix の重みで 1 iteration ごとに 1 つ選ぶ）:
+  login   POST /auth/login（ログイン集中）
+  browse  GET /ideas/recommended を cursor で 1-3 ページ
+  deals   POST /deals で購入、exclusive があれば一部は upgrade
+  resale  所有者が POST /resale/list し、--racers 人が同時に POST /resale/buy（勝つのは 1 人）
+
+データは --seed から決まる（同じ引数なら同じ dataset・同じシナリオ列）。
+既に同じ dataset（loadtest0@ifm.test がいる DB）なら seed はせずにそのまま使う。
+エラーは 5xx と通信エラー。409 / 404 などの想定内の負けはステータス別に数えるだけ。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+# --- ensure "import app" works no matter where it is executed ---
+API_ROOT = Path(__file__).resolve().parents[1]  # apps/api
+if str(API_ROOT) not in sys.path:
+    sys.path.insert(0, str(API_ROOT))
+
+PASSWORD = "loadpass"
+SCENARIOS = ("login", "browse", "deals", "resale")
+DEFAULT_MIX = "login=1,browse=6,deals=2,resale=1"
+
+
+def _parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--url", default=None, help="起動済みサーバの base URL（省略時は in-process）")
+    p.add_argument("--users", type=int, default=200, help="buyer の数")
+    p.add_argument("--ideas", type=int, default=2000)
+    p.add_argument("--listings", type=int, default=50, help="resale に使う exclusive 所有済み idea の数")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--iterations", type=int, default=2000, help="シナリオの実行回数（全 VU の合計）")
+    p.add_argument("--concurrency", type=int, default=32, help="同時に動かす仮想ユーザー数")
+    p.add_argument("--racers", type=int, default=4, help="resale で同じ listing を同時に買いに行く人数")
+    p.add_argument("--mix", default=DEFAULT_MIX, help=f"シナリオの重み（既定 {DEFAULT_MIX}）")
+    p.add_argument("--out", default=None, help="結果の JSON を書き出すパス")
+    p.add_argument("--baseline", default=None, help="比較する前回の JSON")
+    p.add_argument("--json", action="store_true", help="結果を JSON で標準出力に出す")
+    return p.parse_args()
+
+
+def _parse_mix(text: str) -> dict[str, float]:
+    mix = {name: 0.0 for name in SCENARIOS}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in mix:
+            raise SystemExit(f"unknown scenario in --mix: {name} (choose from {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise SystemExit("--mix has no scenario with a positive weight")
+    return mix
+
+
+# ---------------------------------------------------------------------------
+# dataset
+# ---------------------------------------------------------------------------
+
+def _seed_dataset(args: argparse.Namespace) -> dict:
+    """
+    buyer / seller / ideas / resale 用の exclusive deal を入れる（既にあれば読むだけ）。
+    """
+    from sqlalchemy import insert, select
+
+    from app.db.schema import ensure_schema
+    from app.db.session import engine
+    from app.models.models import Base, Deal, Idea, User
+    from app.security import hash_password
+
+    ensure_schema(engine, Base.metadata)
+    emails = [f"loadtest{i}@ifm.test" for i in range(args.users)]
+
+    with engine.begin() as conn:
+        existing = conn.execute(select(User.id).where(User.email == emails[0])).scalar()
+        if existing is None:
+            rnd = random.Random(args.seed)
+            # 全員同じパスワードなので hash は 1 回だけ計算する
+            pw_hash = hash_password(PASSWORD)
+            conn.execute(
+                insert(User),
+                [{"email": e, "password_hash": pw_hash, "role": "BUYER", "status": "ACTIVE"} for e in emails]
+                + [{"email": "loadtest-seller@ifm.test", "password_hash": pw_hash, "role": "SELLER", "status": "ACTIVE"}],
+            )
+            seller_id = conn.execute(select(User.id).where(User.email == "loadtest-seller@ifm.test")).scalar_one()
+            conn.execute(
+                insert(Idea),
+                [
+                    {
+                        "seller_id": seller_id,
+                        "title": f"loadtest idea {i}",
+                        "summary": "load test",
+                        "body": "load test body",
+                        "price": rnd.choice((0, 100, 300, 500)),
+                        "exclusive_option_price": rnd.choice((None, 1000, 3000)) if i >= args.listings else 1000,
+                        "status": "ACTIVE",
+                        "total_score": rnd.randint(0, 100),
+                    }
+                    for i in range(args.ideas)
+                ],
+            )
+
+        user_ids = dict(conn.execute(select(User.email, User.id).where(User.email.in_(emails))).all())
+        buyers = [user_ids[e] for e in emails]
+        ideas = list(
+            conn.execute(
+                select(Idea.id, Idea.exclusive_option_price)
+                .where(Idea.title.like("loadtest idea %"))
+                .order_by(Idea.id)
+            ).all()
+        )
+        listing_ideas = [i.id for i in ideas[: args.listings]]
+
+        # resale 用: 先頭 --listings 件の exclusive 所有者（無ければ buyer に順番に割り当てる）
+        owners = dict(
+            conn.execute(
+                select(Deal.idea_id, Deal.buyer_id).where(
+                    Deal.idea_id.in_(listing_ideas), Deal.is_exclusive == True  # noqa: E712
+                )
+            ).all()
+        )
+        missing = [i for i in listing_ideas if i not in owners]
+        if missing:
+            new = {idea_id: buyers[n % len(buyers)] for n, idea_id in enumerate(missing)}
+            conn.execute(
+                insert(Deal),
+                [{"idea_id": i, "buyer_id": b, "amount": 1000, "is_exclusive": True} for i, b in new.items()],
+            )
+            owners.update(new)
+
+    return {
+        "emails": emails,
+        "buyers": buyers,
+        "email_by_id": {user_ids[e]: e for e in emails},
+        "ideas": [i.id for i in ideas[args.listings:]],
+        "exclusive_ideas": {i.id for i in ideas[args.listings:] if i.exclusive_option_price is not None},
+        "owners": owners,
+    }
+
+
+# ---------------------------------------------------------------------------
+# load
+# ---------------------------------------------------------------------------
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, Counter] = defaultdict(Counter)
+        self.errors: Counter = Counter()
+
+    async def call(self, client, label: str, method: str, url: str, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            r = await client.request(method, url, **kwargs)
+        except Exception as e:
+            self.latencies[label].append(time.perf_counter() - t0)
+            self.statuses[label][type(e).__name__] += 1
+            self.errors[label] += 1
+            return None
+        self.latencies[label].append(time.perf_counter() - t0)
+        self.statuses[label][str(r.status_code)] += 1
+        if r.status_code >= 500:
+            self.errors[label] += 1
+        return r
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    # nearest-rank
+    return sorted_values[max(0, min(len(sorted_values) - 1, math.ceil(q * len(sorted_values)) - 1))]
+
+
+def _summary(rec: Recorder, seconds: float) -> dict:
+    endpoints = {}
+    for label in sorted(rec.latencies):
+        values = sorted(rec.latencies[label])
+        endpoints[label] = {
+            "requests": len(values),
+            "errors": rec.errors[label],
+            "statuses": dict(sorted(rec.statuses[label].items())),
+            "rps": round(len(values) / seconds, 1),
+            "mean_ms": round(sum(values) / len(values) * 1000, 2),
+            "p50_ms": round(_percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(_percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(_percentile(values, 0.99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2),
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    return {
+        "seconds": round(seconds, 3),
+        "requests": total,
+        "errors": sum(rec.errors.values()),
+        "rps": round(total / seconds, 1) if seconds else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+async def _login(client, rec: Recorder, email: str) -> str | None:
+    r = await rec.call(client, "POST /auth/login", "POST", "/auth/login", json={"email": email, "password": PASSWORD})
+    if r is None or r.status_code != 200:
+        return None
+    return r.json()["access_token"]
+
+
+async def _run(args: argparse.Namespace, data: dict, mix: dict[str, float]) -> dict:
+    import httpx
+
+    rec = Recorder()
+    if args.url:
+        transport = None
+        base_url = args.url.rstrip("/")
+        lifespan = None
+    else:
+        from app.main import app
+
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://loadtest"
+        # startup / shutdown（スキーマ確認・パスワードプール・audit writer）も本番と同じに回す
+        lifespan = app.router.lifespan_context(app)
+
+    if lifespan is not None:
+        await lifespan.__aenter__()
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency * max(args.racers, 1))
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits, timeout=30) as client:
+            # 準備: 全 buyer の token（計測には入れない）
+            warmup = Recorder()
+            sem = asyncio.Semaphore(args.concurrency)
+
+            async def login_for_token(email: str):
+                async with sem:
+                    return await _login(client, warmup, email)
+
+            tokens = await asyncio.gather(*(login_for_token(e) for e in data["emails"]))
+            if warmup.errors or any(t is None for t in tokens):
+                raise SystemExit(f"warm-up login failed: {dict(warmup.statuses['POST /auth/login'])}")
+            headers = {
+                uid: {"Authorization": f"Bearer {t}"} for uid, t in zip(data["buyers"], tokens)
+            }
+
+            owners: dict[int, int] = dict(data["owners"])
+            listing_locks = {idea_id: asyncio.Lock() for idea_id in owners}
+            names = [n for n in SCENARIOS if mix[n] > 0]
+            weights = [mix[n] for n in names]
+
+            async def browse(rnd: random.Random, me: int) -> None:
+                params = {"limit": 20}
+                for _ in range(rnd.randint(1, 3)):
+                    r = await rec.call(client, "GET /ideas/recommended", "GET", "/ideas/recommended", params=params, headers=headers[me])
+                    cursor = r.headers.get("X-Next-Cursor") if r is not None else None
+                    if not cursor:
+                        break
+                    params = {"limit": 20, "cursor": cursor}
+
+            async def deals(rnd: random.Random, me: int) -> None:
+                idea_id = rnd.choice(data["ideas"])
+                await rec.call(client, "POST /deals", "POST", "/deals", json={"idea_id": idea_id}, headers=headers[me])
+                if idea_id in data["exclusive_ideas"] and rnd.random() < 0.3:
+                    await rec.call(
+                        client, "POST /deals (upgrade)", "POST", "/deals",
+                        json={"idea_id": idea_id, "is_exclusive": True}, headers=headers[me],
+                    )
+
+            async def resale(rnd: random.Random, me: int) -> None:
+                idea_id = rnd.choice(list(owners))
+                # 同じ listing の出品〜レースは 1 組ずつ（所有者の追跡を単純にするため）
+                async with listing_locks[idea_id]:
+                    owner = owners[idea_id]
+                    r = await rec.call(
+                        client, "POST /resale/list", "POST", "/resale/list",
+                        json={"idea_id": idea_id, "price": rnd.randint(500, 5000)}, headers=headers[owner],
+                    )
+                    if r is None or r.status_code != 200:
+                        return
+                    racers = rnd.sample([b for b in data["buyers"] if b != owner], min(args.racers, len(data["buyers"]) - 1))
+                    results = await asyncio.gather(
+                        *(
+                            rec.call(client, "POST /resale/buy", "POST", "/resale/buy", json={"idea_id": idea_id}, headers=headers[b])
+                            for b in racers
+                        )
+                    )
+                    winners = [b for b, res in zip(racers, results) if res is not None and res.status_code == 200]
+                    if winners:
+                        owners[idea_id] = winners[0]
+
+            async def login(rnd: random.Random, me: int) -> None:
+                await _login(client, rec, data["email_by_id"][me])
+
+            scenario = {"login": login, "browse": browse, "deals": deals, "resale": resale}
+
+            # iteration ごとに、どのシナリオを誰がやるかは seed から決める
+            plan_rnd = random.Random(args.seed)
+            plan = [
+                (plan_rnd.choices(names, weights)[0], plan_rnd.choice(data["buyers"]), plan_rnd.randrange(1 << 30))
+                for _ in range(args.iterations)
+            ]
+            queue: asyncio.Queue = asyncio.Queue()
+            for item in plan:
+                queue.put_nowait(item)
+
+            async def vu() -> None:
+                while not queue.empty():
+                    name, me, seed = queue.get_nowait()
+                    await scenario[name](random.Random(seed), me)
+
+            t0 = time.perf_counter()
+            await asyncio.gather(*(vu() for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - t0
+    finally:
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+            from app.db.session import async_engine, async_write_engine
+
+            await async_engine.dispose()
+            await async_write_engine.dispose()
+
+    return _summary(rec, elapsed)
+
+
+# ---------------------------------------------------------------------------
+# report
+# ---------------------------------------------------------------------------
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=API_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _print_table(result: dict, baseline: dict | None) -> None:
+    base = (baseline or {}).get("endpoints", {})
+    print(f"{'endpoint':<26} {'reqs':>6} {'err':>4} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}  statuses")
+    for label, e in result["endpoints"].items():
+        line = (
+            f"{label:<26} {e['requests']:>6} {e['errors']:>4} {e['rps']:>8.1f} "
+            f"{e['p50_ms']:>7.1f}ms {e['p95_ms']:>6.1f}ms {e['p99_ms']:>6.1f}ms  {e['statuses']}"
+        )
+        b = base.get(label)
+        if b:
+            def pct(new: float, old: float) -> str:
+                return f"{(new - old) / old * 100:+.0f}%" if old else "n/a"
+
+            line += f"\n{'':<26} vs baseline: rps {pct(e['rps'], b['rps'])}, p95 {pct(e['p95_ms'], b['p95_ms'])}, p99 {pct(e['p99_ms'], b['p99_ms'])}"
+        print(line)
+    print(f"total: {result['requests']} requests in {result['seconds']:.2f}s ({result['rps']:.1f} req/s), errors={result['errors']}")
+
+
+def main() -> None:
+    args = _parse_args()
+    mix = _parse_mix(args.mix)
+    if args.url is None and not os.getenv("DATABASE_URL"):
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='ifm-loadtest-')}/load.db"
+    os.environ.setdefault("IFM_AUTO_SEED", "0")
+
+    data = _seed_dataset(args)
+    result = asyncio.run(_run(args, data, mix))
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "target": args.url or "in-process",
+            "database": "server" if args.url else os.environ["DATABASE_URL"].split(":", 1)[0],
+            "users": args.users,
+            "ideas": args.ideas,
+            "listings": args.listings,
+            "seed": args.seed,
+            "iterations": args.iterations,
+            "concurrency": args.concurrency,
+            "racers": args.racers,
+            "mix": mix,
+        },
+        **result,
+    }
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2) + "\n")
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+        _print_table(report, baseline)
+    if report["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
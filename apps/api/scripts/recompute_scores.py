@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+ideas.score_sum / score_count / total_score を scores から作り直す（backfill・不整合の修復用）。
+
+  python scripts/recompute_scores.py
+  python scripts/recompute_scores.py --chunk 5000
+
+id の範囲ごとに 1 文の UPDATE（相関サブクエリで集計）を流し、チャンクごとに commit する。
+採点が 1 件も無い idea の total_score は変えない。
+動いている API のランキング index（IFM_RANKING_INDEX=1）とマーケットのキャッシュには反映されないので、
+終わったら /_debug/ranking?repair=true か再起動で揃える。
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# --- ensure "import app" works no matter where it is executed ---
+API_ROOT = Path(__file__).resolve().parents[1]  # apps/api
+if str(API_ROOT) not in sys.path:
+    sys.path.insert(0, str(API_ROOT))
+
+from sqlalchemy import func, select  # noqa: E402
+
+from app.db.session import engine  # noqa: E402
+from app.models.models import Idea  # noqa: E402
+from app.scoring import recompute_stmt  # noqa: E402
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--chunk", type=int, default=1000, help="1 回の UPDATE で扱う idea id の幅")
+    args = p.parse_args()
+
+    with engine.connect() as conn:
+        lo, hi = conn.execute(select(func.min(Idea.id), func.max(Idea.id))).one()
+    if lo is None:
+        print("no ideas")
+        return
+
+    t0 = time.perf_counter()
+    updated = 0
+    for start in range(lo, hi + 1, args.chunk):
+        with engine.begin() as conn:
+            updated += conn.execute(recompute_stmt(start, start + args.chunk)).rowcount
+    print(f"recomputed {updated} ideas in {time.perf_counter() - t0:.2f}s (chunk={args.chunk})")
+
+
+if __name__ == "__main__":
+    main()
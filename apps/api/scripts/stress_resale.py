@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+/resale/buy に同じ listing を複数の買い手から同時に投げて、付け替えが 1 人にしか
+起きないことと、衝突率・付け替えスループットを測る。
+
+  python scripts/stress_resale.py
+  python scripts/stress_resale.py --listings 50 --buyers-per-listing 8 --rounds 5
+  IFM_SQLITE_PROFILE=production python scripts/stress_resale.py
+
+各ラウンドで全 listing に買い手をぶつけ、勝った買い手が次のラウンド用に出品し直す。
+DATABASE_URL を指定しなければ一時ディレクトリの SQLite を使う。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+# --- ensure "import app" works no matter where it is executed ---
+API_ROOT = Path(__file__).resolve().parents[1]  # apps/api
+if str(API_ROOT) not in sys.path:
+    sys.path.insert(0, str(API_ROOT))
+
+
+def _parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--listings", type=int, default=20)
+    p.add_argument("--buyers-per-listing", type=int, default=8)
+    p.add_argument("--rounds", type=int, default=3)
+    p.add_argument("--json", action="store_true", help="結果を JSON で出す")
+    return p.parse_args()
+
+
+async def _run(args: argparse.Namespace, owners: dict[int, int], buyers: list[int]) -> dict:
+    import httpx
+    from sqlalchemy import func, select
+
+    from app.db.session import async_engine
+    from app.main import app
+    from app.models.models import Deal
+    from app.security import create_access_token
+
+    headers = {u: {"Authorization": f"Bearer {create_access_token(data={'sub': str(u)})}"} for u in buyers}
+    statuses: Counter = Counter()
+    transfers = 0
+    violations = 0
+    buy_seconds = 0.0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://stress") as client:
+        for rnd in range(args.rounds):
+            # 今の所有者が出品する
+            for idea_id, owner in owners.items():
+                r = await client.post("/resale/list", json={"idea_id": idea_id, "price": 100 + rnd}, headers=headers[owner])
+                r.raise_for_status()
+
+            # listing ごとに、所有者以外の買い手を同時にぶつける
+            attempts = []
+            for n, (idea_id, owner) in enumerate(owners.items()):
+                pool = [b for b in buyers if b != owner]
+                for k in range(args.buyers_per_listing):
+                    attempts.append((idea_id, pool[(n * args.buyers_per_listing + k + rnd) % len(pool)]))
+
+            async def one(idea_id: int, buyer: int):
+                r = await client.post("/resale/buy", json={"idea_id": idea_id}, headers=headers[buyer])
+                return idea_id, buyer, r.status_code
+
+            t0 = time.perf_counter()
+            results = await asyncio.gather(*(one(i, b) for i, b in attempts))
+            buy_seconds += time.perf_counter() - t0
+
+            winners: dict[int, list[int]] = {}
+            for idea_id, buyer, status in results:
+                statuses[status] += 1
+                if status == 200:
+                    winners.setdefault(idea_id, []).append(buyer)
+            for idea_id in owners:
+                won = winners.get(idea_id, [])
+                violations += len(won) > 1
+                if won:
+                    owners[idea_id] = won[0]
+                    transfers += 1
+
+    # 不変条件: idea ごとに exclusive deal はちょうど 1 件で、持ち主は最後の勝者
+    async with async_engine.connect() as conn:
+        rows = (
+            await conn.execute(
+                select(Deal.idea_id, func.count(), func.max(Deal.buyer_id))
+                .where(Deal.is_exclusive == True, Deal.idea_id.in_(list(owners)))  # noqa: E712
+                .group_by(Deal.idea_id)
+            )
+        ).all()
+    violations += sum(1 for idea_id, n, owner in rows if n != 1 or owner != owners[idea_id])
+    await async_engine.dispose()
+
+    attempts_total = sum(statuses.values())
+    return {
+        "listings": len(owners),
+        "buyers_per_listing": args.buyers_per_listing,
+        "rounds": args.rounds,
+        "attempts": attempts_total,
+        "transfers": transfers,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        # 負けた買い手: 409（付け替えで負けた）と 404（読む前に売れて listing が消えていた）
+        "conflict_rate": round((statuses[409] + statuses[404]) / attempts_total, 3) if attempts_total else 0.0,
+        "transfers_per_sec": round(transfers / buy_seconds, 1) if buy_seconds else 0.0,
+        "attempts_per_sec": round(attempts_total / buy_seconds, 1) if buy_seconds else 0.0,
+        "invariant_violations": violations,
+    }
+
+
+def main() -> None:
+    args = _parse_args()
+    if not os.getenv("DATABASE_URL"):
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='ifm-stress-resale-')}/stress.db"
+    os.environ.setdefault("IFM_AUTO_SEED", "0")
+
+    from sqlalchemy import insert, select
+
+    from app.db.session import engine
+    from app.models.models import Base, Deal, Idea, User
+
+    Base.metadata.create_all(bind=engine)
+    n_buyers = args.buyers_per_listing + 1
+    with engine.begin() as conn:
+        start = conn.execute(select(User.id).order_by(User.id.desc()).limit(1)).scalar() or 0
+        conn.execute(
+            insert(User),
+            [
+                {"email": f"stress{start + i}@ifm.com", "password_hash": "-", "role": "BUYER", "status": "ACTIVE"}
+                for i in range(n_buyers + 1)
+            ],
+        )
+        user_ids = list(conn.execute(select(User.id).where(User.id > start).order_by(User.id)).scalars())
+        seller, buyers = user_ids[0], user_ids[1:]
+
+        first_idea = conn.execute(select(Idea.id).order_by(Idea.id.desc()).limit(1)).scalar() or 0
+        conn.execute(
+            insert(Idea),
+            [
+                {"seller_id": seller, "title": f"stress {i}", "summary": "s", "body": "b", "status": "ACTIVE", "exclusive_option_price": 100}
+                for i in range(args.listings)
+            ],
+        )
+        idea_ids = list(conn.execute(select(Idea.id).where(Idea.id > first_idea).order_by(Idea.id)).scalars())
+        # 最初の所有者は buyers に順番に割り当てる
+        owners = {idea_id: buyers[n % len(buyers)] for n, idea_id in enumerate(idea_ids)}
+        conn.execute(
+            insert(Deal),
+            [{"idea_id": i, "buyer_id": b, "amount": 100, "is_exclusive": True} for i, b in owners.items()],
+        )
+
+    res = asyncio.run(_run(args, owners, buyers))
+    if args.json:
+        print(json.dumps(res, indent=2))
+        return
+    print(
+        f"transfers={res['transfers']}/{res['listings'] * res['rounds']}  attempts={res['attempts']}  "
+        f"conflict_rate={res['conflict_rate']:.1%}  {res['transfers_per_sec']:.1f} transfers/s  "
+        f"statuses={res['statuses']}  invariant_violations={res['invariant_violations']}"
+    )
+    if res["invariant_violations"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
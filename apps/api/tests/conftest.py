@@ -0,0 +1,232 @@
+"""
+共通 fixture。テストは全部 app をテストのプロセス内で動かす（サーバを立てない）。
+
+DB は worker ごとに別の SQLite ファイル:
+  - スキーマだけ作ったテンプレート DB をプロセスツリーで 1 回だけ作り（xdist なら controller）、
+    worker（PYTEST_XDIST_WORKER）ごとにファイルをコピーして使う。起動時の DDL も流れない
+  - pytest -n auto で worker 数だけ並列に走る。テスト同士は DB を共有しない前提で、
+    必要なデータは make_user / make_idea でそのテストの中で作る
+  - TEST_DATABASE_URL を指定するとその DB をそのまま使う（コピーしないので -n は付けない）
+
+query_budget はリクエストを処理している間に流れた SQL を SQLAlchemy の before_cursor_execute で記録し、
+上限を超えたら流れた SQL を全部出して fail する:
+
+    with query_budget(3):
+        app_client.post("/deals", ...)
+    with query_budget(exact=1):
+        app_client.get("/resale/market")
+"""
+from __future__ import annotations
+
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+import pytest
+
+
+def _build_template(path: str) -> None:
+    from sqlalchemy import create_engine
+
+    from app.db.schema import sync_schema
+    from app.models.models import Base
+
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        sync_schema(engine, Base.metadata)
+    finally:
+        engine.dispose()
+
+
+def _worker_database_url() -> str:
+    if os.getenv("TEST_DATABASE_URL"):
+        return os.environ["TEST_DATABASE_URL"]
+    # 子プロセス（xdist の worker）には環境変数で template の場所を渡す
+    template = os.getenv("IFM_TEST_TEMPLATE_DB")
+    tmp_dir = os.path.dirname(template) if template else tempfile.mkdtemp(prefix="ifm-tests-")
+    path = os.path.join(tmp_dir, f"test-{os.getenv('PYTEST_XDIST_WORKER', 'main')}.db")
+    # engine は import 時に作られる（接続はまだしない）ので、app を import する前に URL を決める
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    if not template:
+        template = os.path.join(tmp_dir, "template.db")
+        _build_template(template)
+        os.environ["IFM_TEST_TEMPLATE_DB"] = template
+    shutil.copyfile(template, path)
+    return os.environ["DATABASE_URL"]
+
+
+# app を import する前に、app 用の DB と設定を決めておく
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["IFM_PASSWORD_WORKERS"] = "0"  # hash / verify はスレッドで（プロセスを立てない）
+os.environ["DATABASE_URL"] = _worker_database_url()
+
+
+class QueryLog:
+    def __init__(self) -> None:
+        self.statements: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self.statements)
+
+    def format(self) -> str:
+        return "\n".join(f"  [{i}] {' '.join(sql.split())}" for i, sql in enumerate(self.statements, 1))
+
+
+# BEGIN IMMEDIATE（SQLite 本番プロファイルの writer lane）などはプロファイルで増減するので数えない
+_TRANSACTION_CONTROL = re.compile(r"\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b", re.IGNORECASE)
+
+
+@contextmanager
+def record_queries():
+    """
+    ブロックの間に、リクエストの処理中（MetricsMiddleware の内側）に流れた SQL を記録する。
+    起動処理や audit writer などのバックグラウンドの SQL と、トランザクション制御の文は数えない。
+    """
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    from app import metrics
+
+    log = QueryLog()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if metrics.in_request() and not _TRANSACTION_CONTROL.match(statement):
+            log.statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield log
+    finally:
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+
+
+def reset_caches() -> None:
+    """
+    プロセス内キャッシュを空にする（予算はキャッシュが冷えている時のクエリ数で決める）。
+    """
+    from app import market_cache, owned
+    from app.auth import principal_cache
+
+    principal_cache.cache.clear()
+    owned.cache.clear()
+    market_cache.bump()
+
+
+@pytest.fixture(scope="session")
+def app_client():
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    # with で startup / shutdown（スキーマ確認・audit writer など）を回す
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def make_user(app_client):
+    """
+    User を ORM で作って commit し、detached のまま返す。password を渡した時だけ hash を作る
+    （渡さなければログインできないユーザー。password_hash を直接渡してもよい）。
+    """
+    from app.db.session import SessionLocal
+    from app.models.models import User
+    from app.security import hash_password
+
+    def make(role: str = "BUYER", *, password: str | None = None, email: str | None = None, **fields) -> User:
+        user = User(
+            email=email or f"{role.lower()}-{uuid.uuid4().hex[:12]}@tests.ifm",
+            password_hash=fields.pop("password_hash", None) or (hash_password(password) if password else "-"),
+            role=role,
+            status=fields.pop("status", "ACTIVE"),
+            **fields,
+        )
+        with SessionLocal(expire_on_commit=False) as db:
+            db.add(user)
+            db.commit()
+        return user
+
+    return make
+
+
+@pytest.fixture(scope="session")
+def make_idea(app_client, make_user):
+    """
+    Idea を ORM で作って commit し、detached のまま返す（seller を省くと SELLER を 1 人作る）。
+    """
+    from app.db.session import SessionLocal
+    from app.models.models import Idea
+
+    def make(seller=None, **fields) -> Idea:
+        seller = seller or make_user("SELLER")
+        values = {
+            "title": f"idea {uuid.uuid4().hex[:12]}",
+            "summary": "sum",
+            "body": "body",
+            "price": 100,
+            "resale_allowed": False,
+            "exclusive_option_price": None,
+            "status": "SUBMITTED",
+            "total_score": 0,
+        }
+        values.update(fields)
+        idea = Idea(seller_id=seller.id, **values)
+        with SessionLocal(expire_on_commit=False) as db:
+            db.add(idea)
+            db.commit()
+        return idea
+
+    return make
+
+
+@pytest.fixture(scope="session")
+def auth_headers():
+    """
+    ユーザーの Bearer ヘッダ（/auth/login を通さずに token を発行する）。
+    """
+    from app.security import create_access_token
+
+    def headers(user) -> dict:
+        return {"Authorization": f"Bearer {create_access_token(data={'sub': str(user.id)})}"}
+
+    return headers
+
+
+@pytest.fixture
+def query_budget():
+    @contextmanager
+    def budget(max_queries: int | None = None, *, exact: int | None = None, cold: bool = True):
+        if cold:
+            reset_caches()
+        with record_queries() as log:
+            yield log
+        if exact is not None and len(log) != exact:
+            pytest.fail(f"expected exactly {exact} queries, got {len(log)}:\n{log.format()}", pytrace=False)
+        if max_queries is not None and len(log) > max_queries:
+            pytest.fail(f"query budget {max_queries} exceeded, got {len(log)}:\n{log.format()}", pytrace=False)
+
+    return budget
+
+
+@pytest.fixture
+def ranking_index(app_client, monkeypatch):
+    """
+    テスト用の空でない RankingIndex（worker の DB から build）を有効にして返す。
+    commit フックは Session 全体に付くので、このテストで付けた分は後で外す。
+    """
+    from app import ranking
+    from app.db.session import SessionLocal
+
+    index = ranking.RankingIndex()
+    monkeypatch.setattr(ranking, "ENABLED", True)
+    monkeypatch.setattr(ranking, "index", index)
+    was_installed = ranking.installed()
+    ranking.install()
+    with SessionLocal() as db:
+        ranking.build(db)
+    yield index
+    if not was_installed:
+        ranking.uninstall()
@@ -0,0 +1,40 @@
+"""
+監査ログ（app/audit.py）: 購入・転売のイベントがキュー経由で audit_logs に書かれ、
+stop() がキューに残っている分を書き切ること。
+"""
+from __future__ import annotations
+
+
+def test_purchase_and_resale_are_written_when_writer_stops(app_client, make_user, make_idea, auth_headers):
+    from sqlalchemy import select
+
+    from app import audit
+    from app.db.session import SessionLocal
+    from app.models.models import AuditLog
+
+    owner, buyer = make_user("BUYER"), make_user("BUYER")
+    idea = make_idea(resale_allowed=True, exclusive_option_price=500).id
+
+    r = app_client.post("/deals", json={"idea_id": idea, "is_exclusive": True}, headers=auth_headers(owner))
+    assert r.status_code == 200
+    r = app_client.post("/resale/list", json={"idea_id": idea, "price": 700}, headers=auth_headers(owner))
+    assert r.status_code == 200
+    r = app_client.post("/resale/buy", json={"idea_id": idea}, headers=auth_headers(buyer))
+    assert r.status_code == 200
+
+    # writer は app の event loop 上で動いているので、止める / 起動し直すのもそこで
+    app_client.portal.call(audit.stop)
+    try:
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(AuditLog.action, AuditLog.actor_user_id)
+                .where(AuditLog.target_type == "idea", AuditLog.target_id == idea)
+                .order_by(AuditLog.id)
+            ).all()
+        assert [tuple(r) for r in rows] == [
+            ("deal.purchase", owner.id),
+            ("resale.list", owner.id),
+            ("resale.transfer", buyer.id),
+        ]
+    finally:
+        app_client.portal.call(audit.start)
@@ -0,0 +1,48 @@
+"""
+POST /auth/login（hash の検証中の接続の扱い・古い rounds の hash の作り直し）。
+"""
+from __future__ import annotations
+
+
+def test_login_releases_db_connection_while_verifying(app_client, make_user, monkeypatch):
+    from app import password_pool
+    from app.db.session import async_engine
+
+    user = make_user("BUYER", password="pass")
+    verify = password_pool.verify_and_update
+    checked_out = []
+
+    async def spy(plain, password_hash):
+        checked_out.append(async_engine.sync_engine.pool.checkedout())
+        return await verify(plain, password_hash)
+
+    monkeypatch.setattr(password_pool, "verify_and_update", spy)
+    r = app_client.post("/auth/login", json={"email": user.email, "password": "pass"})
+    assert r.status_code == 200
+    assert checked_out == [0]
+
+
+def test_login_rehashes_weak_hash_through_writer_lane(app_client, make_user, monkeypatch):
+    from passlib.hash import pbkdf2_sha256
+
+    from app.db.session import AsyncWriteSessionLocal, SessionLocal
+    from app.models.models import User
+    from app.routers import auth
+    from app.security import PBKDF2_ROUNDS
+
+    user = make_user("BUYER", password_hash=pbkdf2_sha256.using(rounds=1000).hash("pass"))
+    opened = []
+
+    def writer():
+        opened.append(True)
+        return AsyncWriteSessionLocal()
+
+    monkeypatch.setattr(auth, "AsyncWriteSessionLocal", writer)
+    r = app_client.post("/auth/login", json={"email": user.email, "password": "pass"})
+    assert r.status_code == 200
+    assert opened == [True]
+
+    with SessionLocal() as db:
+        stored = db.get(User, user.id).password_hash
+    assert pbkdf2_sha256.from_string(stored).rounds == PBKDF2_ROUNDS
+    assert pbkdf2_sha256.verify("pass", stored)
@@ -0,0 +1,37 @@
+"""
+app/cache.py の LRUCache（generation を使った「読み込み中に invalidate された値を入れない」判定）。
+"""
+from __future__ import annotations
+
+from app.cache import LRUCache
+
+
+def test_invalidating_another_key_does_not_reject_fill():
+    cache = LRUCache(maxsize=10)
+    generation = cache.generation
+    cache.invalidate("other")
+    assert cache.put("key", 1, generation=generation)
+    assert cache.get("key") == 1
+
+
+def test_invalidating_the_same_key_rejects_fill():
+    cache = LRUCache(maxsize=10)
+    generation = cache.generation
+    cache.invalidate("key")
+    assert not cache.put("key", 1, generation=generation)
+    assert cache.get("key") is None
+    # invalidate の後に読み直した値は入る
+    assert cache.put("key", 2, generation=cache.generation)
+
+
+def test_clear_and_forgotten_invalidations_reject_older_fills():
+    cache = LRUCache(maxsize=2)
+    generation = cache.generation
+    cache.clear()
+    assert not cache.put("key", 1, generation=generation)
+
+    generation = cache.generation
+    cache.invalidate("a")
+    cache.invalidate("b", "c")  # "a" は覚えきれずに溢れる
+    assert not cache.put("a", 1, generation=generation)
+    assert not cache.put("d", 1, generation=generation)  # 溢れた分より前に読んだ値は安全側で捨てる
@@ -0,0 +1,46 @@
+"""
+/deals と /deals/batch の金額（小数の価格は切り捨てて整数にする。両方で同じ金額になること）。
+"""
+from __future__ import annotations
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+
+def _amounts(buyer_id: int) -> dict[int, tuple[int, bool]]:
+    from app.db.session import SessionLocal
+    from app.models.models import Deal
+
+    with SessionLocal() as db:
+        rows = db.execute(select(Deal.idea_id, Deal.amount, Deal.is_exclusive).where(Deal.buyer_id == buyer_id))
+        return {r.idea_id: (r.amount, r.is_exclusive) for r in rows}
+
+
+def test_fractional_prices_are_truncated_on_both_paths(app_client, make_user, make_idea, auth_headers):
+    def ideas():
+        return [make_idea(price=12.6, exclusive_option_price=7.9).id for _ in range(2)]
+
+    single, batch = make_user("BUYER"), make_user("BUYER")
+    (a, b), (c, d) = ideas(), ideas()
+
+    h = auth_headers(single)
+    assert app_client.post("/deals", json={"idea_id": a}, headers=h).status_code == 200
+    assert app_client.post("/deals", json={"idea_id": b, "is_exclusive": True}, headers=h).status_code == 200
+    r = app_client.post(
+        "/deals/batch", json=[{"idea_id": c}, {"idea_id": d, "is_exclusive": True}], headers=auth_headers(batch)
+    )
+    assert r.status_code == 200 and r.json()["ok"]
+
+    assert _amounts(single.id) == {a: (12, False), b: (7, True)}
+    assert _amounts(batch.id) == {c: (12, False), d: (7, True)}
+
+    # non-exclusive から exclusive への upgrade も切り捨て
+    assert app_client.post("/deals", json={"idea_id": a, "is_exclusive": True}, headers=h).status_code == 200
+    assert _amounts(single.id)[a] == (7, True)
+
+
+def test_amount_truncates_on_postgres():
+    from app.routers.deals import _amount_expr
+
+    sql = str(select(_amount_expr(True)).compile(dialect=postgresql.dialect()))
+    assert "CAST(trunc(ideas.exclusive_option_price) AS INTEGER)" in sql
@@ -1,38 +1,24 @@
-import os
-import time
+"""
+/ideas/recommended・/deals・/resale/market・/ideas/search・/metrics の通しテスト。
+
+app はテストのプロセス内で動かす（tests/conftest.py の app_client）。
+データは make_user / make_idea でテストごとに作り、他のテストが作ったデータには頼らない
+（xdist の worker ごとに DB が別なので、どのテストがどの worker で走っても同じ結果になる）。
+"""
+import base64
 import uuid
 
-import pytest
 import httpx
+import pytest
 
 
-API_BASE = os.getenv("API_BASE_URL", "http://127.0.0.1:8000").rstrip("/")
-
-BUYER_EMAIL = os.getenv("E2E_BUYER_EMAIL", "realbuyer@ifm.com")
-BUYER_PASS = os.getenv("E2E_BUYER_PASS", "buyerpass")
-SELLER_EMAIL = os.getenv("E2E_SELLER_EMAIL", "seller@ifm.com")
-SELLER_PASS = os.getenv("E2E_SELLER_PASS", "sellerpass")
-
-
-def _wait_health(client: httpx.Client, timeout_sec: float = 5.0) -> None:
-    start = time.time()
-    while True:
-        try:
-            r = client.get(f"{API_BASE}/health", timeout=2.0)
-            if r.status_code == 200:
-                return
-        except Exception:
-            pass
-        if time.time() - start > timeout_sec:
-            raise RuntimeError("API health check timed out")
-        time.sleep(0.2)
+BUYER_PASS = "buyerpass"
 
 
 def _login(client: httpx.Client, email: str, password: str) -> str:
     r = client.post(
-        f"{API_BASE}/auth/login",
+        "/auth/login",
         json={"email": email, "password": password},
-        timeout=5.0,
     )
     r.raise_for_status()
     j = r.json()
@@ -45,51 +31,49 @@ def _auth_headers(token: str) -> dict:
     return {"Authorization": f"Bearer {token}"}
 
 
-def _create_idea_via_sqlite(seller_id: int, title: str, total_score: int, exclusive_price=None) -> int:
+def _all_recommended(client: httpx.Client, token: str, **params) -> list[dict]:
     """
-    テスト用に sqlite3 CLI で ideas を直接 insert する（DBが sqlite 前提）
-    - E2Eのセットアップを最短で済ませるための割り切り
-    """
-    import subprocess
-    import json
-
-    db_path = os.getenv("E2E_DB_PATH", "app.db")
-
-    exclusive_sql = "null" if exclusive_price is None else str(float(exclusive_price))
-    sql = f"""
-    insert into ideas (seller_id, title, summary, body, price, resale_allowed, exclusive_option_price, status, total_score, created_at)
-    values ({int(seller_id)}, {json.dumps(title)}, 'sum', 'body', 100, 0, {exclusive_sql}, 'SUBMITTED', {int(total_score)}, datetime('now'));
-    select last_insert_rowid();
+    X-Next-Cursor を最後まで辿った /ideas/recommended（worker の DB に他のテストの idea が何件あっても全部見る）。
     """
-    out = subprocess.check_output(["sqlite3", db_path, sql], text=True).strip()
-    return int(out)
+    out: list[dict] = []
+    cursor = None
+    while True:
+        page_params = dict(params, limit=500)
+        if cursor:
+            page_params["cursor"] = cursor
+        r = client.get("/ideas/recommended", params=page_params, headers=_auth_headers(token))
+        r.raise_for_status()
+        out += r.json()
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            return out
 
 
 @pytest.fixture(scope="session")
-def client():
-    with httpx.Client() as c:
-        _wait_health(c)
-        yield c
+def client(app_client) -> httpx.Client:
+    return app_client
 
 
 @pytest.fixture(scope="session")
-def buyer_token(client: httpx.Client) -> str:
-    return _login(client, BUYER_EMAIL, BUYER_PASS)
+def seller(make_user):
+    return make_user("SELLER")
 
 
 @pytest.fixture(scope="session")
-def seller_token(client: httpx.Client) -> str:
-    return _login(client, SELLER_EMAIL, SELLER_PASS)
+def buyer_token(client: httpx.Client, make_user) -> str:
+    # ログインは実際に /auth/login を通す
+    buyer = make_user("BUYER", password=BUYER_PASS)
+    return _login(client, buyer.email, BUYER_PASS)
 
 
 def test_recommended_filters_owned_and_include_owned(client: httpx.Client, buyer_token: str):
     # include_owned=true は買ってても出る
-    r = client.get(f"{API_BASE}/ideas/recommended?include_owned=true", headers=_auth_headers(buyer_token))
+    r = client.get("/ideas/recommended?include_owned=true", headers=_auth_headers(buyer_token))
     r.raise_for_status()
     assert isinstance(r.json(), list)
 
     # デフォルトは「未購入のみ」なので、already_owned は必ず False
-    r2 = client.get(f"{API_BASE}/ideas/recommended", headers=_auth_headers(buyer_token))
+    r2 = client.get("/ideas/recommended", headers=_auth_headers(buyer_token))
     r2.raise_for_status()
     arr = r2.json()
     assert isinstance(arr, list)
@@ -98,30 +82,27 @@ def test_recommended_filters_owned_and_include_owned(client: httpx.Client, buyer
 
 
 def test_recommended_order_by_total_score_desc(client: httpx.Client, buyer_token: str):
-    r = client.get(f"{API_BASE}/ideas/recommended?include_owned=true", headers=_auth_headers(buyer_token))
+    r = client.get("/ideas/recommended?include_owned=true", headers=_auth_headers(buyer_token))
     r.raise_for_status()
     arr = r.json()
     scores = [int(x.get("total_score") or 0) for x in arr]
     assert scores == sorted(scores, reverse=True), f"not sorted desc: {scores}"
 
 
-def test_buy_hides_from_default_recommended_and_marks_owned_in_include_owned(client: httpx.Client, buyer_token: str):
+def test_buy_hides_from_default_recommended_and_marks_owned_in_include_owned(client: httpx.Client, buyer_token: str, make_idea, seller):
     """
     DB状態に依存して SKIP しないように、このテスト内で「未購入 idea」を必ず1件作ってから購入する。
     """
-    seller_id = int(os.getenv("E2E_SELLER_ID", "3"))
     uniq = uuid.uuid4().hex[:8]
-    idea_id = _create_idea_via_sqlite(seller_id, f"e2e-unowned-{uniq}", total_score=42, exclusive_price=None)
+    idea_id = make_idea(seller, title=f"e2e-unowned-{uniq}", total_score=42).id
 
     # 作った直後は default recommended に出るはず（未購入）
-    r0 = client.get(f"{API_BASE}/ideas/recommended", headers=_auth_headers(buyer_token))
-    r0.raise_for_status()
-    ids0 = [int(x["id"]) for x in r0.json()]
-    assert idea_id in ids0, f"new unowned idea_id={idea_id} not in default recommended: {ids0}"
+    ids0 = [int(x["id"]) for x in _all_recommended(client, buyer_token)]
+    assert idea_id in ids0, f"new unowned idea_id={idea_id} not in default recommended"
 
     # 購入
     buy = client.post(
-        f"{API_BASE}/deals",
+        "/deals",
         headers=_auth_headers(buyer_token),
         json={"idea_id": idea_id, "is_exclusive": False},
     )
@@ -130,31 +111,26 @@ def test_buy_hides_from_default_recommended_and_marks_owned_in_include_owned(cli
     assert j.get("ok") is True
 
     # default recommended から消える
-    r2 = client.get(f"{API_BASE}/ideas/recommended", headers=_auth_headers(buyer_token))
-    r2.raise_for_status()
-    ids = [int(x["id"]) for x in r2.json()]
+    ids = [int(x["id"]) for x in _all_recommended(client, buyer_token)]
     assert idea_id not in ids
 
     # include_owned=true では already_owned=true で出る
-    r3 = client.get(f"{API_BASE}/ideas/recommended?include_owned=true", headers=_auth_headers(buyer_token))
-    r3.raise_for_status()
-    found = [x for x in r3.json() if int(x["id"]) == idea_id]
+    found = [x for x in _all_recommended(client, buyer_token, include_owned="true") if int(x["id"]) == idea_id]
     assert found, "purchased idea not found in include_owned=true"
     assert found[0]["already_owned"] is True
 
 
-def test_exclusive_upgrade_and_no_downgrade(client: httpx.Client, buyer_token: str):
+def test_exclusive_upgrade_and_no_downgrade(client: httpx.Client, buyer_token: str, make_idea, seller):
     """
     - exclusive_option_price がある idea を non-exclusive で購入 → is_exclusive=true で upgrade 成功
     - その後 is_exclusive=false で downgrade は 409
     """
-    seller_id = int(os.getenv("E2E_SELLER_ID", "3"))
     uniq = uuid.uuid4().hex[:8]
-    idea_id = _create_idea_via_sqlite(seller_id, f"e2e-upgrade-{uniq}", total_score=777, exclusive_price=999)
+    idea_id = make_idea(seller, title=f"e2e-upgrade-{uniq}", total_score=777, exclusive_option_price=999).id
 
     # まず non-exclusive で購入
     buy = client.post(
-        f"{API_BASE}/deals",
+        "/deals",
         headers=_auth_headers(buyer_token),
         json={"idea_id": idea_id, "is_exclusive": False},
     )
@@ -164,7 +140,7 @@ def test_exclusive_upgrade_and_no_downgrade(client: httpx.Client, buyer_token: s
 
     # exclusive に upgrade
     up = client.post(
-        f"{API_BASE}/deals",
+        "/deals",
         headers=_auth_headers(buyer_token),
         json={"idea_id": idea_id, "is_exclusive": True},
     )
@@ -175,7 +151,7 @@ def test_exclusive_upgrade_and_no_downgrade(client: httpx.Client, buyer_token: s
 
     # downgrade は 409
     down = client.post(
-        f"{API_BASE}/deals",
+        "/deals",
         headers=_auth_headers(buyer_token),
         json={"idea_id": idea_id, "is_exclusive": False},
     )
@@ -183,30 +159,147 @@ def test_exclusive_upgrade_and_no_downgrade(client: httpx.Client, buyer_token: s
     assert down.json().get("detail") == "cannot downgrade exclusive"
 
 
-def test_exclusive_not_available_returns_400(client: httpx.Client, buyer_token: str):
+def test_exclusive_not_available_returns_400(client: httpx.Client, buyer_token: str, make_idea, seller):
     """
     exclusive_option_price が null の idea に is_exclusive=true は 400
     """
-    # include_owned=true から exclusive_option_price が null の idea を1件探す
-    r = client.get(f"{API_BASE}/ideas/recommended?include_owned=true", headers=_auth_headers(buyer_token))
-    r.raise_for_status()
-    arr = r.json()
-
-    candidate = None
-    for x in arr:
-        if x.get("exclusive_option_price") is None:
-            candidate = x
-            break
-
-    if candidate is None:
-        pytest.skip("no idea with exclusive_option_price=null found")
-
-    idea_id = int(candidate["id"])
+    idea_id = make_idea(seller, title=f"e2e-no-exclusive-{uuid.uuid4().hex[:8]}", total_score=5).id
 
     res = client.post(
-        f"{API_BASE}/deals",
+        "/deals",
         headers=_auth_headers(buyer_token),
         json={"idea_id": idea_id, "is_exclusive": True},
     )
     assert res.status_code == 400
     assert res.json().get("detail") == "exclusive option not available"
+
+
+def test_recommended_cursor_pagination_matches_full_list(client: httpx.Client, buyer_token: str):
+    """
+    limit=1 で X-Next-Cursor を辿った結果が、一括取得と同じ並びになる
+    """
+    r = client.get("/ideas/recommended?include_owned=true", headers=_auth_headers(buyer_token))
+    r.raise_for_status()
+    full = [int(x["id"]) for x in r.json()]
+
+    paged = []
+    cursor = None
+    for _ in range(len(full) + 1):
+        params = {"include_owned": "true", "limit": 1}
+        if cursor:
+            params["cursor"] = cursor
+        rp = client.get("/ideas/recommended", params=params, headers=_auth_headers(buyer_token))
+        rp.raise_for_status()
+        paged += [int(x["id"]) for x in rp.json()]
+        cursor = rp.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert paged == full
+
+
+def test_deals_batch_applies_same_rules_per_item(client: httpx.Client, buyer_token: str, make_idea, seller):
+    """
+    POST /deals/batch は item ごとに POST /deals と同じ結果を返す（cart 内の順序も反映）
+    """
+    uniq = uuid.uuid4().hex[:8]
+    plain = make_idea(seller, title=f"e2e-batch-plain-{uniq}", total_score=11).id
+    excl = make_idea(seller, title=f"e2e-batch-excl-{uniq}", total_score=12, exclusive_option_price=500).id
+
+    r = client.post(
+        "/deals/batch",
+        headers=_auth_headers(buyer_token),
+        json=[
+            {"idea_id": plain, "is_exclusive": False},
+            {"idea_id": plain, "is_exclusive": True},
+            {"idea_id": excl, "is_exclusive": False},
+            {"idea_id": excl, "is_exclusive": True},
+            {"idea_id": excl, "is_exclusive": False},
+            {"idea_id": 10**9, "is_exclusive": False},
+        ],
+    )
+    r.raise_for_status()
+    j = r.json()
+    assert j["ok"] is False
+    assert [(x["ok"], x.get("upgraded"), x.get("detail")) for x in j["results"]] == [
+        (True, False, None),
+        (False, None, "exclusive option not available"),
+        (True, False, None),
+        (True, True, None),
+        (False, None, "cannot downgrade exclusive"),
+        (False, None, "idea not found"),
+    ]
+
+    # commit 済み: 単発の POST /deals からも購入済みに見える
+    again = client.post(
+        "/deals",
+        headers=_auth_headers(buyer_token),
+        json={"idea_id": excl, "is_exclusive": True},
+    )
+    assert again.status_code == 409
+    assert again.json().get("detail") == "already purchased"
+
+
+def test_resale_market_etag_returns_304_until_market_changes(client: httpx.Client):
+    """
+    /resale/market は ETag を返し、マーケットが変わらない間は If-None-Match で 304
+    """
+    r = client.get("/resale/market")
+    r.raise_for_status()
+    etag = r.headers.get("ETag")
+    assert etag
+
+    again = client.get("/resale/market", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers.get("ETag") == etag
+    assert again.content == b""
+
+
+def test_search_ranks_text_matches_and_paginates(client: httpx.Client, buyer_token: str, make_idea, seller):
+    """
+    /ideas/search は title 等の全文検索。同じ関連度なら total_score の高い方が先、cursor で続きが取れる
+    """
+    word = f"zq{uuid.uuid4().hex[:12]}"
+    low = make_idea(seller, title=f"{word} idea", total_score=10).id
+    high = make_idea(seller, title=f"{word} idea", total_score=90).id
+
+    r = client.get("/ideas/search", params={"q": word, "limit": 1}, headers=_auth_headers(buyer_token))
+    r.raise_for_status()
+    assert [x["id"] for x in r.json()] == [high]
+    cursor = r.headers.get("X-Next-Cursor")
+    assert cursor
+
+    r2 = client.get(
+        "/ideas/search",
+        params={"q": word, "limit": 1, "cursor": cursor},
+        headers=_auth_headers(buyer_token),
+    )
+    r2.raise_for_status()
+    assert [x["id"] for x in r2.json()] == [low]
+    assert r2.headers.get("X-Next-Cursor") is None
+
+
+def test_metrics_exposes_route_latency_and_db_queries(client: httpx.Client, buyer_token: str):
+    """
+    /metrics に route テンプレート単位の histogram とクエリ数が出る
+    """
+    client.get("/ideas/recommended", headers=_auth_headers(buyer_token)).raise_for_status()
+
+    r = client.get("/metrics")
+    r.raise_for_status()
+    assert r.headers["content-type"].startswith("text/plain")
+    labels = 'method="GET",route="/ideas/recommended",status="200"'
+    assert f"ifm_http_request_duration_seconds_count{{{labels}}}" in r.text
+    assert f"ifm_http_request_db_queries_total{{{labels}}}" in r.text
+
+
+@pytest.mark.parametrize("path, params", [("/ideas/recommended", {}), ("/ideas/search", {"q": "idea"})])
+@pytest.mark.parametrize("raw", ["not-base64!", '["x","y"]', "[1]", '[true, 1]', '[1.5, "2"]', '[1e999, 1]'])
+def test_rejects_bad_cursor_with_400(client: httpx.Client, buyer_token: str, path: str, params: dict, raw: str):
+    """
+    壊れた・改ざんされた cursor は 500 ではなく 400（recommended / search）
+    """
+    cursor = base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=") if raw.startswith("[") else raw
+    r = client.get(path, params={**params, "cursor": cursor}, headers=_auth_headers(buyer_token))
+    assert r.status_code == 400
+    assert r.json().get("detail") == "invalid cursor"
@@ -0,0 +1,41 @@
+"""
+get_current_user の principal キャッシュ（app/auth/principal_cache.py）。
+"""
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.mark.parametrize("field, value", [("role", "ADMIN"), ("status", "SUSPENDED")])
+def test_role_or_status_change_evicts_cached_principal(app_client, make_user, auth_headers, field, value):
+    from app.auth import principal_cache
+    from app.db.session import SessionLocal
+    from app.models.models import User
+
+    user = make_user("BUYER")
+    headers = auth_headers(user)
+    digest = principal_cache.token_digest(headers["Authorization"].removeprefix("Bearer "))
+
+    # BUYER なので 403。この時に principal がキャッシュされる
+    assert app_client.post("/scores/bulk", json=[], headers=headers).status_code == 403
+    assert principal_cache.get(digest).principal.role == "BUYER"
+
+    with SessionLocal() as db:
+        setattr(db.get(User, user.id), field, value)
+        db.commit()
+    assert principal_cache.get(digest) is None
+
+    # 次のリクエストは DB から読み直す（ADMIN になっていれば空の bulk は 400）
+    r = app_client.post("/scores/bulk", json=[], headers=headers)
+    assert r.status_code == (400 if field == "role" else 403)
+    assert getattr(principal_cache.get(digest).principal, field) == value
+
+
+def test_metrics_exposes_principal_cache_counters(app_client, make_user, auth_headers):
+    headers = auth_headers(make_user("BUYER"))
+    app_client.get("/ideas/recommended", headers=headers).raise_for_status()
+    app_client.get("/ideas/recommended", headers=headers).raise_for_status()
+
+    text = app_client.get("/metrics").text
+    assert "ifm_principal_cache_hits " in text
+    assert "ifm_principal_cache_misses " in text
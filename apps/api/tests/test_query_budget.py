@@ -0,0 +1,108 @@
+"""
+エンドポイントごとのクエリ数の上限（N+1 や余計な往復の混入を review の時点で止める）。
+
+app はプロセス内で動かす（tests/conftest.py の app_client / query_budget）。
+予算はキャッシュが冷えている状態（principal / owned / market を空にした直後）の 1 リクエスト分。
+増やす時は、増えた SQL が本当に要るのかを PR で説明すること。
+"""
+from __future__ import annotations
+
+import uuid
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def world(make_user, make_idea, auth_headers):
+    tag = uuid.uuid4().hex[:8]
+    buyer = make_user("BUYER", password="pass")
+    seller = make_user("SELLER")
+    ideas = [
+        make_idea(
+            seller,
+            title=f"budget {tag} idea {i}",
+            summary="summary",
+            resale_allowed=True,
+            exclusive_option_price=500,
+            status="ACTIVE",
+            total_score=50 + i,
+        )
+        for i in range(30)
+    ]
+    return {
+        "tag": tag,
+        "buyer_email": buyer.email,
+        "buyer": auth_headers(buyer),
+        "other": auth_headers(make_user("BUYER")),
+        "admin": auth_headers(make_user("ADMIN")),
+        "ideas": [i.id for i in ideas],
+    }
+
+
+def test_login(app_client, query_budget, world):
+    with query_budget(1):
+        r = app_client.post("/auth/login", json={"email": world["buyer_email"], "password": "pass"})
+    assert r.status_code == 200
+
+
+def test_recommended(app_client, query_budget, world):
+    with query_budget(3):
+        r = app_client.get("/ideas/recommended", params={"limit": 20}, headers=world["buyer"])
+    assert r.status_code == 200 and len(r.json()) == 20
+
+
+def test_search(app_client, query_budget, world):
+    with query_budget(3):
+        r = app_client.get("/ideas/search", params={"q": world["tag"]}, headers=world["buyer"])
+    assert r.status_code == 200 and r.json()
+
+
+def test_deals_purchase_and_upgrade(app_client, query_budget, world):
+    idea_id = world["ideas"][0]
+    with query_budget(2):
+        r = app_client.post("/deals", json={"idea_id": idea_id}, headers=world["buyer"])
+    assert r.status_code == 200
+
+    with query_budget(3):
+        r = app_client.post("/deals", json={"idea_id": idea_id, "is_exclusive": True}, headers=world["buyer"])
+    assert r.json() == {"ok": True, "upgraded": True}
+
+
+def test_deals_batch_does_not_grow_with_cart_size(app_client, query_budget, world):
+    items = [{"idea_id": i} for i in world["ideas"][1:21]]
+    with query_budget(4):
+        r = app_client.post("/deals/batch", json=items, headers=world["buyer"])
+    assert r.status_code == 200 and r.json()["ok"]
+
+
+def test_resale_market(app_client, query_budget, world):
+    with query_budget(exact=1):
+        r = app_client.get("/resale/market")
+    assert r.status_code == 200
+
+    # 同じページの 2 回目はスナップショットから返す
+    with query_budget(exact=0, cold=False):
+        r = app_client.get("/resale/market")
+    assert r.status_code == 200
+
+
+def test_resale_list_and_buy(app_client, query_budget, world):
+    idea_id = world["ideas"][25]
+    r = app_client.post("/deals", json={"idea_id": idea_id, "is_exclusive": True}, headers=world["buyer"])
+    assert r.status_code == 200
+
+    with query_budget(4):
+        r = app_client.post("/resale/list", json={"idea_id": idea_id, "price": 700}, headers=world["buyer"])
+    assert r.status_code == 200
+
+    with query_budget(6):
+        r = app_client.post("/resale/buy", json={"idea_id": idea_id}, headers=world["other"])
+    assert r.status_code == 200
+
+
+def test_scores_bulk_does_not_grow_with_batch_size(app_client, query_budget, world):
+    axes = {"logic": 10, "originality": 10, "market": 10, "concreteness": 10, "extensibility": 10}
+    items = [dict(axes, idea_id=i) for i in world["ideas"][:20]]
+    with query_budget(6):
+        r = app_client.post("/scores/bulk", json=items, headers=world["admin"])
+    assert r.status_code == 200 and r.json()["ok"]
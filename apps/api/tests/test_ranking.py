@@ -0,0 +1,135 @@
+"""
+app/ranking.py のランキング index（sorted list の page / upsert / remove と、Session の commit フック）。
+"""
+from __future__ import annotations
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import ranking
+from app.ranking import RankedIdea, RankingIndex
+
+
+def _row(idea_id: int, score: float, title: str = "t") -> RankedIdea:
+    return RankedIdea(id=idea_id, title=title, status="SUBMITTED", total_score=score, exclusive_option_price=None)
+
+
+def _ids(rows) -> list[int]:
+    return [r.id for r in rows]
+
+
+def test_page_orders_by_score_then_id_and_continues_after_cursor():
+    index = RankingIndex()
+    index.rebuild([_row(1, 5), _row(2, 7), _row(3, 5), _row(4, 1)])
+
+    rows, has_more = index.page(None, 2)
+    assert _ids(rows) == [2, 3] and has_more
+    rows, has_more = index.page((rows[-1].total_score, rows[-1].id), 2)
+    assert _ids(rows) == [1, 4] and not has_more
+    # ちょうど最後まで取れた時は続き無し
+    rows, has_more = index.page(None, 4)
+    assert len(rows) == 4 and not has_more
+
+
+def test_page_skip_does_not_count_towards_limit():
+    index = RankingIndex()
+    index.rebuild([_row(i, i) for i in range(1, 6)])
+
+    rows, has_more = index.page(None, 2, skip={5, 3}.__contains__)
+    assert _ids(rows) == [4, 2] and has_more
+    rows, has_more = index.page((2, 2), 2, skip={1}.__contains__)
+    assert rows == [] and not has_more
+
+
+def test_upsert_moves_row_and_remove_drops_it():
+    index = RankingIndex()
+    index.rebuild([_row(1, 1), _row(2, 2)])
+
+    index.upsert(_row(1, 3, title="renamed"))
+    index.upsert(_row(3, 0))
+    assert _ids(index.snapshot()) == [1, 2, 3]
+    assert index.snapshot()[0].title == "renamed"
+
+    index.remove(2)
+    index.remove(99)  # 無い id は無視
+    assert _ids(index.snapshot()) == [1, 3] and len(index) == 2
+
+
+def _check() -> dict:
+    from app.db.session import SessionLocal
+
+    with SessionLocal() as db:
+        return ranking.check(db)
+
+
+def test_commit_hooks_follow_insert_update_delete(ranking_index, make_idea):
+    from app.db.session import SessionLocal
+    from app.models.models import Idea
+
+    idea = make_idea(total_score=10**7)
+    assert ranking_index.snapshot()[0].id == idea.id
+
+    with SessionLocal() as db:
+        row = db.get(Idea, idea.id)
+        row.title = "ranked title"
+        row.total_score = -1
+        db.commit()
+    assert ranking_index.snapshot()[-1] == RankedIdea(idea.id, "ranked title", "SUBMITTED", -1, None)
+
+    with SessionLocal() as db:
+        db.get(Idea, idea.id).total_score = 10**8
+        db.flush()
+        db.rollback()
+    assert ranking_index.snapshot()[-1].id == idea.id
+
+    with SessionLocal() as db:
+        db.delete(db.get(Idea, idea.id))
+        db.commit()
+    assert idea.id not in _ids(ranking_index.snapshot())
+    assert _check()["ok"]
+
+
+def test_untracked_column_change_does_not_touch_index(ranking_index, make_idea):
+    from app.db.session import SessionLocal
+    from app.models.models import Idea
+
+    idea = make_idea()
+    before = ranking_index.snapshot()
+    with SessionLocal() as db:
+        db.get(Idea, idea.id).summary = "changed"
+        db.flush()
+        assert not db.info.get(ranking._PENDING_KEY)
+        db.commit()
+    assert ranking_index.snapshot() == before
+
+
+def test_reconcile_rebuilds_after_writes_the_hooks_miss(ranking_index, make_idea):
+    from sqlalchemy import update
+
+    from app.db.session import SessionLocal
+    from app.models.models import Idea
+
+    idea = make_idea(total_score=1)
+    with SessionLocal() as db:
+        assert not ranking.reconcile(db)
+
+        # Core の UPDATE（scripts/recompute_scores.py や別ワーカーの書き込み相当）は commit フックに乗らない
+        db.execute(update(Idea).where(Idea.id == idea.id).values(total_score=10**7, title="outside"))
+        db.commit()
+        assert {r.id: r.total_score for r in ranking_index.snapshot()}[idea.id] == 1
+
+        assert ranking.reconcile(db)
+        assert ranking_index.snapshot()[0] == RankedIdea(idea.id, "outside", "SUBMITTED", 10**7, None)
+        assert ranking.check(db)["ok"]
+        assert not ranking.reconcile(db)
+
+
+def test_uninstall_removes_commit_hooks():
+    was_installed = ranking.installed()
+    ranking.install()
+    ranking.uninstall()
+    assert not ranking.installed()
+    for name, fn in ranking._HOOKS:
+        assert not event.contains(Session, name, fn)
+    if was_installed:
+        ranking.install()
@@ -0,0 +1,127 @@
+"""
+読み取りレプリカへの振り分け（app/db/session.py の get_async_read_db）。
+
+worker の SQLite DB を backup API でコピーしたもの（WAL の中身も入る）を「遅れているレプリカ」として差し込む。
+レプリケーションはしないので、コピーした後に primary に入れた行はレプリカからは見えない。
+"""
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def snapshot_replica(app_client, monkeypatch, tmp_path):
+    from sqlalchemy.engine import make_url
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    from app.db import session
+
+    url = make_url(session.DATABASE_URL)
+    if url.get_backend_name() != "sqlite":
+        pytest.skip("replica snapshot needs a SQLite test database")
+
+    def snapshot() -> None:
+        path = tmp_path / "replica.db"
+        with sqlite3.connect(url.database) as src, sqlite3.connect(path) as dst:
+            src.backup(dst)
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+        monkeypatch.setattr(session, "AsyncReplicaSessionLocal", async_sessionmaker(bind=engine, expire_on_commit=False))
+
+    session._sticky.clear()
+    yield snapshot
+    session._sticky.clear()
+
+
+def _recommended_ids(client, headers, **params) -> list[int]:
+    r = client.get("/ideas/recommended", params=params, headers=headers)
+    r.raise_for_status()
+    return [x["id"] for x in r.json()]
+
+
+def test_reads_use_replica_until_the_client_writes(app_client, snapshot_replica, make_user, make_idea, auth_headers, monkeypatch):
+    from app import ranking
+
+    # SQL の経路を見るテスト（IFM_RANKING_INDEX=1 でも index は使わない）
+    monkeypatch.setattr(ranking, "ENABLED", False)
+    buyer = auth_headers(make_user("BUYER"))
+    other = auth_headers(make_user("BUYER"))
+    old = make_idea(title="replica old", total_score=10**6).id
+    snapshot_replica()
+    new = make_idea(title="replica new", total_score=10**6 + 1).id
+
+    # 書き込む前は両方ともレプリカから読む（コピーの後に入れた idea は見えない）
+    ids = _recommended_ids(app_client, buyer, include_owned="true")
+    assert old in ids and new not in ids
+
+    r = app_client.post("/deals", json={"idea_id": old}, headers=buyer)
+    assert r.status_code == 200
+
+    # 書き込んだクライアントは primary から読む: 自分の購入が反映され、新しい idea も見える
+    ids = _recommended_ids(app_client, buyer)
+    assert new in ids and old not in ids
+
+    # 書き込んでいないクライアントはレプリカのまま
+    ids = _recommended_ids(app_client, other, include_owned="true")
+    assert old in ids and new not in ids
+
+
+def test_ranking_index_is_not_held_back_by_replica(app_client, snapshot_replica, ranking_index, make_user, make_idea, auth_headers):
+    buyer = auth_headers(make_user("BUYER"))
+    old = make_idea(total_score=10**9).id
+    snapshot_replica()
+    new = make_idea(total_score=10**9 + 1).id
+
+    # 並びは index（primary の内容）から。レプリカにまだ無い idea も見える
+    ids = _recommended_ids(app_client, buyer)
+    assert ids[:2] == [new, old]
+
+    # 購入した後は owned を primary から読むので、買った idea は外れる
+    assert app_client.post("/deals", json={"idea_id": old}, headers=buyer).status_code == 200
+    ids = _recommended_ids(app_client, buyer)
+    assert new in ids and old not in ids
+
+
+def test_market_cache_is_not_filled_from_lagging_replica(app_client, snapshot_replica, make_user, make_idea, auth_headers):
+    from app.db import session
+
+    owner = auth_headers(make_user("BUYER"))
+    idea = make_idea(resale_allowed=True, exclusive_option_price=500).id
+    assert app_client.post("/deals", json={"idea_id": idea, "is_exclusive": True}, headers=owner).status_code == 200
+    session._sticky.clear()
+    snapshot_replica()
+
+    assert app_client.post("/resale/list", json={"idea_id": idea, "price": 700}, headers=owner).status_code == 200
+
+    # 書き込んでいないクライアントが先に読むとレプリカ（まだ出品が無い）から返るが、キャッシュには入らない
+    r = app_client.get("/resale/market")
+    assert r.status_code == 200 and idea not in [x["idea_id"] for x in r.json()]
+
+    # 出品したクライアントは primary から読んで、自分の出品が見える
+    r = app_client.get("/resale/market", headers=owner)
+    assert r.status_code == 200 and idea in [x["idea_id"] for x in r.json()]
+
+
+def test_seller_owned_set_is_not_cached_from_lagging_replica(app_client, snapshot_replica, make_user, make_idea, auth_headers, monkeypatch):
+    from app import ranking
+    from app.db import session
+
+    monkeypatch.setattr(ranking, "ENABLED", False)
+    seller = auth_headers(make_user("BUYER"))
+    buyer = auth_headers(make_user("BUYER"))
+    idea = make_idea(resale_allowed=True, exclusive_option_price=500, total_score=10**10).id
+    assert app_client.post("/deals", json={"idea_id": idea, "is_exclusive": True}, headers=seller).status_code == 200
+    assert app_client.post("/resale/list", json={"idea_id": idea, "price": 700}, headers=seller).status_code == 200
+    session._sticky.clear()
+    snapshot_replica()
+
+    assert app_client.post("/resale/buy", json={"idea_id": idea}, headers=buyer).status_code == 200
+
+    # 売った側は書き込んでいないのでレプリカから読む。まだ移転前なので所有したまま（ここは遅れてよい）
+    assert idea not in _recommended_ids(app_client, seller)
+
+    # レプリカが追いついたら、さっきの古い集合がキャッシュに残っていないこと
+    snapshot_replica()
+    assert idea in _recommended_ids(app_client, seller)
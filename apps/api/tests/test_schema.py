@@ -0,0 +1,68 @@
+"""
+起動時のスキーマ確認（app/db/schema.py）。
+"""
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.fixture
+def stamped_engine(tmp_path):
+    pytest.importorskip("alembic.config")
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+    from sqlalchemy import create_engine
+
+    from app.db.schema import API_ROOT, sync_schema
+    from app.models.models import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'alembic.db'}")
+    sync_schema(engine, Base.metadata)
+    (head,) = ScriptDirectory.from_config(Config(str(API_ROOT / "alembic.ini"))).get_heads()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL PRIMARY KEY)")
+        conn.exec_driver_sql(f"INSERT INTO alembic_version VALUES ('{head}')")
+    yield engine
+    engine.dispose()
+
+
+def test_alembic_mode_accepts_complete_schema_at_head(stamped_engine):
+    from app.db.schema import check_alembic_head
+    from app.models.models import Base
+
+    check_alembic_head(stamped_engine, Base.metadata)
+
+
+def test_alembic_mode_rejects_head_missing_series_objects(stamped_engine):
+    from app.db.schema import check_alembic_head
+    from app.models.models import Base
+
+    with stamped_engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX uq_deals_buyer_idea")
+        conn.exec_driver_sql("DROP TRIGGER ideas_fts_ai")
+        conn.exec_driver_sql("ALTER TABLE deals DROP COLUMN version")
+
+    with pytest.raises(RuntimeError) as e:
+        check_alembic_head(stamped_engine, Base.metadata)
+    for name in ("index uq_deals_buyer_idea", "trigger ideas_fts_ai", "column deals.version"):
+        assert name in str(e.value)
+
+
+@pytest.mark.parametrize("active_only", [True, False])
+def test_market_keyset_query_does_not_sort(app_client, active_only):
+    from sqlalchemy import text
+
+    from app.db.session import engine
+
+    where = "WHERE resale_listings.is_active = 1" if active_only else ""
+    sql = (
+        "EXPLAIN QUERY PLAN SELECT resale_listings.id, ideas.title FROM resale_listings "
+        f"JOIN ideas ON ideas.id = resale_listings.idea_id {where} "
+        "ORDER BY resale_listings.created_at DESC, resale_listings.id DESC LIMIT 101"
+    )
+    if engine.dialect.name != "sqlite":
+        pytest.skip("query plan check is SQLite-specific")
+    with engine.connect() as conn:
+        plan = " / ".join(row[-1] for row in conn.execute(text(sql)))
+    assert "USE TEMP B-TREE" not in plan, plan
+    assert "ix_resale_listings_" in plan, plan
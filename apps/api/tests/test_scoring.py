@@ -0,0 +1,80 @@
+"""
+採点による ideas.score_sum / score_count / total_score の差分更新（app/scoring.py）と、
+scripts/recompute_scores.py で作り直した値が一致すること。
+"""
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+RUBRIC = ("logic", "originality", "market", "concreteness", "extensibility")
+
+
+def _axes(each: int) -> dict:
+    # 5 軸とも同じ点（total = 5 * each）
+    return {k: each for k in RUBRIC}
+
+
+def _idea_scores(*idea_ids: int) -> dict[int, tuple[int, int, float]]:
+    from sqlalchemy import select
+
+    from app.db.session import SessionLocal
+    from app.models.models import Idea
+
+    with SessionLocal() as db:
+        rows = db.execute(select(Idea.id, Idea.score_sum, Idea.score_count, Idea.total_score).where(Idea.id.in_(idea_ids)))
+        return {r.id: (r.score_sum, r.score_count, r.total_score) for r in rows}
+
+
+@pytest.fixture
+def admins(make_user, auth_headers):
+    return auth_headers(make_user("ADMIN")), auth_headers(make_user("ADMIN"))
+
+
+def test_incremental_totals_match_recompute(app_client, make_idea, admins):
+    first, second = admins
+    idea = make_idea(total_score=0).id
+    dup = make_idea(total_score=0).id
+
+    # 初回の採点
+    r = app_client.post(f"/ideas/{idea}/scores", json=_axes(10), headers=first)
+    assert r.status_code == 200
+    assert _idea_scores(idea)[idea] == (50, 1, 50.0)
+
+    # 同じ採点者の採点し直しは件数を増やさず差分だけ
+    app_client.post(f"/ideas/{idea}/scores", json=_axes(6), headers=first).raise_for_status()
+    assert _idea_scores(idea)[idea] == (30, 1, 30.0)
+
+    # 別の採点者は件数が増えて平均になる
+    app_client.post(f"/ideas/{idea}/scores", json=_axes(14), headers=second).raise_for_status()
+    assert _idea_scores(idea)[idea] == (100, 2, 50.0)
+
+    # 1 回の bulk の中の重複は後のものが勝つ（1 件として数える）
+    r = app_client.post(
+        "/scores/bulk",
+        json=[dict(_axes(2), idea_id=dup), dict(_axes(8), idea_id=dup), dict(_axes(20), idea_id=idea)],
+        headers=first,
+    )
+    assert r.status_code == 200 and r.json()["ok"]
+    incremental = _idea_scores(idea, dup)
+    assert incremental == {idea: (170, 2, 85.0), dup: (40, 1, 40.0)}
+
+    # 集計列を壊してから scripts/recompute_scores.py で作り直すと同じ値に戻る
+    from sqlalchemy import update
+
+    from app.db.session import engine
+    from app.models.models import Idea
+
+    with engine.begin() as conn:
+        conn.execute(update(Idea).where(Idea.id.in_([idea, dup])).values(score_sum=0, score_count=0, total_score=0))
+    api_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run(
+        [sys.executable, os.path.join(api_root, "scripts", "recompute_scores.py")],
+        check=True,
+        capture_output=True,
+        env=dict(os.environ),
+    )
+    assert _idea_scores(idea, dup) == incremental